@@ -0,0 +1,18 @@
+"""
+Shared-secret protection of the admin HTTP endpoints
+"""
+
+import os
+import hmac
+from typing import Optional
+
+# Admin endpoints are disabled while ADMIN_TOKEN is empty (overridable through environment variables)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+
+
+def check_admin_token(provided: Optional[str]) -> bool:
+    """True when `provided` matches ADMIN_TOKEN (constant-time comparison)"""
+    if not ADMIN_TOKEN or not provided:
+        return False
+    return hmac.compare_digest(provided.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
@@ -0,0 +1,387 @@
+"""
+Deterministic offline backtest of recorded source-channel history
+
+Replays recorded posts and edits through CardPredictor (the webhook bot) or
+through config.py (the Telethon bot) with a simulated clock and stubbed
+Telegram sends, and reports the full prediction ledger, the win distribution
+and the replay throughput.
+
+History files are JSON lines, one record per post or edit:
+    {"ts": 1718000000.0, "kind": "new"|"edit", "chat_id": -100..., "message_id": 42, "text": "#N512. ..."}
+Raw Bot API updates (channel_post / edited_channel_post / message / edited_message)
+are accepted as well, either as JSON lines or as a capture file/directory
+written by capture.py (CAPTURE_DIR).
+
+Usage:
+    python backtest.py history.jsonl [--engine predictor|config] [--cooldown 30] [--ledger ledger.csv]
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Sequence
+
+from capture import read_updates, CAPTURE_SUFFIX
+from card_predictor import CardPredictor
+from dedup import SlidingDedup
+from game_message import ParsedGameMessage, parse_game_message
+from strategies import Strategy, StrategyEngine, parse_strategies
+
+logger = logging.getLogger(__name__)
+
+STATUS_ORDER = [f'✅{step}️⃣' for step in range(10)] + ['❌', '⏳']  # up to the deepest keycap status
+WIN_STATUSES = STATUS_ORDER[:10]
+
+
+class HistoryRecord:
+    """One recorded post or edit of the source channel"""
+
+    __slots__ = ('ts', 'kind', 'chat_id', 'message_id', 'text')
+
+    def __init__(self, ts: float, kind: str, chat_id: int, message_id: int, text: str):
+        self.ts = ts
+        self.kind = kind  # 'new' or 'edit'
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.text = text
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'ts': self.ts, 'kind': self.kind, 'chat_id': self.chat_id,
+                'message_id': self.message_id, 'text': self.text}
+
+
+def record_from_update(update: Dict[str, Any]) -> Optional[HistoryRecord]:
+    """Convert a Bot API update into a history record (None if it carries no text)"""
+    for key, kind in (('channel_post', 'new'), ('message', 'new'),
+                      ('edited_channel_post', 'edit'), ('edited_message', 'edit')):
+        message = update.get(key)
+        if message is None:
+            continue
+        if 'text' not in message:
+            return None
+        chat_id = message.get('sender_chat', {}).get('id', message['chat']['id'])
+        ts = message.get('edit_date') if kind == 'edit' else message.get('date')
+        return HistoryRecord(float(ts or 0), kind, chat_id, message.get('message_id', 0), message['text'])
+    return None
+
+
+def load_history(path: str) -> List[HistoryRecord]:
+    """Read a JSON lines history file or an update capture, ordered by timestamp"""
+    records = []
+    if os.path.isdir(path) or path.endswith(CAPTURE_SUFFIX):
+        for ts, update in read_updates(path):
+            record = record_from_update(update)
+            if record is not None:
+                records.append(record)
+        records.sort(key=lambda record: record.ts)
+        return records
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            if 'update_id' in data:
+                record = record_from_update(data)
+            else:
+                record = HistoryRecord(float(data.get('ts', 0)), data.get('kind', 'new'), data.get('chat_id', 0),
+                                       data.get('message_id', 0), data.get('text', ''))
+            if record is not None:
+                records.append(record)
+    # Stable sort: records sharing a timestamp keep their recorded order
+    records.sort(key=lambda record: record.ts)
+    return records
+
+
+class SimulatedClock:
+    """Clock injected in place of time.time(), advanced to each record's timestamp"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def advance(self, ts: float) -> None:
+        if ts > self.now:
+            self.now = ts
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class BacktestResult:
+    """Prediction ledger of one replay with its summary figures"""
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.ledger: List[Dict[str, Any]] = []
+        self._open: Dict[Any, Dict[str, Any]] = {}
+        self.messages = 0
+        self.elapsed = 0.0
+        self.api_calls = Counter()
+
+    def open(self, source: str, target_game: int, predicted_from: int, suit: str, offset: int, ts: float) -> None:
+        row = {
+            'source': source,
+            'target_game': target_game,
+            'predicted_from': predicted_from,
+            'suit': suit,
+            'offset': offset,
+            'created_at': ts,
+            'status': '⏳',
+            'resolved_at': None
+        }
+        self.ledger.append(row)
+        self._open[(source, target_game)] = row
+
+    def close(self, source: str, target_game: int, status: str, ts: float) -> None:
+        row = self._open.pop((source, target_game), None)
+        if row is not None:
+            row['status'] = status
+            row['resolved_at'] = ts
+
+    def distribution(self, source: Optional[str] = None) -> Dict[str, int]:
+        """Number of predictions per final status (✅0️⃣..✅9️⃣ by verification step, ❌, ⏳ still pending)"""
+        counts = Counter(row['status'] for row in self.ledger if source is None or row['source'] == source)
+        return {status: counts.get(status, 0) for status in STATUS_ORDER}
+
+    def summary(self) -> Dict[str, Any]:
+        sources = sorted({row['source'] for row in self.ledger})
+        per_source = {}
+        for source in sources:
+            distribution = self.distribution(source)
+            wins = sum(distribution[status] for status in WIN_STATUSES)
+            resolved = wins + distribution['❌']
+            per_source[source] = {
+                'predictions': sum(distribution.values()),
+                'distribution': distribution,
+                'win_rate': round(wins / resolved, 4) if resolved else None
+            }
+        return {
+            'engine': self.engine,
+            'messages': self.messages,
+            'elapsed_s': round(self.elapsed, 4),
+            'messages_per_s': round(self.messages / self.elapsed, 1) if self.elapsed else None,
+            'api_calls': dict(self.api_calls),
+            'sources': per_source
+        }
+
+    def write_ledger(self, path: str) -> None:
+        """Write the ledger as CSV"""
+        fields = ['source', 'target_game', 'predicted_from', 'suit', 'offset', 'created_at', 'status', 'resolved_at']
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.ledger)
+
+
+def _status_of(prediction: Dict[str, Any]) -> str:
+    if prediction.get('status') == 'correct':
+        return f"✅{prediction.get('verification_count', 0)}️⃣"
+    return '❌'
+
+
+def replay_card_predictor(records: Iterable[HistoryRecord], prediction_cooldown: float = 30,
+                          position_preference: int = 1, verification_depth: int = 3,
+                          strategies: Optional[List[Strategy]] = None,
+                          parsed_messages: Optional[Sequence[ParsedGameMessage]] = None) -> BacktestResult:
+    """
+    Replay history through CardPredictor following the webhook handlers' flow
+    (TelegramHandlers._handle_edited_message / _process_card_message /
+    _process_verification_on_normal_message). Sends and edits are counted, not performed.
+    Optional strategies are run in the same pass, as the shard strategy engine does.
+    `parsed_messages` (aligned with `records`) skips parsing when the history was parsed beforehand.
+    """
+    clock = SimulatedClock()
+    predictor = CardPredictor(clock=clock)
+    predictor.prediction_cooldown = prediction_cooldown
+    predictor.position_preference = position_preference
+    predictor.verification_depth = verification_depth
+    engine = StrategyEngine(strategies or [])
+    for strategy in engine.strategies:
+        strategy.clock = clock
+
+    result = BacktestResult('predictor')
+
+    def verify(parsed, is_edited):
+        verification = predictor._verify_prediction_common(parsed, is_edited=is_edited)
+        if verification and verification.get('type') == 'edit_message':
+            predicted_game = verification['predicted_game']
+            result.close('primary', predicted_game, _status_of(predictor.predictions[predicted_game]), clock.now)
+            result.api_calls['editMessageText'] += 1
+
+    def run_strategies(parsed):
+        created, resolved = engine.handle(parsed)
+        for strategy, predicted_game, prediction in resolved:
+            result.close(strategy.name, predicted_game, _status_of(prediction), clock.now)
+            if not strategy.shadow:
+                result.api_calls['editMessageText'] += 1
+        for strategy, target_game, prediction in created:
+            result.open(strategy.name, target_game, prediction['predicted_from'], prediction['predicted_costume'],
+                        prediction['offset'], clock.now)
+            if not strategy.shadow:
+                result.api_calls['sendMessage'] += 1
+
+    started = time.perf_counter()
+    for index, record in enumerate(records):
+        clock.advance(record.ts)
+        result.messages += 1
+        parsed = parsed_messages[index] if parsed_messages is not None else parse_game_message(record.text)
+
+        if record.kind == 'edit':
+            if parsed.has_completion:
+                predictor.mark_finalized(record.message_id)
+                should_predict, game_number, prediction_data = predictor.should_predict(
+                    parsed, chat_id=record.chat_id, message_id=record.message_id
+                )
+                if should_predict and game_number is not None and prediction_data is not None:
+                    predictor.make_prediction(game_number, prediction_data)
+                    suit, offset = prediction_data
+                    result.open('primary', game_number + offset, game_number, suit, offset, clock.now)
+                    result.api_calls['sendMessage'] += 1
+                verify(parsed, True)
+                run_strategies(parsed)
+            elif parsed.has_pending and record.message_id:
+                predictor.pending_edits[record.message_id] = {'original_text': record.text, 'timestamp': clock.now}
+        else:
+            if parsed.has_pending and record.message_id:
+                predictor.temporary_messages[record.message_id] = record.text
+            if parsed.has_completion:
+                predictor.mark_finalized(record.message_id)
+                verify(parsed, False)
+                run_strategies(parsed)
+                # The webhook also runs _process_verification_on_normal_message on new posts
+                verify(parsed, False)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+class StubTelethonClient:
+    """Stands in for the Telethon client during a config.py replay: sends are counted, never performed"""
+
+    class _SentMessage:
+        def __init__(self, message_id: int):
+            self.id = message_id
+
+    def __init__(self, calls: Counter):
+        self.calls = calls
+        self._next_id = 0
+
+    async def send_message(self, entity, message, **kwargs):
+        self.calls['send_message'] += 1
+        self._next_id += 1
+        return self._SentMessage(self._next_id)
+
+    async def edit_message(self, entity, message_id, text=None, **kwargs):
+        self.calls['edit_message'] += 1
+        return self._SentMessage(message_id)
+
+
+def replay_config_bot(records: Iterable[HistoryRecord], prediction_offset: Optional[int] = None,
+                      max_pending: Optional[int] = None, verification_depth: Optional[int] = None,
+                      min_cards: Optional[int] = None) -> BacktestResult:
+    """
+    Replay history through config.py's process_new_message / check_prediction_result,
+    following its Telethon handlers (new posts always processed, edits only once finalized).
+    The module state is reset before the replay and its globals restored afterwards.
+    `verification_depth` / `min_cards` override VERIFICATION_DEPTH / VERIFICATION_MIN_CARDS.
+    """
+    # config.py exits at import without its credentials: the replay never connects, placeholders are enough
+    for name, placeholder in (('API_ID', '1'), ('API_HASH', 'backtest'), ('BOT_TOKEN', '0:backtest')):
+        os.environ.setdefault(name, placeholder)
+    import config as telethon_bot
+    from verification import VerificationEngine, VERIFICATION_DEPTH, VERIFICATION_MIN_CARDS
+
+    clock = SimulatedClock()
+    result = BacktestResult('config')
+    patched = ('client', 'prediction_channel_ok', 'transfer_enabled', 'prediction_offset', 'MAX_PENDING_PREDICTIONS',
+               'processed_messages', 'processed_finalized', 'send_prediction_to_channel', 'update_prediction_status',
+               'verification_engine')
+    saved = {name: getattr(telethon_bot, name) for name in patched}
+    original_send = telethon_bot.send_prediction_to_channel
+    original_update = telethon_bot.update_prediction_status
+
+    async def recording_send(target_game: int, suit: str, base_game: int):
+        result.open('config', target_game, base_game, suit, target_game - base_game, clock.now)
+        return await original_send(target_game, suit, base_game)
+
+    async def recording_update(game_number: int, new_status: str, result_group: str = None):
+        if new_status in STATUS_ORDER[:-1]:
+            result.close('config', game_number, new_status, clock.now)
+        return await original_update(game_number, new_status, result_group)
+
+    async def run():
+        for record in records:
+            clock.advance(record.ts)
+            result.messages += 1
+            is_finalized = telethon_bot.is_message_finalized(record.text)
+            if record.kind == 'edit' and not is_finalized:
+                continue
+            await telethon_bot.process_new_message(record.text, record.chat_id, is_finalized,
+                                                   message_id=record.message_id)
+
+    try:
+        telethon_bot.pending_predictions.clear()
+        telethon_bot.queued_predictions.clear()
+        telethon_bot.recent_games.clear()
+        telethon_bot.last_transferred_game = None
+        telethon_bot.client = StubTelethonClient(result.api_calls)
+        telethon_bot.prediction_channel_ok = True
+        telethon_bot.transfer_enabled = False
+        telethon_bot.processed_messages = SlidingDedup(clock=clock)
+        telethon_bot.processed_finalized = SlidingDedup(clock=clock)
+        telethon_bot.verification_engine = VerificationEngine(
+            verification_depth if verification_depth is not None else VERIFICATION_DEPTH,
+            min_cards if min_cards is not None else VERIFICATION_MIN_CARDS)
+        telethon_bot.send_prediction_to_channel = recording_send
+        telethon_bot.update_prediction_status = recording_update
+        if prediction_offset is not None:
+            telethon_bot.prediction_offset = prediction_offset
+        if max_pending is not None:
+            telethon_bot.MAX_PENDING_PREDICTIONS = max_pending
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        result.elapsed = time.perf_counter() - started
+    finally:
+        for name, value in saved.items():
+            setattr(telethon_bot, name, value)
+        telethon_bot.pending_predictions.clear()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backtest des prédictions sur un historique enregistré")
+    parser.add_argument('history', help="Fichier JSON lines de l'historique du canal source")
+    parser.add_argument('--engine', choices=['predictor', 'config'], default='predictor')
+    parser.add_argument('--cooldown', type=float, default=30, help="prediction_cooldown (moteur predictor)")
+    parser.add_argument('--strategies', default='', help="Stratégies additionnelles (format STRATEGIES), rejouées en ombre")
+    parser.add_argument('--offset', type=int, default=None, help="PREDICTION_OFFSET (moteur config)")
+    parser.add_argument('--depth', type=int, default=None, help="VERIFICATION_DEPTH (moteur config)")
+    parser.add_argument('--min-cards', type=int, default=None, help="VERIFICATION_MIN_CARDS, 1 = présence (moteur config)")
+    parser.add_argument('--ledger', help="Écrire le registre des prédictions en CSV")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    records = load_history(args.history)
+
+    if args.engine == 'config':
+        result = replay_config_bot(records, prediction_offset=args.offset, verification_depth=args.depth,
+                                   min_cards=args.min_cards)
+    else:
+        strategies = parse_strategies(args.strategies, shadow=True) if args.strategies else None
+        result = replay_card_predictor(records, prediction_cooldown=args.cooldown, strategies=strategies)
+
+    print(json.dumps(result.summary(), indent=2, ensure_ascii=False))
+    if args.ledger:
+        result.write_ledger(args.ledger)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,17 @@
+"""
+Benchmark suite: microbenchmarks of the parsing / prediction / verification hot
+paths and end-to-end benchmarks of TelegramHandlers.handle_update, over a fixed
+synthetic corpus (traffic_gen.py with a fixed seed).
+
+Usage:
+    python -m benchmarks run [--suite micro|e2e|all] [--output benchmarks/baselines/local.json]
+    python -m benchmarks compare benchmarks/baselines/local.json current.json [--threshold 0.10]
+    python -m benchmarks run --compare benchmarks/baselines/local.json
+"""
+
+import os
+
+# Benchmarks never touch the durable state of a real deployment
+os.environ.setdefault('STATE_JOURNAL_ENABLED', 'false')
+os.environ.setdefault('STRATEGIES', '')
+os.environ.setdefault('SHADOW_STRATEGIES', '')
@@ -0,0 +1,87 @@
+"""
+Benchmark command line: run the suite, save JSON baselines, compare against them
+
+    python -m benchmarks run --output benchmarks/baselines/local.json
+    python -m benchmarks run --compare benchmarks/baselines/local.json --threshold 0.10
+    python -m benchmarks compare baseline.json current.json
+
+Exit status 1 when a benchmark regressed by more than the threshold.
+"""
+
+import sys
+import json
+import logging
+import argparse
+from typing import List, Optional
+
+from benchmarks.corpus import CORPUS_GAMES, CORPUS_SEED, build_corpus
+from benchmarks.harness import run_benchmarks, save_results, load_results, compare_results, format_comparison
+
+
+def _report(baseline_path: str, current: dict, threshold: float, metric: str) -> int:
+    rows = compare_results(load_results(baseline_path), current, threshold=threshold, metric=metric)
+    print(format_comparison(rows, metric=metric))
+    regressions = [row['name'] for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"\n❌ {len(regressions)} régression(s) au-delà de {threshold * 100:.0f}%: {', '.join(regressions)}")
+        return 1
+    print(f"\n✅ Aucune régression au-delà de {threshold * 100:.0f}%")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Benchmarks du bot de prédiction")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Exécuter les benchmarks")
+    run.add_argument('--suite', choices=['micro', 'e2e', 'all'], default='all')
+    run.add_argument('--games', type=int, default=CORPUS_GAMES, help="Jeux du corpus fixe")
+    run.add_argument('--seed', type=int, default=CORPUS_SEED)
+    run.add_argument('--repeats', type=int, default=5)
+    run.add_argument('--warmup', type=int, default=1)
+    run.add_argument('--filter', default='', help="Sous-chaîne du nom des benchmarks à exécuter")
+    run.add_argument('--no-http', action='store_true', help="Sans le benchmark de bout en bout via HTTP local")
+    run.add_argument('--output', help="Écrire les résultats (fichier de référence JSON)")
+    run.add_argument('--compare', help="Comparer à un fichier de référence JSON")
+    run.add_argument('--threshold', type=float, default=0.10, help="Régression tolérée (0.10 = +10%%)")
+    run.add_argument('--metric', choices=['best_us', 'median_us', 'mean_us'], default='best_us')
+
+    compare = commands.add_parser('compare', help="Comparer deux fichiers de résultats")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.10)
+    compare.add_argument('--metric', choices=['best_us', 'median_us', 'mean_us'], default='best_us')
+
+    args = parser.parse_args(argv)
+    # Hot paths log at INFO: benchmark them as deployed with a quiet logger, not the cost of stdout
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == 'compare':
+        return _report(args.baseline, load_results(args.current), args.threshold, args.metric)
+
+    corpus = build_corpus(args.games, args.seed)
+    benchmarks = []
+    if args.suite in ('micro', 'all'):
+        from benchmarks.micro import micro_benchmarks
+        benchmarks.extend(micro_benchmarks(corpus))
+    if args.suite in ('e2e', 'all'):
+        from benchmarks.e2e import e2e_benchmarks
+        benchmarks.extend(e2e_benchmarks(corpus, http=not args.no_http))
+    if args.filter:
+        benchmarks = [benchmark for benchmark in benchmarks if args.filter in benchmark.name]
+    # Compressed time makes the handlers warn (edits racing their own sends): keep stderr out of the timings
+    logging.getLogger().setLevel(logging.ERROR)
+
+    document = run_benchmarks(benchmarks, repeats=args.repeats, warmup=args.warmup,
+                              meta={'corpus': {'games': args.games, 'seed': args.seed, 'messages': len(corpus)}})
+    if args.output:
+        save_results(document, args.output)
+    if args.compare:
+        return _report(args.compare, document, args.threshold, args.metric)
+    if not args.output:
+        print(json.dumps(document, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Fixed benchmark corpus, generated deterministically by traffic_gen.py
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from traffic_gen import TrafficGenerator
+
+CORPUS_GAMES = 2000
+CORPUS_SEED = 20240601
+CORPUS_START_TS = 1700000000.0
+
+Event = Tuple[float, str, int, int, str]
+
+
+def build_corpus(games: int = CORPUS_GAMES, seed: int = CORPUS_SEED) -> List[Event]:
+    """(ts, kind, chat_id, message_id, text) events of one source channel, identical on every run"""
+    generator = TrafficGenerator(channels=1, seed=seed, start_ts=CORPUS_START_TS)
+    return list(generator.events(games))
+
+
+def corpus_texts(corpus: List[Event]) -> List[str]:
+    """Every message text, pending and final versions included"""
+    return [text for _, _, _, _, text in corpus]
+
+
+def corpus_updates(corpus: List[Event], seed: int = CORPUS_SEED) -> List[Dict[str, Any]]:
+    """The corpus as Bot API updates (channel_post / edited_channel_post)"""
+    generator = TrafficGenerator(channels=1, seed=seed, start_ts=CORPUS_START_TS)
+    return [generator.make_update(ts, kind, chat_id, message_id, text)
+            for ts, kind, chat_id, message_id, text in corpus]
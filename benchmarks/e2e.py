@@ -0,0 +1,123 @@
+"""
+End-to-end benchmarks: the corpus pushed through TelegramHandlers.handle_update
+
+Outbound calls go to a fake transport, either answered in-process (handler and
+dispatcher cost only) or over loopback HTTP by fake_telegram.FakeTelegramAPI
+(adds the real TelegramTransport / requests cost). The dispatcher rate limits
+are lifted: the benchmarks measure processing, not Telegram's flood control.
+Each repeat ends once every queued outbound call has been answered.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from benchmarks.corpus import Event, corpus_updates
+from benchmarks.harness import Benchmark
+
+logger = logging.getLogger(__name__)
+
+BENCH_TOKEN = '0:benchmark'
+UNLIMITED_RATE = 1e9
+
+
+class InProcessTransport:
+    """TelegramTransport stand-in answering every call locally, like FakeTelegramAPI without the HTTP hop"""
+
+    def __init__(self, token: str = BENCH_TOKEN):
+        self.token = token
+        self.base_url = f"http://fake-telegram/bot{token}"
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._next_message_id = 0
+
+    def call(self, method: str, json: Optional[Dict[str, Any]] = None,
+             data: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None,
+             timeout: float = 10, http_method: str = 'POST') -> Dict[str, Any]:
+        payload = json if json is not None else (data or {})
+        with self._lock:
+            self.calls += 1
+            if method in ('sendMessage', 'sendDocument'):
+                self._next_message_id += 1
+                message_id = self._next_message_id
+            else:
+                message_id = payload.get('message_id')
+        if method in ('sendMessage', 'sendDocument', 'editMessageText'):
+            return {'ok': True, 'result': {
+                'message_id': message_id,
+                'chat': {'id': payload.get('chat_id')},
+                'date': int(time.time()),
+                'text': payload.get('text', '')
+            }}
+        return {'ok': True, 'result': True}
+
+    def warm_up(self, connections: Optional[int] = None) -> int:
+        return 0
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, float]]:
+        return {}
+
+
+def _handlers_with_transport(transport: Any) -> Any:
+    """TelegramHandlers whose outbound calls all go through `transport`, without rate limits"""
+    from handlers import TelegramHandlers
+    from outbound import OutboundDispatcher, EditCoalescer
+
+    handlers = TelegramHandlers(transport.token)
+    handlers.transport = transport
+    handlers.base_url = transport.base_url
+    handlers.dispatcher = OutboundDispatcher(
+        transport, global_rate=UNLIMITED_RATE, chat_rate=UNLIMITED_RATE,
+        group_rate=UNLIMITED_RATE, chat_burst=int(UNLIMITED_RATE)
+    )
+    handlers.edit_coalescer = EditCoalescer(handlers.dispatcher)
+    return handlers
+
+
+def _reset(handlers: Any) -> Any:
+    # Same starting point for every repeat: no pending prediction, no dedup entry, no cooldown
+    for _, predictor in handlers.predictor_registry.items():
+        predictor.reset_predictions()
+        predictor.prediction_cooldown = 0
+    handlers.redirected_channels.clear()
+    return handlers
+
+
+def _drain(handlers: Any, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while handlers.dispatcher.depth() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def _handle_all(updates: List[Dict[str, Any]]):
+    def body(handlers: Any) -> None:
+        for update in updates:
+            handlers.handle_update(update)
+        _drain(handlers)
+    return body
+
+
+def e2e_benchmarks(corpus: List[Event], http: bool = True) -> List[Benchmark]:
+    try:
+        import handlers  # noqa: F401 - needs requests
+    except ImportError as e:
+        logger.warning(f"⚠️ handlers.py indisponible, benchmarks de bout en bout ignorés: {e!r}")
+        return []
+
+    updates = corpus_updates(corpus)
+    in_process = _handlers_with_transport(InProcessTransport())
+    benchmarks = [
+        Benchmark('e2e.handle_update[in_process]', _handle_all(updates), len(updates),
+                  setup=lambda: _reset(in_process)),
+    ]
+
+    if http:
+        from fake_telegram import FakeTelegramAPI
+        from telegram_api import TelegramTransport
+
+        api = FakeTelegramAPI().start()
+        over_http = _handlers_with_transport(TelegramTransport(BENCH_TOKEN, api_base=api.base_url))
+        benchmarks.append(Benchmark('e2e.handle_update[fake_http]', _handle_all(updates), len(updates),
+                                    setup=lambda: _reset(over_http)))
+    return benchmarks
@@ -0,0 +1,121 @@
+"""
+Timing loop, JSON baselines and regression comparison
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# Setup builds the (untimed) state of one repeat, body runs the timed work on it
+Setup = Callable[[], Any]
+Body = Callable[[Any], None]
+
+
+class Benchmark:
+    """One named benchmark: `ops` operations per repeat of `body`"""
+
+    def __init__(self, name: str, body: Body, ops: int, setup: Optional[Setup] = None,
+                 teardown: Optional[Callable[[Any], None]] = None):
+        self.name = name
+        self.body = body
+        self.ops = max(1, ops)
+        self.setup = setup
+        self.teardown = teardown
+
+    def run(self, repeats: int = 5, warmup: int = 1) -> Dict[str, Any]:
+        """Time `repeats` runs (after `warmup` untimed ones), returns per-operation timings in µs"""
+        timings = []
+        for index in range(warmup + repeats):
+            state = self.setup() if self.setup else None
+            start = time.perf_counter()
+            self.body(state)
+            elapsed = time.perf_counter() - start
+            if self.teardown:
+                self.teardown(state)
+            if index >= warmup:
+                timings.append(elapsed / self.ops * 1e6)
+        return {
+            'ops': self.ops,
+            'repeats': repeats,
+            'best_us': round(min(timings), 4),
+            'median_us': round(statistics.median(timings), 4),
+            'mean_us': round(statistics.fmean(timings), 4)
+        }
+
+
+def run_benchmarks(benchmarks: List[Benchmark], repeats: int = 5, warmup: int = 1,
+                   meta: Optional[Dict[str, Any]] = None, progress: bool = True) -> Dict[str, Any]:
+    """Run every benchmark and return a result document (the baseline file format)"""
+    results = {}
+    for benchmark in benchmarks:
+        results[benchmark.name] = benchmark.run(repeats=repeats, warmup=warmup)
+        if progress:
+            sys.stderr.write(f"{benchmark.name:<48} {results[benchmark.name]['best_us']:>12.3f} µs/op\n")
+    return {
+        'meta': dict(meta or {}, **{
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'platform': platform.platform()
+        }),
+        'benchmarks': results
+    }
+
+
+def save_results(document: Dict[str, Any], path: str) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10,
+                    metric: str = 'best_us') -> List[Dict[str, Any]]:
+    """
+    Compare two result documents benchmark by benchmark. A benchmark slower than
+    its baseline by more than `threshold` (0.10 = +10%) is a regression, faster
+    by more than `threshold` an improvement.
+    """
+    base = baseline.get('benchmarks', {})
+    new = current.get('benchmarks', {})
+    rows = []
+    for name in sorted(set(base) | set(new)):
+        before = base.get(name, {}).get(metric)
+        after = new.get(name, {}).get(metric)
+        if before is None or after is None:
+            rows.append({'name': name, 'baseline': before, 'current': after, 'change': None,
+                         'status': 'new' if before is None else 'missing'})
+            continue
+        change = (after - before) / before if before else 0.0
+        if change > threshold:
+            status = 'regression'
+        elif change < -threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'baseline': before, 'current': after, 'change': round(change, 4), 'status': status})
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]], metric: str = 'best_us') -> str:
+    """Aligned text table of a comparison"""
+    lines = [f"{'benchmark':<48} {'baseline ' + metric:>18} {'current ' + metric:>18} {'change':>9}  status"]
+    for row in rows:
+        before = f"{row['baseline']:.3f}" if row['baseline'] is not None else '-'
+        after = f"{row['current']:.3f}" if row['current'] is not None else '-'
+        change = f"{row['change'] * 100:+.1f}%" if row['change'] is not None else '-'
+        marker = '❌ ' if row['status'] == 'regression' else ''
+        lines.append(f"{row['name']:<48} {before:>18} {after:>18} {change:>9}  {marker}{row['status']}")
+    return '\n'.join(lines)
@@ -0,0 +1,90 @@
+"""
+Microbenchmarks of the per-message hot paths over the fixed corpus
+
+card_predictor.py: extract_game_number, find_missing_color, _verify_prediction_common
+config.py (Telethon bot): its verification path, benchmarked on the functions it
+calls (count_suits, VerificationEngine.verify). config.py itself is not imported:
+it exits at import without its Telethon credentials.
+"""
+
+from typing import Any, List
+
+from card_predictor import CardPredictor
+from game_message import parse_game_message, count_suits, SUITS
+from verification import VerificationEngine
+from benchmarks.corpus import Event, corpus_texts
+from benchmarks.harness import Benchmark
+
+
+def _final_texts(texts: List[str]) -> List[str]:
+    return [text for text in texts if parse_game_message(text).has_completion]
+
+
+def _seeded_predictor(finals: List[str]) -> CardPredictor:
+    """Predictor holding one pending prediction every other finalized game, 0 to 3 games ahead"""
+    predictor = CardPredictor()
+    for index, text in enumerate(finals[::2]):
+        game_number = parse_game_message(text).game_number
+        costume = SUITS[index % len(SUITS)]
+        predictor.make_prediction(game_number, (costume, index % 4))
+    return predictor
+
+
+def micro_benchmarks(corpus: List[Event]) -> List[Benchmark]:
+    texts = corpus_texts(corpus)
+    finals = _final_texts(texts)
+    predictor = CardPredictor()
+
+    def extract_game_number(_: Any) -> None:
+        for text in texts:
+            predictor.extract_game_number(text)
+
+    def find_missing_color(_: Any) -> None:
+        for text in finals:
+            predictor.find_missing_color(text)
+
+    def verify_prediction_common(seeded: CardPredictor) -> None:
+        for text in finals:
+            seeded._verify_prediction_common(text, is_edited=True)
+
+    benchmarks = [
+        Benchmark('card_predictor.extract_game_number', extract_game_number, len(texts)),
+        Benchmark('card_predictor.find_missing_color', find_missing_color, len(finals)),
+        Benchmark('card_predictor._verify_prediction_common', verify_prediction_common, len(finals),
+                  setup=lambda: _seeded_predictor(finals)),
+    ]
+
+    benchmarks.extend(verification_benchmarks(finals))
+    return benchmarks
+
+
+def verification_benchmarks(finals: List[str]) -> List[Benchmark]:
+    """
+    The Telethon bot's check_prediction_result hot path, on the code it calls:
+    count_suits on the first group, then VerificationEngine.verify
+    """
+    checks = []
+    for text in finals:
+        parsed = parse_game_message(text)
+        if parsed.groups and parsed.game_number:
+            checks.append((parsed.game_number, parsed.groups[0]))
+
+    def count_first_groups(_: Any) -> None:
+        for _, first_group in checks:
+            count_suits(first_group)
+
+    def setup_engine() -> VerificationEngine:
+        # One prediction tracked every other game, as config.py does when it posts one
+        engine = VerificationEngine()
+        for index, (game_number, _) in enumerate(checks[::2]):
+            engine.track(game_number, SUITS[index % len(SUITS)])
+        return engine
+
+    def verify(engine: VerificationEngine) -> None:
+        for game_number, first_group in checks:
+            engine.verify(game_number, count_suits(first_group))
+
+    return [
+        Benchmark('verification.count_suits', count_first_groups, len(checks)),
+        Benchmark('verification.VerificationEngine.verify', verify, len(checks), setup=setup_engine),
+    ]
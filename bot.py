@@ -8,14 +8,17 @@ import requests
 import json
 from typing import Dict, Any
 from handlers import TelegramHandlers
-from card_predictor import card_predictor
+from telegram_api import get_transport
+from outbound import get_dispatcher
 
 logger = logging.getLogger(__name__)
 
 class TelegramBot:
     def __init__(self, token: str):
         self.token = token
-        self.base_url = f"https://api.telegram.org/bot{token}"
+        self.transport = get_transport(token)
+        self.dispatcher = get_dispatcher(token)
+        self.base_url = self.transport.base_url
         self.deployment_file_path = "final2025.zip"
         # Initialize advanced handlers
         self.handlers = TelegramHandlers(token)
@@ -23,19 +26,11 @@ class TelegramBot:
     def handle_update(self, update: Dict[str, Any]) -> None:
         """Handle incoming Telegram update with advanced features for webhook mode"""
         try:
-            # Log avec type de message
-            if 'message' in update:
-                logger.info(f"🔄 Bot traite message normal via webhook")
-            elif 'edited_message' in update:
-                logger.info(f"🔄 Bot traite message édité via webhook")
-            
-            logger.info(f"Received update: {json.dumps(update, indent=2)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Received update: {json.dumps(update, indent=2)}")
 
             # Use the advanced handlers for processing (they handle card predictions too)
             self.handlers.handle_update(update)
-            
-            # Log succès du traitement
-            logger.info(f"✅ Update traité avec succès via webhook")
 
         except Exception as e:
             logger.error(f"❌ Error handling update via webhook: {e}")
@@ -49,6 +44,7 @@ class TelegramBot:
             # Only process card predictions in groups/channels
             if chat_type in ['group', 'supergroup', 'channel'] and 'text' in message:
                 text = message['text']
+                card_predictor = self.handlers.card_predictor
 
                 # Check if we should make a prediction
                 should_predict, game_number, prediction_data = card_predictor.should_predict(text)
@@ -120,15 +116,13 @@ class TelegramBot:
     def send_message(self, chat_id: int, text: str) -> bool:
         """Send text message to user"""
         try:
-            url = f"{self.base_url}/sendMessage"
             data = {
                 'chat_id': chat_id,
                 'text': text,
                 'parse_mode': 'HTML'
             }
 
-            response = requests.post(url, json=data, timeout=10)
-            result = response.json()
+            result = self.dispatcher.call('sendMessage', data, chat_id=chat_id)
 
             if result.get('ok'):
                 logger.info(f"Message sent successfully to chat {chat_id}")
@@ -147,8 +141,6 @@ class TelegramBot:
     def send_document(self, chat_id: int, file_path: str) -> bool:
         """Send document file to user"""
         try:
-            url = f"{self.base_url}/sendDocument"
-
             with open(file_path, 'rb') as file:
                 files = {
                     'document': (os.path.basename(file_path), file, 'application/zip')
@@ -158,8 +150,7 @@ class TelegramBot:
                     'caption': '📦 Deployment Package for render.com'
                 }
 
-                response = requests.post(url, data=data, files=files, timeout=60)
-                result = response.json()
+                result = self.dispatcher.call('sendDocument', data, chat_id=chat_id, files=files, timeout=60)
 
                 if result.get('ok'):
                     logger.info(f"Document sent successfully to chat {chat_id}")
@@ -181,14 +172,12 @@ class TelegramBot:
     def set_webhook(self, webhook_url: str) -> bool:
         """Set webhook URL for the bot"""
         try:
-            url = f"{self.base_url}/setWebhook"
             data = {
                 'url': webhook_url,
                 'allowed_updates': ['message', 'edited_message']
             }
 
-            response = requests.post(url, json=data, timeout=10)
-            result = response.json()
+            result = self.dispatcher.call('setWebhook', data)
 
             if result.get('ok'):
                 logger.info(f"Webhook set successfully: {webhook_url}")
@@ -207,9 +196,7 @@ class TelegramBot:
     def get_bot_info(self) -> Dict[str, Any]:
         """Get bot information"""
         try:
-            url = f"{self.base_url}/getMe"
-            response = requests.get(url, timeout=30)
-            result = response.json()
+            result = self.dispatcher.call('getMe', {}, timeout=30)
 
             if result.get('ok'):
                 return result.get('result', {})
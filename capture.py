@@ -0,0 +1,172 @@
+"""
+Opt-in capture of raw webhook updates to rotating, compressed, append-only logs
+"""
+
+import os
+import gzip
+import json
+import time
+import queue
+import struct
+import logging
+import threading
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+CAPTURE_DIR = os.getenv('CAPTURE_DIR', '')  # empty: capture disabled
+CAPTURE_ROTATE_BYTES = int(os.getenv('CAPTURE_ROTATE_BYTES', str(32 * 1024 * 1024)))  # uncompressed bytes per file
+CAPTURE_QUEUE_SIZE = int(os.getenv('CAPTURE_QUEUE_SIZE', '10000'))
+CAPTURE_FLUSH_INTERVAL = float(os.getenv('CAPTURE_FLUSH_INTERVAL', '1.0'))  # seconds
+
+# Each record: arrival timestamp (float64), payload length (uint32), raw update bytes
+RECORD_HEADER = struct.Struct('<dI')
+CAPTURE_SUFFIX = '.capture.gz'
+
+
+class UpdateCapture:
+    """
+    Tap recording every raw update with its arrival time.
+
+    record() only enqueues (the request thread never touches the disk); a
+    writer thread appends records to a gzip file, flushed every
+    `flush_interval` seconds so a crash loses at most the last interval,
+    and starts a new file once `rotate_bytes` of raw data have been written.
+    When the queue is full, records are dropped and counted.
+    """
+
+    def __init__(self, directory: str, rotate_bytes: int = CAPTURE_ROTATE_BYTES,
+                 max_queue: int = CAPTURE_QUEUE_SIZE, flush_interval: float = CAPTURE_FLUSH_INTERVAL):
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue: "queue.Queue[Optional[Tuple[float, bytes]]]" = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._file_bytes = 0
+        self._sequence = 0
+        self.current_path: Optional[str] = None
+        self.recorded_count = 0
+        self.dropped_count = 0
+        self.files_count = 0
+
+        self._thread = threading.Thread(target=self._run, name="update-capture", daemon=True)
+        self._thread.start()
+        logger.info(f"📼 Capture des updates activée dans {directory}")
+
+    def record(self, raw: bytes, ts: Optional[float] = None) -> bool:
+        """Enqueue one raw update (never blocks), returns False if it was dropped"""
+        try:
+            self._queue.put_nowait((ts if ts is not None else time.time(), raw))
+            return True
+        except queue.Full:
+            self.dropped_count += 1
+            return False
+
+    def close(self) -> None:
+        """Write everything still queued and close the current file"""
+        self._queue.put(None)
+        self._thread.join(10)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return capture counters"""
+        return {
+            'recorded': self.recorded_count,
+            'dropped': self.dropped_count,
+            'queued': self._queue.qsize(),
+            'files': self.files_count,
+            'current_file': self.current_path
+        }
+
+    def _open_next(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._sequence += 1
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self._sequence:04d}{CAPTURE_SUFFIX}"
+        self.current_path = os.path.join(self.directory, name)
+        self._file = gzip.open(self.current_path, 'wb')
+        self._file_bytes = 0
+        self.files_count += 1
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            # Drain everything already queued into the same write burst
+            while batch and len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+            try:
+                if batch:
+                    self._write(batch)
+                if self._file is not None and (stopping or time.monotonic() - last_flush >= self.flush_interval):
+                    self._file.flush()
+                    last_flush = time.monotonic()
+            except Exception as e:
+                logger.error(f"❌ Erreur écriture capture: {e}")
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, batch: List[Tuple[float, bytes]]) -> None:
+        for ts, raw in batch:
+            if self._file is None or self._file_bytes >= self.rotate_bytes:
+                self._open_next()
+            self._file.write(RECORD_HEADER.pack(ts, len(raw)))
+            self._file.write(raw)
+            self._file_bytes += RECORD_HEADER.size + len(raw)
+            self.recorded_count += 1
+
+
+def capture_files(path: str) -> List[str]:
+    """Capture files of a directory in recording order (or [path] for a single file)"""
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(CAPTURE_SUFFIX))
+    return [path]
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, bytes]]:
+    """Stream (arrival timestamp, raw update bytes) from a capture file or directory, in order"""
+    for file_path in capture_files(path):
+        try:
+            with gzip.open(file_path, 'rb') as f:
+                while True:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    ts, length = RECORD_HEADER.unpack(header)
+                    raw = f.read(length)
+                    if len(raw) < length:
+                        break
+                    yield ts, raw
+        except (EOFError, OSError) as e:
+            # File still being written or cut by a crash: keep what was flushed
+            logger.warning(f"⚠️ Capture tronquée {file_path}: {e}")
+
+
+def read_updates(path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Stream (arrival timestamp, decoded update) from a capture, skipping undecodable payloads"""
+    for ts, raw in read_capture(path):
+        try:
+            yield ts, json.loads(raw)
+        except ValueError:
+            logger.warning("⚠️ Update capturé illisible ignoré")
+
+
+def create_capture_from_env() -> Optional[UpdateCapture]:
+    """Capture tap configured by CAPTURE_DIR, or None when capture is disabled"""
+    if not CAPTURE_DIR:
+        return None
+    return UpdateCapture(CAPTURE_DIR)
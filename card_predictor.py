@@ -2,13 +2,25 @@
 Card prediction logic for Joker's Telegram Bot - simplified for webhook deployment
 """
 
-import re
 import logging
+import functools
+import threading
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Tuple, Any
+from typing import Optional, Dict, List, Tuple, Any, Union, Callable
 import time
 import os
-import json
+from prediction_store import PredictionStore
+from dedup import SlidingDedup
+from ttl_store import TTLStore, ttl_sweeper
+from state_journal import StateJournal, STATE_JOURNAL_ENABLED
+from metrics import predictions_made, prediction_wins, prediction_losses
+from stats import prediction_stats
+from game_message import (
+    ParsedGameMessage, ensure_parsed, lookup_missing_color,
+    SUITS, SUIT_BITS, COMPLETION_INDICATORS
+)
+
+GameMessage = Union[str, ParsedGameMessage]
 
 logger = logging.getLogger(__name__)
 
@@ -27,25 +39,133 @@ TARGET_CHANNEL_ID = -1002682552255
 # Target channel ID for predictions and updates
 PREDICTION_CHANNEL_ID = -1002875505624
 
+def _locked(method: Callable) -> Callable:
+    """Run a CardPredictor method under the shard lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def find_missing_color(message: GameMessage) -> Optional[Tuple[str, int]]:
+    """
+    NOUVELLE RÈGLE: Trouver la couleur manquante dans les 2 premiers groupes
+    CONDITION: Chaque groupe doit contenir exactement 2 cartes
+    Returns: (missing_color, prediction_offset) ou None
+
+    Règles de distance:
+    - ♣️ (trèfle) manque → +4
+    - ♦️ (carreau) manque → +4
+    - ♠️ (pique) manque → +2
+    - ♥️ (cœur) manque → +2
+
+    Shared by CardPredictor and the missing_color strategy rule.
+    """
+    # Groupes déjà extraits et normalisés (❤️ → ♥️) par le parseur
+    parsed = ensure_parsed(message)
+
+    if len(parsed.groups) < 2:
+        logger.info(f"🔮 COULEUR MANQUANTE - Moins de 2 groupes trouvés")
+        return None
+
+    logger.info(f"🔮 ANALYSE - Groupe 1: {parsed.groups[0]}")
+    logger.info(f"🔮 ANALYSE - Groupe 2: {parsed.groups[1]}")
+
+    # VÉRIFICATION OBLIGATOIRE: Compter TOUTES les cartes (occurrences) dans chaque groupe
+    group1_card_count = parsed.card_count(0)
+    group2_card_count = parsed.card_count(1)
+
+    logger.info(f"🔮 COMPTAGE - Groupe 1: {group1_card_count} cartes, Groupe 2: {group2_card_count} cartes")
+
+    # VALIDATION: Chaque groupe doit avoir EXACTEMENT 2 cartes
+    if group1_card_count != 2:
+        logger.info(f"🔮 ❌ REJETÉ - Groupe 1 n'a pas exactement 2 cartes ({group1_card_count} trouvées)")
+        return None
+
+    if group2_card_count != 2:
+        logger.info(f"🔮 ❌ REJETÉ - Groupe 2 n'a pas exactement 2 cartes ({group2_card_count} trouvées)")
+        return None
+
+    logger.info(f"🔮 ✅ VALIDATION - Chaque groupe a exactement 2 cartes")
+
+    # Couleur manquante et offset (♣️/♦️ → +4, ♠️/♥️ → +2) lus dans la table précalculée
+    result = lookup_missing_color(parsed.group_suit_counts[0], parsed.group_suit_counts[1])
+    if result is None:
+        present_mask = parsed.group_masks[0] | parsed.group_masks[1]
+        missing_colors = [color for color, bit in zip(SUITS, SUIT_BITS) if not present_mask & bit]
+        logger.info(f"🔮 COULEUR MANQUANTE - Pas exactement 1 couleur manquante: {missing_colors}")
+        return None
+
+    missing_color, prediction_offset = result
+    logger.info(f"🔮 ✅ COULEUR MANQUANTE TROUVÉE: {missing_color} → Prédire à +{prediction_offset}")
+    return (missing_color, prediction_offset)
+
+
+def is_missing_color_source(parsed: ParsedGameMessage) -> bool:
+    """
+    Games the missing-color rule looks at: #R without #X (match nul).
+    Shared by CardPredictor.should_predict and the missing_color strategy rule.
+    """
+    game_number = parsed.game_number
+
+    # ANALYSE EXCLUSIVE: SEULEMENT les messages avec #R
+    if not parsed.has_r_tag:
+        logger.info(f"🔮 EXCLUSION - Jeu {game_number}: Ne contient pas #R, pas de prédiction")
+        return False
+
+    logger.info(f"🔮 ✅ MESSAGE #R DÉTECTÉ - Jeu {game_number}: Analyse activée")
+
+    # Exclure #X (match nul) même avec #R
+    if parsed.has_x_tag:
+        logger.info(f"🔮 EXCLUSION - Jeu {game_number}: Contient #X (match nul), pas de prédiction")
+        return False
+
+    return True
+
+
 class CardPredictor:
     """Handles card prediction logic for webhook deployment"""
 
-    def __init__(self):
-        self.predictions = {}  # Store predictions for verification
-        self.processed_messages = set()  # Avoid duplicate processing
+    def __init__(self, state_name: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.clock = clock  # Injected in backtests so cooldowns follow the recorded timeline
+        # Shard lock: updates, outbound send callbacks, admin commands and stats readers run on different threads
+        self.lock = threading.RLock()
+        self.predictions = PredictionStore()  # Pending predictions indexed by target game + bounded archive
+        self.processed_messages = SlidingDedup(clock=clock)  # Avoid duplicate processing (bounded window)
         self.sent_predictions = {}  # Store sent prediction messages for editing
-        self.temporary_messages = {}  # Store temporary messages waiting for final edit
-        self.pending_edits = {}  # Store messages waiting for edit with indicators
+        self.temporary_messages = TTLStore(clock=clock)  # Store temporary messages waiting for final edit (expire after TTL)
+        self.pending_edits = TTLStore(clock=clock)  # Store messages waiting for edit with indicators (expire after TTL)
         self.position_preference = 1  # Default position preference (1 = first card, 2 = second card)
         self.redirect_channels = {}  # Store redirection channels for different chats
-        self.last_prediction_time = self._load_last_prediction_time()  # Load persisted timestamp
+        self.last_prediction_time = 0
         self.prediction_cooldown = 30   # Cooldown period in seconds between predictions
+        self.verification_depth = 3  # Predictions are verified on games N..N+depth
+        self.metrics_source = state_name or 'card_predictor'  # `source` label of the prediction metrics
+
+        # Live instances: background sweeping of expired messages
+        if state_name:
+            ttl_sweeper.register(f"temporary_messages@{state_name}", self.temporary_messages)
+            ttl_sweeper.register(f"pending_edits@{state_name}", self.pending_edits)
+
+        # Without the journal, the cooldown timestamp is kept in a file (one per shard)
+        self.timestamp_path: Optional[str] = None
+        if state_name:
+            self.timestamp_path = '.last_prediction_time' if state_name == 'card_predictor' else f".last_prediction_time_{state_name}"
+
+        # Durable state: mutations are journaled, state is restored from snapshot + journal
+        self.journal: Optional[StateJournal] = None
+        if state_name and STATE_JOURNAL_ENABLED:
+            self.journal = StateJournal(state_name, state_lock=self.lock)
+            self._restore_state()
+        elif state_name:
+            self.last_prediction_time = self._load_last_prediction_time()  # Load persisted timestamp
 
     def _load_last_prediction_time(self) -> float:
-        """Load last prediction timestamp from file"""
+        """Load last prediction timestamp from file (used when the state journal is disabled)"""
         try:
-            if os.path.exists('.last_prediction_time'):
-                with open('.last_prediction_time', 'r') as f:
+            if os.path.exists(self.timestamp_path):
+                with open(self.timestamp_path, 'r') as f:
                     timestamp = float(f.read().strip())
                     logger.info(f"⏰ PERSISTANCE - Dernière prédiction chargée: {time.time() - timestamp:.1f}s écoulées")
                     return timestamp
@@ -54,13 +174,99 @@ class CardPredictor:
         return 0
 
     def _save_last_prediction_time(self):
-        """Save last prediction timestamp to file"""
+        """Persist last prediction timestamp: journaled, or written to its file when the journal is disabled"""
+        if self.journal is not None:
+            self._journal('last_prediction_time', self.last_prediction_time)
+            return
+        if self.timestamp_path is None:
+            return
         try:
-            with open('.last_prediction_time', 'w') as f:
+            with open(self.timestamp_path, 'w') as f:
                 f.write(str(self.last_prediction_time))
         except Exception as e:
             logger.warning(f"⚠️ Impossible de sauvegarder le timestamp: {e}")
 
+    def _journal(self, op: str, *args: Any) -> None:
+        """Record one state mutation, snapshotting once the journal grows past its threshold"""
+        if self.journal is None:
+            return
+        self.journal.append(op, *args)
+        if self.journal.needs_snapshot():
+            # Written by the journal's writer thread, off the update path
+            self.journal.request_snapshot(self._export_state)
+
+    @_locked
+    def _export_state(self) -> Dict[str, Any]:
+        """Durable part of the predictor state, as a JSON-serializable dict"""
+        return {
+            'predictions': [[game, dict(prediction)] for game, prediction in list(self.predictions.pending.items())],
+            'archive': [[game, dict(prediction)] for game, prediction in list(self.predictions.archive.items())],
+            'sent_predictions': [[game, info] for game, info in list(self.sent_predictions.items())],
+            'redirect_channels': [[source, target] for source, target in list(self.redirect_channels.items())],
+            'position_preference': self.position_preference,
+            'prediction_cooldown': self.prediction_cooldown,
+            'last_prediction_time': self.last_prediction_time
+        }
+
+    def _restore_state(self) -> None:
+        """Rebuild state from the last snapshot and replay the journal written after it"""
+        snapshot, records = self.journal.load()
+        if snapshot:
+            for game, prediction in snapshot.get('archive', []):
+                self.predictions[int(game)] = prediction
+            for game, prediction in snapshot.get('predictions', []):
+                self.predictions[int(game)] = prediction
+            for game, info in snapshot.get('sent_predictions', []):
+                self.sent_predictions[int(game)] = info
+            for source, target in snapshot.get('redirect_channels', []):
+                self.redirect_channels[int(source)] = int(target)
+            self.position_preference = snapshot.get('position_preference', self.position_preference)
+            self.prediction_cooldown = snapshot.get('prediction_cooldown', self.prediction_cooldown)
+            self.last_prediction_time = snapshot.get('last_prediction_time', 0)
+
+        for record in records:
+            try:
+                self._apply_record(record[0], record[1:])
+            except Exception as e:
+                logger.warning(f"⚠️ Enregistrement de journal ignoré {record!r}: {e}")
+
+        if snapshot or records:
+            logger.info(f"💾 État restauré: {len(self.predictions.pending)} prédiction(s) en attente, "
+                        f"{len(records)} enregistrement(s) rejoué(s)")
+
+    def _apply_record(self, op: str, args: List[Any]) -> None:
+        """Apply one journaled mutation (every operation is an idempotent set)"""
+        if op in ('prediction', 'resolved'):
+            self.predictions[int(args[0])] = args[1]
+        elif op == 'sent':
+            self.sent_predictions[int(args[0])] = {'chat_id': args[1], 'message_id': args[2]}
+        elif op == 'sent_clear':
+            self.sent_predictions.clear()
+        elif op == 'redirect':
+            self.redirect_channels[int(args[0])] = int(args[1])
+        elif op == 'redirect_clear':
+            self.redirect_channels.clear()
+        elif op == 'position':
+            self.position_preference = args[0]
+        elif op == 'cooldown':
+            self.prediction_cooldown = args[0]
+        elif op == 'last_prediction_time':
+            self.last_prediction_time = args[0]
+        elif op == 'reset':
+            self.predictions.clear()
+            self.sent_predictions.clear()
+            if not args[0]:
+                self.redirect_channels.clear()
+            self.last_prediction_time = 0
+        else:
+            logger.warning(f"⚠️ Opération de journal inconnue: {op}")
+
+    def close(self) -> None:
+        """Flush pending journal records (called on shutdown)"""
+        if self.journal is not None:
+            self.journal.close()
+
+    @_locked
     def reset_predictions(self):
         """Reset all prediction states - useful for recalibration"""
         self.predictions.clear()
@@ -69,26 +275,55 @@ class CardPredictor:
         self.temporary_messages.clear()
         self.pending_edits.clear()
         self.last_prediction_time = 0
-        self._save_last_prediction_time()
+        self._journal('reset', True)
         logger.info("🔄 Système de prédictions réinitialisé")
 
+    @_locked
     def set_position_preference(self, position: int):
         """Set the position preference for card selection (1 or 2)"""
         if position in [1, 2]:
             self.position_preference = position
+            self._journal('position', position)
             logger.info(f"🎯 Position de carte mise à jour : {position}")
         else:
             logger.warning(f"⚠️ Position invalide : {position}. Utilisation de la position par défaut (1).")
 
+    @_locked
     def set_redirect_channel(self, source_chat_id: int, target_chat_id: int):
         """Set redirection channel for predictions from a source chat"""
         self.redirect_channels[source_chat_id] = target_chat_id
+        self._journal('redirect', source_chat_id, target_chat_id)
         logger.info(f"📤 Redirection configurée : {source_chat_id} → {target_chat_id}")
 
+    @_locked
+    def clear_redirect_channels(self):
+        """Remove every configured redirection"""
+        self.redirect_channels.clear()
+        self._journal('redirect_clear')
+
+    @_locked
+    def set_prediction_cooldown(self, seconds: int):
+        """Set the cooldown period between predictions"""
+        self.prediction_cooldown = seconds
+        self._journal('cooldown', seconds)
+
+    @_locked
+    def record_sent_prediction(self, target_game: int, chat_id: int, message_id: int):
+        """Remember where a prediction message was posted so it can be edited later"""
+        self.sent_predictions[target_game] = {'chat_id': chat_id, 'message_id': message_id}
+        self._journal('sent', target_game, chat_id, message_id)
+
+    @_locked
+    def clear_sent_predictions(self):
+        """Forget every posted prediction message"""
+        self.sent_predictions.clear()
+        self._journal('sent_clear')
+
     def get_redirect_channel(self, source_chat_id: int) -> int:
         """Get redirect channel for a source chat, fallback to PREDICTION_CHANNEL_ID"""
         return self.redirect_channels.get(source_chat_id, PREDICTION_CHANNEL_ID)
 
+    @_locked
     def reset_all_predictions(self):
         """Reset all predictions and redirect channels"""
         self.predictions.clear()
@@ -98,67 +333,61 @@ class CardPredictor:
         self.pending_edits.clear()
         self.redirect_channels.clear()
         self.last_prediction_time = 0
-        self._save_last_prediction_time()
+        self._journal('reset', False)
         logger.info("🔄 Toutes les prédictions et redirections ont été supprimées")
 
-    def extract_game_number(self, message: str) -> Optional[int]:
+    def mark_finalized(self, message_id: Optional[int]) -> None:
+        """Forget a source message once its final version (✅/🔰) has been received"""
+        if message_id is None:
+            return
+        self.temporary_messages.pop(message_id, None)
+        self.pending_edits.pop(message_id, None)
+
+    def awaiting_finalization(self) -> Dict[str, int]:
+        """Number of in-flight source messages still waiting for their final edit"""
+        temporary = len(self.temporary_messages)
+        pending = len(self.pending_edits)
+        return {'temporary_messages': temporary, 'pending_edits': pending, 'total': temporary + pending}
+
+    def extract_game_number(self, message: GameMessage) -> Optional[int]:
         """Extract game number from message like #n744 or #N744"""
-        pattern = r'#[nN](\d+)'
-        match = re.search(pattern, message)
-        if match:
-            return int(match.group(1))
-        return None
+        return ensure_parsed(message).game_number
 
     def extract_cards_from_parentheses(self, message: str) -> List[str]:
         """Extract cards from first and second parentheses"""
         # This method is deprecated, use extract_card_symbols_from_parentheses instead
         return []
 
-    def has_pending_indicators(self, text: str) -> bool:
+    def has_pending_indicators(self, text: GameMessage) -> bool:
         """Check if message contains indicators suggesting it will be edited"""
-        indicators = ['⏰', '▶', '🕐', '➡️']
-        return any(indicator in text for indicator in indicators)
+        return ensure_parsed(text).has_pending
 
-    def has_completion_indicators(self, text: str) -> bool:
+    def has_completion_indicators(self, text: GameMessage) -> bool:
         """Check if message contains completion indicators after edit - ✅ OR 🔰 indicates completion"""
-        completion_indicators = ['✅', '🔰']
-        has_indicator = any(indicator in text for indicator in completion_indicators)
-        if has_indicator:
-            indicator_found = next(ind for ind in completion_indicators if ind in text)
-            logger.info(f"🔍 FINALISATION DÉTECTÉE - Indicateur {indicator_found} trouvé dans: {text[:100]}...")
-        return has_indicator
-
-    def should_wait_for_edit(self, text: str, message_id: int) -> bool:
+        parsed = ensure_parsed(text)
+        if parsed.has_completion:
+            indicator_found = next(ind for ind in COMPLETION_INDICATORS if ind in parsed.text)
+            logger.info(f"🔍 FINALISATION DÉTECTÉE - Indicateur {indicator_found} trouvé dans: {parsed.text[:100]}...")
+        return parsed.has_completion
+
+    def should_wait_for_edit(self, text: GameMessage, message_id: int) -> bool:
         """Determine if we should wait for this message to be edited"""
-        if self.has_pending_indicators(text):
+        parsed = ensure_parsed(text)
+        if parsed.has_pending:
             # Store this message as pending edit
             self.pending_edits[message_id] = {
-                'original_text': text,
+                'original_text': parsed.text,
                 'timestamp': datetime.now()
             }
             return True
         return False
 
-    def extract_card_symbols_from_parentheses(self, text: str) -> List[List[str]]:
+    def extract_card_symbols_from_parentheses(self, text: GameMessage) -> List[List[str]]:
         """Extract unique card symbols from each parentheses section"""
-        # Find all parentheses content
-        pattern = r'\(([^)]+)\)'
-        matches = re.findall(pattern, text)
-
-        all_sections = []
-        for match in matches:
-            # Normalize ❤️ to ♥️ for consistency
-            normalized_content = match.replace("❤️", "♥️")
-
-            # Extract only unique card symbols (costumes) from this section
-            unique_symbols = set()
-            for symbol in ["♠️", "♥️", "♦️", "♣️"]:
-                if symbol in normalized_content:
-                    unique_symbols.add(symbol)
-
-            all_sections.append(list(unique_symbols))
-
-        return all_sections
+        return [
+            [symbol for symbol, count in zip(SUITS, counts) if count]
+            for counts in ensure_parsed(text).group_suit_counts
+        ]
 
     def has_three_different_cards(self, cards: List[str]) -> bool:
         """Check if there are exactly 3 different card symbols"""
@@ -166,18 +395,16 @@ class CardPredictor:
         logger.info(f"Checking cards: {cards}, unique: {unique_cards}, count: {len(unique_cards)}")
         return len(unique_cards) == 3
 
-    def is_temporary_message(self, message: str) -> bool:
+    def is_temporary_message(self, message: GameMessage) -> bool:
         """Check if message contains temporary progress emojis"""
-        temporary_emojis = ['⏰', '▶', '🕐', '➡️']
-        return any(emoji in message for emoji in temporary_emojis)
+        return ensure_parsed(message).has_pending
 
-    def is_final_message(self, message: str) -> bool:
+    def is_final_message(self, message: GameMessage) -> bool:
         """Check if message contains final completion emojis - NOW ONLY 🔰"""
-        final_emojis = ['🔰']
-        is_final = any(emoji in message for emoji in final_emojis)
-        if is_final:
-            logger.info(f"🔍 MESSAGE FINAL DÉTECTÉ - Emoji 🔰 trouvé dans: {message[:100]}...")
-        return is_final
+        parsed = ensure_parsed(message)
+        if parsed.has_final:
+            logger.info(f"🔍 MESSAGE FINAL DÉTECTÉ - Emoji 🔰 trouvé dans: {parsed.text[:100]}...")
+        return parsed.has_final
 
     def get_card_combination(self, cards: List[str]) -> Optional[str]:
         """Get the combination of 3 different cards"""
@@ -197,24 +424,19 @@ class CardPredictor:
             return combination
         return None
 
-    def extract_costumes_from_second_parentheses(self, message: str) -> List[str]:
+    def extract_costumes_from_second_parentheses(self, message: GameMessage) -> List[str]:
         """Extract only costumes from exactly 3 cards in the second parentheses"""
-        # Find all parentheses content
-        pattern = r'\(([^)]+)\)'
-        matches = re.findall(pattern, message)
+        parsed = ensure_parsed(message)
 
-        if len(matches) < 2:
+        if len(parsed.groups) < 2:
             return []
 
-        second_parentheses = matches[1]  # Second parentheses (index 1)
-        logger.info(f"Deuxième parenthèses contenu: {second_parentheses}")
+        # Second parentheses (index 1), ❤️ already normalized to ♥️
+        normalized_content = parsed.groups[1]
+        logger.info(f"Deuxième parenthèses contenu: {normalized_content}")
 
-        # Extract only costume symbols (♠️, ♥️, ♦️, ♣️, ❤️)
+        # Extract only costume symbols (♠️, ♥️, ♦️, ♣️)
         costumes = []
-        costume_symbols = ["♠️", "♥️", "♦️", "♣️", "❤️"]
-
-        # Normalize ❤️ to ♥️ for consistency
-        normalized_content = second_parentheses.replace("❤️", "♥️")
 
         # Find all costume symbols in order of appearance
         for char_pos in range(len(normalized_content) - 1):
@@ -225,90 +447,13 @@ class CardPredictor:
         logger.info(f"Costumes extraits de la deuxième parenthèse: {costumes}")
         return costumes
 
-    def find_missing_color(self, message: str) -> Optional[Tuple[str, int]]:
-        """
-        NOUVELLE RÈGLE: Trouver la couleur manquante dans les 2 premiers groupes
-        CONDITION: Chaque groupe doit contenir exactement 2 cartes
-        Returns: (missing_color, prediction_offset) ou None
-
-        Règles de distance:
-        - ♣️ (trèfle) manque → +4
-        - ♦️ (carreau) manque → +4
-        - ♠️ (pique) manque → +2
-        - ♥️ (cœur) manque → +2
-        """
-        # Normaliser ❤️ vers ♥️
-        normalized_message = message.replace("❤️", "♥️")
-
-        # Extraire les 2 premiers groupes de parenthèses
-        pattern = r'\(([^)]+)\)'
-        matches = re.findall(pattern, normalized_message)
-
-        if len(matches) < 2:
-            logger.info(f"🔮 COULEUR MANQUANTE - Moins de 2 groupes trouvés")
-            return None
-
-        first_group = matches[0]
-        second_group = matches[1]
-
-        logger.info(f"🔮 ANALYSE - Groupe 1: {first_group}")
-        logger.info(f"🔮 ANALYSE - Groupe 2: {second_group}")
-
-        # VÉRIFICATION OBLIGATOIRE: Compter TOUTES les cartes (occurrences) dans chaque groupe
-        all_colors = ["♠️", "♥️", "♦️", "♣️"]
-
-        # Compter le nombre TOTAL d'occurrences de couleurs dans le groupe 1
-        group1_card_count = sum(first_group.count(color) for color in all_colors)
-        # Compter le nombre TOTAL d'occurrences de couleurs dans le groupe 2
-        group2_card_count = sum(second_group.count(color) for color in all_colors)
-
-        logger.info(f"🔮 COMPTAGE - Groupe 1: {group1_card_count} cartes, Groupe 2: {group2_card_count} cartes")
-
-        # VALIDATION: Chaque groupe doit avoir EXACTEMENT 2 cartes
-        if group1_card_count != 2:
-            logger.info(f"🔮 ❌ REJETÉ - Groupe 1 n'a pas exactement 2 cartes ({group1_card_count} trouvées)")
-            return None
-
-        if group2_card_count != 2:
-            logger.info(f"🔮 ❌ REJETÉ - Groupe 2 n'a pas exactement 2 cartes ({group2_card_count} trouvées)")
-            return None
-
-        logger.info(f"🔮 ✅ VALIDATION - Chaque groupe a exactement 2 cartes")
-
-        # Combiner les couleurs des 2 premiers groupes
-        combined = first_group + second_group
-
-        # Trouver les couleurs présentes
-        all_colors_set = {"♠️", "♥️", "♦️", "♣️"}
-        present_colors = set()
-
-        for color in all_colors_set:
-            if color in combined:
-                present_colors.add(color)
-
-        # Trouver la couleur manquante
-        missing_colors = all_colors_set - present_colors
-
-        if len(missing_colors) != 1:
-            logger.info(f"🔮 COULEUR MANQUANTE - Pas exactement 1 couleur manquante: {missing_colors}")
-            return None
-
-        missing_color = missing_colors.pop()
-
-        # Déterminer l'offset de prédiction selon la couleur manquante
-        if missing_color in ["♣️", "♦️"]:
-            prediction_offset = 4
-        elif missing_color in ["♠️", "♥️"]:
-            prediction_offset = 2
-        else:
-            return None
-
-        logger.info(f"🔮 ✅ COULEUR MANQUANTE TROUVÉE: {missing_color} → Prédire à +{prediction_offset}")
-        return (missing_color, prediction_offset)
+    def find_missing_color(self, message: GameMessage) -> Optional[Tuple[str, int]]:
+        """Missing color of the first two groups (module-level find_missing_color)"""
+        return find_missing_color(message)
 
     def can_make_prediction(self) -> bool:
         """Check if enough time has passed since last prediction (70 seconds cooldown)"""
-        current_time = time.time()
+        current_time = self.clock()
 
         # Si aucune prédiction n'a été faite encore, autoriser
         if self.last_prediction_time == 0:
@@ -325,7 +470,9 @@ class CardPredictor:
             logger.info(f"⏰ COOLDOWN ACTIF: Encore {remaining:.1f}s à attendre avant prochaine prédiction")
             return False
 
-    def should_predict(self, message: str) -> Tuple[bool, Optional[int], Optional[Tuple[str, int]]]:
+    @_locked
+    def should_predict(self, message: GameMessage, chat_id: Optional[int] = None,
+                       message_id: Optional[int] = None) -> Tuple[bool, Optional[int], Optional[Tuple[str, int]]]:
         """
         NOUVELLE RÈGLE DE PRÉDICTION:
         1. Analyser SEULEMENT les messages avec #R
@@ -333,41 +480,36 @@ class CardPredictor:
         3. Prédire selon la couleur: ♣️/♦️ → +4, ♠️/♥️ → +2
         Returns: (should_predict, game_number, (predicted_costume, offset))
         """
+        # Parse once, every rule below works on the parsed message
+        parsed = ensure_parsed(message)
+        message = parsed.text
+
         # Extract game number
-        game_number = self.extract_game_number(message)
+        game_number = parsed.game_number
         if not game_number:
             return False, None, None
 
         logger.debug(f"🔮 PRÉDICTION - Analyse du jeu {game_number}")
 
-        # ANALYSE EXCLUSIVE: SEULEMENT les messages avec #R
-        if '#R' not in message:
-            logger.info(f"🔮 EXCLUSION - Jeu {game_number}: Ne contient pas #R, pas de prédiction")
-            return False, None, None
-
-        logger.info(f"🔮 ✅ MESSAGE #R DÉTECTÉ - Jeu {game_number}: Analyse activée")
-
-        # Exclure #X (match nul) même avec #R
-        if '#X' in message:
-            logger.info(f"🔮 EXCLUSION - Jeu {game_number}: Contient #X (match nul), pas de prédiction")
+        # ANALYSE EXCLUSIVE: SEULEMENT les messages avec #R, sans #X
+        if not is_missing_color_source(parsed):
             return False, None, None
 
         # Check if this is a temporary message (should wait for final edit)
-        if self.has_pending_indicators(message) and not self.has_completion_indicators(message):
+        if parsed.has_pending and not self.has_completion_indicators(parsed):
             logger.info(f"🔮 Jeu {game_number}: Message temporaire (⏰▶🕐➡️), attente finalisation")
             self.temporary_messages[game_number] = message
             return False, None, None
 
         # Check if this is a final message (has completion indicators)
-        if self.has_completion_indicators(message):
+        if self.has_completion_indicators(parsed):
             logger.info(f"🔮 Jeu {game_number}: Message final détecté (✅ ou 🔰)")
             # Remove from temporary if it was there
-            if game_number in self.temporary_messages:
-                del self.temporary_messages[game_number]
+            if self.temporary_messages.pop(game_number, None) is not None:
                 logger.info(f"🔮 Jeu {game_number}: Retiré des messages temporaires")
 
         # If the message still has waiting indicators, don't process
-        elif self.has_pending_indicators(message):
+        elif parsed.has_pending:
             logger.info(f"🔮 Jeu {game_number}: Encore des indicateurs d'attente, pas de prédiction")
             return False, None, None
 
@@ -377,7 +519,7 @@ class CardPredictor:
             return False, None, None
 
         # NOUVELLE RÈGLE: Trouver la couleur manquante
-        missing_color_result = self.find_missing_color(message)
+        missing_color_result = find_missing_color(parsed)
         if not missing_color_result:
             logger.info(f"🔮 AUCUNE PRÉDICTION - Jeu {game_number}: Impossible de déterminer la couleur manquante")
             return False, None, None
@@ -391,11 +533,9 @@ class CardPredictor:
             return False, None, None
 
         # Prevent duplicate processing
-        message_hash = hash(message)
-        if message_hash not in self.processed_messages:
-            self.processed_messages.add(message_hash)
+        if not self.processed_messages.seen(chat_id, message_id, game_number, message):
             # Update last prediction timestamp and save
-            self.last_prediction_time = time.time()
+            self.last_prediction_time = self.clock()
             self._save_last_prediction_time()
             logger.info(f"🔮 PREDICTION - Game {game_number}: GENERATING prediction for game {target_game} (+{prediction_offset}) with costume {predicted_costume}")
             logger.info(f"⏰ COOLDOWN - Next prediction possible in {self.prediction_cooldown}s")
@@ -404,6 +544,7 @@ class CardPredictor:
             logger.info(f"🔮 PREDICTION - Game {game_number}: ⚠️ Already processed")
             return False, None, None
 
+    @_locked
     def make_prediction(self, game_number: int, prediction_data: Tuple[str, int]) -> str:
         """
         Make a prediction with custom offset
@@ -424,6 +565,8 @@ class CardPredictor:
             'message_text': prediction_text,
             'offset': offset
         }
+        self._journal('prediction', target_game, self.predictions[target_game])
+        predictions_made.labels(self.metrics_source).inc()
 
         logger.info(f"Made prediction for game {target_game} (offset +{offset}) based on costume {predicted_costume}")
         return prediction_text
@@ -438,170 +581,142 @@ class CardPredictor:
         }
         return costume_map.get(costume_emoji, "inconnu")
 
-    def count_cards_in_winning_parentheses(self, message: str) -> int:
+    def count_cards_in_winning_parentheses(self, message: GameMessage) -> int:
         """Count the number of card symbols in the parentheses that has the 🔰 symbol"""
-        # Split message at 🔰 to find which section won
-        if '🔰' not in message:
-            return 0
-
-        # Find the parentheses after 🔰
-        checkmark_pos = message.find('🔰')
-        remaining_text = message[checkmark_pos:]
-
-        # Extract parentheses content after 🔰
-        pattern = r'\(([^)]+)\)'
-        match = re.search(pattern, remaining_text)
+        parsed = ensure_parsed(message)
 
-        if match:
-            winning_content = match.group(1)
-            # Normalize ❤️ to ♥️ for consistent counting
-            normalized_content = winning_content.replace("❤️", "♥️")
-            card_count = 0
-            for symbol in ["♠️", "♥️", "♦️", "♣️"]:
-                card_count += normalized_content.count(symbol)
-            logger.info(f"Found 🔰 winning section: {winning_content}, card count: {card_count}")
-            return card_count
+        # The winning section is the first parentheses after 🔰
+        if parsed.winning_group is None:
+            return 0
 
-        return 0
+        card_count = parsed.card_count(parsed.winning_group)
+        logger.info(f"Found 🔰 winning section: {parsed.groups[parsed.winning_group]}, card count: {card_count}")
+        return card_count
 
-    def count_cards_in_first_parentheses(self, message: str) -> int:
+    def count_cards_in_first_parentheses(self, message: GameMessage) -> int:
         """Count the total number of card symbols in the first parentheses"""
-        # Find first parentheses content
-        pattern = r'\(([^)]+)\)'
-        match = re.search(pattern, message)
-
-        if match:
-            first_content = match.group(1)
-            # Normalize ❤️ to ♥️ for consistent counting
-            normalized_content = first_content.replace("❤️", "♥️")
-            card_count = 0
-            for symbol in ["♠️", "♥️", "♦️", "♣️"]:
-                card_count += normalized_content.count(symbol)
-            logger.info(f"Found first parentheses: {first_content}, card count: {card_count}")
-            return card_count
+        parsed = ensure_parsed(message)
 
-        return 0
+        if not parsed.groups:
+            return 0
+
+        card_count = parsed.card_count(0)
+        logger.info(f"Found first parentheses: {parsed.groups[0]}, card count: {card_count}")
+        return card_count
 
-    def verify_prediction(self, text: str) -> Optional[Dict[str, Any]]:
+    def verify_prediction(self, text: GameMessage) -> Optional[Dict[str, Any]]:
         """
         Déléguer à la méthode commune de vérification
         """
         return self._verify_prediction_common(text, is_edited=False)
 
 
-    def verify_prediction_from_edit(self, message: str) -> Optional[Dict]:
+    def verify_prediction_from_edit(self, message: GameMessage) -> Optional[Dict]:
         """Verify if a prediction was correct from edited message (enhanced verification)"""
         return self._verify_prediction_common(message, is_edited=True)
 
-    def check_costume_in_first_parentheses(self, message: str, predicted_costume: str) -> bool:
+    def check_costume_in_first_parentheses(self, message: GameMessage, predicted_costume: str) -> bool:
         """Vérifier si le costume prédit apparaît SEULEMENT dans le PREMIER parenthèses"""
-        # Normaliser ❤️ vers ♥️ pour cohérence
-        normalized_message = message.replace("❤️", "♥️")
+        # Normaliser ❤️ vers ♥️ pour cohérence (le message est normalisé par le parseur)
+        parsed = ensure_parsed(message)
         normalized_costume = predicted_costume.replace("❤️", "♥️")
 
-        # Extraire SEULEMENT le contenu du PREMIER parenthèses
-        pattern = r'\(([^)]+)\)'
-        matches = re.findall(pattern, normalized_message)
-
-        if not matches:
+        if not parsed.groups:
             logger.info(f"🔍 Aucun parenthèses trouvé dans le message")
             return False
 
-        first_parentheses_content = matches[0]  # SEULEMENT le premier
+        first_parentheses_content = parsed.groups[0]  # SEULEMENT le premier
         logger.info(f"🔍 VÉRIFICATION PREMIER PARENTHÈSES SEULEMENT: {first_parentheses_content}")
 
-        costume_found = normalized_costume in first_parentheses_content
+        # Test du masque de présence du premier groupe
+        costume_found = parsed.has_suit(0, normalized_costume)
         logger.info(f"🔍 Recherche costume {normalized_costume} dans PREMIER parenthèses: {costume_found}")
         return costume_found
 
-    def _verify_prediction_common(self, text: str, is_edited: bool = False) -> Optional[Dict]:
-        """SYSTÈME DE VÉRIFICATION CORRIGÉ - Vérifie séquentiellement +0, +1, +2, +3 avec ARRÊT immédiat"""
-        game_number = self.extract_game_number(text)
+    @_locked
+    def _verify_prediction_common(self, text: GameMessage, is_edited: bool = False) -> Optional[Dict]:
+        """SYSTÈME DE VÉRIFICATION CORRIGÉ - Vérifie séquentiellement +0 .. +verification_depth avec ARRÊT immédiat"""
+        parsed = ensure_parsed(text)
+        game_number = parsed.game_number
         if not game_number:
             return None
 
         logger.info(f"🔍 VÉRIFICATION - Jeu {game_number} (édité: {is_edited})")
 
         # SYSTÈME DE VÉRIFICATION: Sur messages édités OU normaux avec symbole succès (✅ ou 🔰)
-        has_success_symbol = self.has_completion_indicators(text)
+        has_success_symbol = self.has_completion_indicators(parsed)
         if not has_success_symbol:
             logger.info(f"🔍 ⏸️ Pas de vérification - Aucun symbole de succès (✅ ou 🔰) trouvé")
             return None
 
-        logger.info(f"🔍 📊 ÉTAT ACTUEL - Prédictions stockées: {list(self.predictions.keys())}")
+        logger.info(f"🔍 📊 ÉTAT ACTUEL - Prédictions en attente: {list(self.predictions.pending)}")
 
-        # Si aucune prédiction stockée, pas de vérification possible
-        if not self.predictions:
-            logger.info(f"🔍 ✅ VÉRIFICATION TERMINÉE - Aucune prédiction éligible")
+        resolved = verify_pending_window(self.predictions, parsed, self.verification_depth)
+        if resolved is None:
+            logger.info(f"🔍 ✅ VÉRIFICATION TERMINÉE - Aucune action requise")
             return None
 
-        # VÉRIFICATION STRICTE: Pour chaque prédiction en attente, vérifier UNIQUEMENT son offset actuel
-        for predicted_game in sorted(self.predictions.keys()):
-            prediction = self.predictions[predicted_game]
-
-            # Vérifier seulement les prédictions en attente
-            if prediction.get('status') != 'pending':
-                continue
-
-            # Calculer l'offset actuel
-            verification_offset = game_number - int(predicted_game) # Ensure predicted_game is int for subtraction
-
-            # Vérifier SEULEMENT si l'offset est dans [0, 1, 2, 3]
-            if verification_offset not in [0, 1, 2, 3]:
-                continue
-
-            predicted_costume = prediction.get('predicted_costume')
-            if not predicted_costume:
-                continue
-
-            logger.info(f"🔍 🎯 TEST OFFSET +{verification_offset} - Prédiction {predicted_game} vs Jeu {game_number}")
-
-            # Vérifier si le costume prédit est présent
-            costume_found = self.check_costume_in_first_parentheses(text, predicted_costume)
-
-            if costume_found:
-                # ✅ SUCCÈS à cet offset - ARRÊT IMMÉDIAT
-                status_symbol = f"✅{verification_offset}️⃣"
-                original_message = prediction['message_text'] # Use stored message
-                updated_message = original_message.replace('⏳', status_symbol) # Replace pending indicator
-
-                prediction['status'] = 'correct'
-                prediction['verification_count'] = verification_offset
-                prediction['final_message'] = updated_message
-
-                logger.info(f"🔍 ✅ SUCCÈS OFFSET +{verification_offset} - ARRÊT sur prédiction {predicted_game}")
-
-                return {
-                    'type': 'edit_message',
-                    'predicted_game': predicted_game,
-                    'new_message': updated_message,
-                    'original_message': original_message
-                }
-
-            # ❌ ÉCHEC à cet offset
-            if verification_offset == 3:
-                # Dernier essai (offset +3) - Marquer ❌ et ARRÊT
-                original_message = prediction['message_text'] # Use stored message
-                updated_message = original_message.replace('⏳', '❌')
-
-                prediction['status'] = 'failed'
-                prediction['final_message'] = updated_message
+        predicted_game, prediction = resolved
+        self._journal('resolved', predicted_game, prediction)
+        if prediction['status'] == 'correct':
+            prediction_wins.labels(self.metrics_source, str(prediction['verification_count'])).inc()
+        else:
+            prediction_losses.labels(self.metrics_source).inc()
+        prediction_stats.record_prediction(self.metrics_source, predicted_game, prediction)
+        return {
+            'type': 'edit_message',
+            'predicted_game': predicted_game,
+            'new_message': prediction['final_message'],
+            'original_message': prediction['message_text']
+        }
 
-                logger.info(f"🔍 ❌ Échec FINAL OFFSET +3 - ARRÊT sur prédiction {predicted_game}")
 
-                return {
-                    'type': 'edit_message',
-                    'predicted_game': predicted_game,
-                    'new_message': updated_message,
-                    'original_message': original_message
-                }
-            else:
-                # Offset 0, 1, ou 2 - Attendre le prochain offset
-                logger.info(f"🔍 ⏭️ Échec OFFSET +{verification_offset} - Attente offset +{verification_offset+1}")
-                # Ne rien faire, attendre le prochain message
+def verify_pending_window(predictions: PredictionStore, parsed: ParsedGameMessage,
+                          depth: int = 3) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """
+    Shared ✅0️⃣–✅3️⃣/❌ verification of a finalized game against the pending predictions
+    targeting [N - depth, N], oldest first. Stops at the first prediction resolved (status and
+    final_message set, moved to the archive) and returns (predicted_game, prediction).
+    """
+    game_number = parsed.game_number
 
-        logger.info(f"🔍 ✅ VÉRIFICATION TERMINÉE - Aucune action requise")
+    # Fenêtre [N-depth, N] de l'index des prédictions en attente - les résolues sont archivées
+    window = predictions.pending_in_window(game_number, depth)
+    if not window:
         return None
 
-# Global instance
-card_predictor = CardPredictor()
\ No newline at end of file
+    # VÉRIFICATION STRICTE: Pour chaque prédiction en attente, vérifier UNIQUEMENT son offset actuel
+    for predicted_game, prediction in window:
+        # Calculer l'offset actuel (toujours dans [0, depth] grâce à la fenêtre)
+        verification_offset = game_number - predicted_game
+
+        predicted_costume = prediction.get('predicted_costume')
+        if not predicted_costume:
+            continue
+
+        logger.info(f"🔍 🎯 TEST OFFSET +{verification_offset} - Prédiction {predicted_game} vs Jeu {game_number}")
+
+        # Vérifier si le costume prédit est présent (premier groupe seulement, test du masque)
+        if parsed.has_suit(0, predicted_costume.replace("❤️", "♥️")):
+            # ✅ SUCCÈS à cet offset - ARRÊT IMMÉDIAT
+            status_symbol = f"✅{verification_offset}️⃣"
+            prediction['status'] = 'correct'
+            prediction['verification_count'] = verification_offset
+            prediction['final_message'] = prediction['message_text'].replace('⏳', status_symbol)
+            predictions.resolve(predicted_game)
+            logger.info(f"🔍 ✅ SUCCÈS OFFSET +{verification_offset} - ARRÊT sur prédiction {predicted_game}")
+            return predicted_game, prediction
+
+        # ❌ ÉCHEC à cet offset
+        if verification_offset == depth:
+            # Dernier essai - Marquer ❌ et ARRÊT
+            prediction['status'] = 'failed'
+            prediction['final_message'] = prediction['message_text'].replace('⏳', '❌')
+            predictions.resolve(predicted_game)
+            logger.info(f"🔍 ❌ Échec FINAL OFFSET +{depth} - ARRÊT sur prédiction {predicted_game}")
+            return predicted_game, prediction
+
+        # Offset < depth - Attendre le prochain offset
+        logger.info(f"🔍 ⏭️ Échec OFFSET +{verification_offset} - Attente offset +{verification_offset+1}")
+
+    return None
@@ -1,17 +1,28 @@
 import os
+import math
 import asyncio
 import re
 import logging
 import sys
+import time
 from datetime import datetime, timedelta, timezone
 from telethon import TelegramClient, events
 from telethon.sessions import StringSession
 from aiohttp import web
-from config import (
+from settings import (
     API_ID, API_HASH, BOT_TOKEN, ADMIN_ID,
     SOURCE_CHANNEL_ID, PREDICTION_CHANNEL_ID, PORT,
     PREDICTION_OFFSET, SUIT_MAPPING, ALL_SUITS, SUIT_DISPLAY, SUIT_NAMES
 )
+from game_message import count_suits
+from verification import VerificationEngine, WON, LOST
+from dedup import SlidingDedup
+import metrics
+from tracing import tracer, span, activate, deactivate
+from admin_auth import check_admin_token, ADMIN_TOKEN_HEADER
+from freshness import freshness_tracker
+from stats import prediction_stats
+from profiler import profiler, ProfilerBusy, format_summary, format_cpu_table, format_memory_report, parse_profile_args, MODES
 
 logging.basicConfig(
     level=logging.INFO,
@@ -41,13 +52,15 @@ client = TelegramClient(StringSession(session_string), API_ID, API_HASH)
 pending_predictions = {}
 queued_predictions = {}
 recent_games = {}
-processed_messages = set()
-processed_finalized = set()
+processed_messages = SlidingDedup()
+processed_finalized = SlidingDedup()
+verification_engine = VerificationEngine()
 last_transferred_game = None
 current_game_number = 0
 prediction_offset = PREDICTION_OFFSET
 
-MAX_PENDING_PREDICTIONS = 5
+# Le moteur de vérification indexe les prédictions par jeu attendu: le coût ne dépend plus de ce maximum
+MAX_PENDING_PREDICTIONS = int(os.getenv('MAX_PENDING_PREDICTIONS', '5'))
 PROXIMITY_THRESHOLD = 2
 
 source_channel_ok = False
@@ -94,6 +107,11 @@ def get_alternate_suit(suit: str) -> str:
     """Retourne la couleur alternative (pour backup)"""
     return SUIT_MAPPING.get(suit, suit)
 
+def message_timestamp(message):
+    """Horodatage Telegram (édition, sinon publication) d'un message Telethon, ou None"""
+    moment = getattr(message, 'edit_date', None) or getattr(message, 'date', None)
+    return moment.timestamp() if moment else None
+
 def is_message_finalized(message: str) -> bool:
     """Vérifie si le message est finalisé (contient ✅ ou 🔰)"""
     if '⏰' in message:
@@ -139,10 +157,13 @@ async def send_prediction_to_channel(target_game: int, suit: str, base_game: int
 
         if PREDICTION_CHANNEL_ID and PREDICTION_CHANNEL_ID != 0 and prediction_channel_ok:
             try:
-                pred_msg = await client.send_message(PREDICTION_CHANNEL_ID, prediction_msg)
+                with span('send_message'):
+                    pred_msg = await client.send_message(PREDICTION_CHANNEL_ID, prediction_msg)
+                freshness_tracker.record('prediction')
                 msg_id = pred_msg.id
                 logger.info(f"✅ Prédiction envoyée au canal: Jeu #{target_game} - {suit}")
             except Exception as e:
+                metrics.send_failures.inc()
                 logger.error(f"❌ Erreur envoi prédiction au canal: {e}")
         else:
             logger.warning(f"⚠️ Canal de prédiction non accessible, prédiction non envoyée")
@@ -157,6 +178,8 @@ async def send_prediction_to_channel(target_game: int, suit: str, base_game: int
             'last_checked_game': 0,
             'created_at': datetime.now().isoformat()
         }
+        verification_engine.track(target_game, suit)
+        metrics.predictions_made.labels('config').inc()
 
         logger.info(f"Prédiction active créée: Jeu #{target_game} - {suit} (basé sur #{base_game})")
         return msg_id
@@ -190,16 +213,25 @@ async def update_prediction_status(game_number: int, new_status: str, result_gro
 
         if PREDICTION_CHANNEL_ID and PREDICTION_CHANNEL_ID != 0 and message_id > 0 and prediction_channel_ok:
             try:
-                await client.edit_message(PREDICTION_CHANNEL_ID, message_id, updated_msg)
+                with span('edit_message'):
+                    await client.edit_message(PREDICTION_CHANNEL_ID, message_id, updated_msg)
+                freshness_tracker.record('verification')
                 logger.info(f"✅ Prédiction #{game_number} mise à jour: {status_text}")
             except Exception as e:
+                metrics.send_failures.inc()
                 logger.error(f"❌ Erreur mise à jour dans le canal: {e}")
 
         pred['status'] = new_status
         logger.info(f"Prédiction #{game_number} statut mis à jour: {new_status}")
 
         # Supprimer des prédictions actives si terminée
-        if new_status in ['✅0️⃣', '✅1️⃣', '✅2️⃣', '✅3️⃣', '❌']:
+        if new_status.startswith('✅') or new_status == '❌':
+            if new_status == '❌':
+                metrics.prediction_losses.labels('config').inc()
+            else:
+                metrics.prediction_wins.labels('config', new_status[1]).inc()
+            prediction_stats.record('config', suit, game_number - pred['base_game'],
+                                    None if new_status == '❌' else int(new_status[1]))
             del pending_predictions[game_number]
             logger.info(f"Prédiction #{game_number} terminée et supprimée")
 
@@ -211,113 +243,44 @@ async def update_prediction_status(game_number: int, new_status: str, result_gro
 
 async def check_prediction_result(game_number: int, first_group: str):
     """
-    Vérifie si une prédiction est gagnée ou perdue.
-    Vérifie séquentiellement: N (immédiat), puis N+1, N+2, N+3 si échecs précédents.
+    Vérifie les prédictions qui attendent ce jeu: chacune est testée sur N, puis N+1 ...
+    N+VERIFICATION_DEPTH si échecs précédents (index du moteur de vérification).
     UNIQUEMENT sur les messages finalisés.
+    Retourne True si une prédiction est gagnée, False si une est perdue, None sinon.
     """
-    normalized_group = normalize_suits(first_group)
+    # Encodage unique du groupe: vecteur (♠, ♥, ♦, ♣) - chaque vérification est un accès indexé
+    group_counts = count_suits(first_group)
     
     logger.info(f"=== VÉRIFICATION RÉSULTAT (MESSAGE FINALISÉ) ===")
     logger.info(f"Jeu source finalisé: #{game_number}")
     logger.info(f"Groupe analysé: ({first_group})")
-    logger.info(f"Prédictions actives: {list(pending_predictions.keys())}")
     
-    # ========== VÉRIFICATION N (numéro exact) ==========
-    if game_number in pending_predictions:
-        pred = pending_predictions[game_number]
-        target_suit = pred['suit']
-        normalized_target = normalize_suits(target_suit)
-        
-        suit_count = normalized_group.count(normalized_target)
-        
-        logger.info(f"🔍 Vérification N #{game_number}: {target_suit} trouvé {suit_count} fois")
-        
-        if suit_count >= 3:
-            await update_prediction_status(game_number, '✅0️⃣', first_group)
-            logger.info(f"🎉 PRÉDICTION #{game_number} GAGNÉE AU N!")
-            return True
-        else:
-            pred['check_count'] = 1
-            pred['last_checked_game'] = game_number
-            logger.info(f"⏳ #{game_number}: {suit_count}x {target_suit}, passage à N+1...")
-    
-    # ========== VÉRIFICATION N+1 ==========
-    pred_n = game_number - 1
-    if pred_n in pending_predictions:
-        pred = pending_predictions[pred_n]
-        if pred.get('check_count', 0) >= 1:
-            target_suit = pred['suit']
-            normalized_target = normalize_suits(target_suit)
+    result = None
+    for check in verification_engine.verify(game_number, group_counts):
+        target_game = check.target_game
+        logger.info(f"🔍 Vérification N+{check.step} #{target_game} (jeu #{game_number}): {check.suit} trouvé {check.count} fois")
+        
+        if check.outcome == WON:
+            await update_prediction_status(target_game, check.status, first_group)
+            logger.info(f"🎉 PRÉDICTION #{target_game} GAGNÉE AU N+{check.step}!")
+            result = True
+        elif check.outcome == LOST:
+            await update_prediction_status(target_game, check.status, first_group)
+            logger.info(f"💔 PRÉDICTION #{target_game} PERDUE après N+{check.step}")
             
-            last_checked = pred.get('last_checked_game', 0)
-            if game_number <= last_checked:
-                logger.info(f"⏭️ #{pred_n}: Jeu #{game_number} déjà vérifié")
-            else:
-                suit_count = normalized_group.count(normalized_target)
-                logger.info(f"🔍 Vérification N+1 #{pred_n}+1 (jeu #{game_number}): {target_suit} trouvé {suit_count} fois")
-                
-                if suit_count >= 3:
-                    await update_prediction_status(pred_n, '✅1️⃣', first_group)
-                    logger.info(f"🎉 PRÉDICTION #{pred_n} GAGNÉE AU N+1!")
-                    return True
-                else:
-                    pred['check_count'] = 2
-                    pred['last_checked_game'] = game_number
-                    logger.info(f"⏳ #{pred_n}: {suit_count}x {target_suit} en N+1, passage à N+2...")
-    
-    # ========== VÉRIFICATION N+2 ==========
-    pred_n2 = game_number - 2
-    if pred_n2 in pending_predictions:
-        pred = pending_predictions[pred_n2]
-        if pred.get('check_count', 0) >= 2:
-            target_suit = pred['suit']
-            normalized_target = normalize_suits(target_suit)
-            
-            last_checked = pred.get('last_checked_game', 0)
-            if game_number <= last_checked:
-                logger.info(f"⏭️ #{pred_n2}: Jeu #{game_number} déjà vérifié")
-            else:
-                suit_count = normalized_group.count(normalized_target)
-                logger.info(f"🔍 Vérification N+2 #{pred_n2}+2 (jeu #{game_number}): {target_suit} trouvé {suit_count} fois")
-                
-                if suit_count >= 3:
-                    await update_prediction_status(pred_n2, '✅2️⃣', first_group)
-                    logger.info(f"🎉 PRÉDICTION #{pred_n2} GAGNÉE AU N+2!")
-                    return True
-                else:
-                    pred['check_count'] = 3
-                    pred['last_checked_game'] = game_number
-                    logger.info(f"⏳ #{pred_n2}: {suit_count}x {target_suit} en N+2, passage à N+3...")
-    
-    # ========== VÉRIFICATION N+3 ==========
-    pred_n3 = game_number - 3
-    if pred_n3 in pending_predictions:
-        pred = pending_predictions[pred_n3]
-        if pred.get('check_count', 0) >= 3:
-            target_suit = pred['suit']
-            normalized_target = normalize_suits(target_suit)
-            
-            last_checked = pred.get('last_checked_game', 0)
-            if game_number <= last_checked:
-                logger.info(f"⏭️ #{pred_n3}: Jeu #{game_number} déjà vérifié")
-            else:
-                suit_count = normalized_group.count(normalized_target)
-                logger.info(f"🔍 Vérification N+3 #{pred_n3}+3 (jeu #{game_number}): {target_suit} trouvé {suit_count} fois")
-                
-                if suit_count >= 3:
-                    await update_prediction_status(pred_n3, '✅3️⃣', first_group)
-                    logger.info(f"🎉 PRÉDICTION #{pred_n3} GAGNÉE AU N+3!")
-                    return True
-                else:
-                    await update_prediction_status(pred_n3, '❌', first_group)
-                    logger.info(f"💔 PRÉDICTION #{pred_n3} PERDUE après N+3")
-                    
-                    backup_game = pred_n3 + prediction_offset
-                    alternate_suit = get_alternate_suit(target_suit)
-                    await create_prediction(backup_game, alternate_suit, pred_n3, is_backup=True)
-                    return False
+            backup_game = target_game + prediction_offset
+            alternate_suit = get_alternate_suit(check.suit)
+            await create_prediction(backup_game, alternate_suit, target_game, is_backup=True)
+            if result is None:
+                result = False
+        else:
+            pred = pending_predictions.get(target_game)
+            if pred is not None:
+                pred['check_count'] = check.step + 1
+                pred['last_checked_game'] = game_number
+            logger.info(f"⏳ #{target_game}: {check.count}x {check.suit} en N+{check.step}, passage à N+{check.step + 1}...")
     
-    return None
+    return result
 
 async def create_prediction(target_game: int, suit: str, base_game: int, is_backup: bool = False):
     """Crée une nouvelle prédiction"""
@@ -329,7 +292,7 @@ async def create_prediction(target_game: int, suit: str, base_game: int, is_back
     await send_prediction_to_channel(target_game, suit, base_game)
     return True
 
-async def process_new_message(message_text: str, chat_id: int, is_finalized: bool = False):
+async def process_new_message(message_text: str, chat_id: int, is_finalized: bool = False, message_id: int = 0):
     """
     Traite un nouveau message du canal source.
     - CRÉE les prédictions IMMÉDIATEMENT (même si non finalisé)
@@ -338,22 +301,19 @@ async def process_new_message(message_text: str, chat_id: int, is_finalized: boo
     global current_game_number, last_transferred_game
     
     try:
-        game_number = extract_game_number(message_text)
+        with span('parse'):
+            game_number = extract_game_number(message_text)
         if game_number is None:
             return
         
         current_game_number = game_number
         
-        # Éviter le traitement double
-        message_hash = f"{game_number}_{message_text[:50]}"
-        if message_hash in processed_messages:
+        # Éviter le traitement double (fenêtre glissante bornée, sans remise à zéro brutale)
+        if processed_messages.seen(chat_id, message_id, game_number, message_text[:50]):
             return
-        processed_messages.add(message_hash)
         
-        if len(processed_messages) > 200:
-            processed_messages.clear()
-        
-        groups = extract_parentheses_groups(message_text)
+        with span('parse'):
+            groups = extract_parentheses_groups(message_text)
         if len(groups) < 1:
             return
         
@@ -379,15 +339,14 @@ async def process_new_message(message_text: str, chat_id: int, is_finalized: boo
         
         # ========== VÉRIFICATION DES RÉSULTATS (UNIQUEMENT SI FINALISÉ) ==========
         if is_finalized:
-            finalized_hash = f"finalized_{game_number}"
-            if finalized_hash not in processed_finalized:
-                processed_finalized.add(finalized_hash)
+            if not processed_finalized.seen(chat_id, None, game_number):
                 
                 # Transfert du message si activé
                 if transfer_enabled and ADMIN_ID and ADMIN_ID != 0 and last_transferred_game != game_number:
                     try:
                         transfer_msg = f"📨 **Message finalisé du canal source:**\n\n{message_text}"
-                        await client.send_message(ADMIN_ID, transfer_msg)
+                        with span('transfer'):
+                            await client.send_message(ADMIN_ID, transfer_msg)
                         last_transferred_game = game_number
                         logger.info(f"✅ Message #{game_number} transféré à l'admin")
                     except Exception as e:
@@ -395,10 +354,8 @@ async def process_new_message(message_text: str, chat_id: int, is_finalized: boo
                 
                 # Vérifier les résultats UNIQUEMENT sur message finalisé
                 logger.info(f"✅ Message #{game_number} FINALISÉ - Lancement vérification avec: ({first_group})")
-                await check_prediction_result(game_number, first_group)
-                
-                if len(processed_finalized) > 100:
-                    processed_finalized.clear()
+                with span('verify'):
+                    await check_prediction_result(game_number, first_group)
         
         # Stocker le jeu pour référence
         recent_games[game_number] = {
@@ -420,37 +377,56 @@ async def process_new_message(message_text: str, chat_id: int, is_finalized: boo
 @client.on(events.NewMessage())
 async def handle_message(event):
     """Gère les nouveaux messages - PRÉDICTION IMMÉDIATE"""
+    start = time.perf_counter()
+    trace = tracer.start('telethon', message_id=event.message.id)
+    token = activate(trace) if trace is not None else None
+    freshness_token = None
     try:
-        chat = await event.get_chat()
+        with span('get_chat'):
+            chat = await event.get_chat()
         chat_id = chat.id if hasattr(chat, 'id') else event.chat_id
         
         if chat_id > 0 and hasattr(chat, 'broadcast') and chat.broadcast:
             chat_id = -1000000000000 - chat_id
         
         if chat_id == SOURCE_CHANNEL_ID:
+            freshness_token = freshness_tracker.begin(message_timestamp(event.message))
             message_text = event.message.message
             logger.info(f"📨 Message reçu: {message_text[:80]}...")
             
             # Prédiction immédiate (is_finalized=False)
             is_finalized = is_message_finalized(message_text)
-            await process_new_message(message_text, chat_id, is_finalized)
+            await process_new_message(message_text, chat_id, is_finalized, message_id=event.message.id)
             
     except Exception as e:
         logger.error(f"Erreur handle_message: {e}")
         import traceback
         logger.error(traceback.format_exc())
+    finally:
+        metrics.update_duration.observe(time.perf_counter() - start)
+        freshness_tracker.end(freshness_token)
+        if token is not None:
+            deactivate(token)
+        if trace is not None:
+            trace.finish()
 
 @client.on(events.MessageEdited())
 async def handle_edited_message(event):
     """Gère les messages édités (finalisation) - VÉRIFICATION RÉSULTATS"""
+    start = time.perf_counter()
+    trace = tracer.start('telethon_edit', message_id=event.message.id)
+    token = activate(trace) if trace is not None else None
+    freshness_token = None
     try:
-        chat = await event.get_chat()
+        with span('get_chat'):
+            chat = await event.get_chat()
         chat_id = chat.id if hasattr(chat, 'id') else event.chat_id
         
         if chat_id > 0 and hasattr(chat, 'broadcast') and chat.broadcast:
             chat_id = -1000000000000 - chat_id
         
         if chat_id == SOURCE_CHANNEL_ID:
+            freshness_token = freshness_tracker.begin(message_timestamp(event.message))
             message_text = event.message.message
             logger.info(f"✏️ Message édité: {message_text[:80]}...")
             
@@ -459,7 +435,7 @@ async def handle_edited_message(event):
             # Ne traiter que si finalisé (pour la vérification)
             if is_finalized:
                 logger.info(f"✅ Message finalisé détecté - Lancement vérification résultats")
-                await process_new_message(message_text, chat_id, is_finalized=True)
+                await process_new_message(message_text, chat_id, is_finalized=True, message_id=event.message.id)
             else:
                 logger.info(f"⏳ Message édité mais pas encore finalisé")
             
@@ -467,6 +443,13 @@ async def handle_edited_message(event):
         logger.error(f"Erreur handle_edited_message: {e}")
         import traceback
         logger.error(traceback.format_exc())
+    finally:
+        metrics.update_duration.observe(time.perf_counter() - start)
+        freshness_tracker.end(freshness_token)
+        if token is not None:
+            deactivate(token)
+        if trace is not None:
+            trace.finish()
 
 # ==================== COMMANDES ADMIN ====================
 
@@ -552,6 +535,57 @@ async def cmd_status(event):
     
     await event.respond(status_msg)
 
+@client.on(events.NewMessage(pattern='/lag'))
+async def cmd_lag(event):
+    if event.is_group or event.is_channel:
+        return
+    
+    if event.sender_id != ADMIN_ID and ADMIN_ID != 0:
+        await event.respond("⛔ Commande réservée à l'administrateur")
+        return
+    
+    await event.respond(freshness_tracker.format_report())
+
+@client.on(events.NewMessage(pattern='/stats'))
+async def cmd_stats(event):
+    if event.is_group or event.is_channel:
+        return
+    
+    if event.sender_id != ADMIN_ID and ADMIN_ID != 0:
+        await event.respond("⛔ Commande réservée à l'administrateur")
+        return
+    
+    await event.respond(prediction_stats.format_report())
+
+@client.on(events.NewMessage(pattern='/profile'))
+async def cmd_profile(event):
+    if event.is_group or event.is_channel:
+        return
+    
+    if event.sender_id != ADMIN_ID and ADMIN_ID != 0:
+        await event.respond("⛔ Commande réservée à l'administrateur")
+        return
+    
+    try:
+        args = parse_profile_args(event.message.message)
+    except ValueError as e:
+        await event.respond(f"❌ {e}\nUsage: /profile [cpu|mem] [secondes]")
+        return
+    
+    seconds = profiler.clamp_seconds(args['seconds'])
+    await event.respond(f"🔬 Profil {args['mode']} en cours pendant {seconds:.0f}s...")
+    try:
+        # Échantillonnage depuis un thread: la boucle asyncio reste libre (et profilée)
+        result = await asyncio.get_running_loop().run_in_executor(None, profiler.run, args['mode'], seconds)
+    except ProfilerBusy as e:
+        await event.respond(f"⏳ {e}")
+        return
+    
+    await event.respond(format_summary(result), parse_mode=None)
+    if result['path']:
+        caption = "🔥 Piles repliées (flamegraph.pl, speedscope)" if args['mode'] == 'cpu' else "🧠 Rapport mémoire complet"
+        await client.send_file(event.chat_id, result['path'], caption=caption)
+
 @client.on(events.NewMessage(pattern='/debug'))
 async def cmd_debug(event):
     if event.is_group or event.is_channel:
@@ -571,17 +605,24 @@ async def cmd_debug(event):
 **🆕 v3.0 - Système:**
 🎰 PRÉDICTION #N
 💫 Couleur: [suit] [nom]
-📊 Statut: 🤔🤔🤔 → ✅0️⃣/1️⃣/2️⃣/3️⃣ GAGNÉ ou ❌ PERDU
+📊 Statut: 🤔🤔🤔 → ✅0️⃣..{verification_engine.depth}️⃣ GAGNÉ ou ❌ PERDU
 
 **Règles:**
 • ✅ Prédiction: **IMMÉDIATE** (dès réception message)
 • ✅ Vérification: **UNIQUEMENT** sur finalisés (✅/🔰)
 • ✅ Offset: **+{prediction_offset}** (configurable)
-• ✅ Condition: **3 cartes** de la couleur dans 1er groupe
-• ✅ Étapes: N → N+1 → N+2 → N+3
+• ✅ Condition: **{verification_engine.min_cards} carte(s)** de la couleur dans 1er groupe
+• ✅ Étapes: {' → '.join(['N'] + [f'N+{step}' for step in range(1, verification_engine.depth + 1)])}
 """
     await event.respond(debug_msg)
 
+def verification_steps_help() -> str:
+    """One help line per verification step, ✅0️⃣ to ✅{depth}"""
+    lines = ["   - ✅0️⃣ = Gagné au numéro prédit (N)"]
+    for step in range(1, verification_engine.depth + 1):
+        lines.append(f"   - ✅{step}️⃣ = Gagné au numéro+{step} (N+{step})")
+    return "\n".join(lines)
+
 @client.on(events.NewMessage(pattern='/help'))
 async def cmd_help(event):
     if event.is_group or event.is_channel:
@@ -602,15 +643,15 @@ async def cmd_help(event):
    📊 Statut: 🤔🤔🤔
 
 3️⃣ **Vérification** (sur message finalisé uniquement):
-   - ✅0️⃣ = Gagné au numéro prédit (N)
-   - ✅1️⃣ = Gagné au numéro+1 (N+1)  
-   - ✅2️⃣ = Gagné au numéro+2 (N+2)
-   - ✅3️⃣ = Gagné au numéro+3 (N+3)
-   - ❌ = Perdu (pas trouvé après N+3)
+{verification_steps_help()}
+   - ❌ = Perdu (pas trouvé après N+{verification_engine.depth})
 
 **Commandes admin:**
 • `/setoffset <n>` - Changer le décalage (actuel: {prediction_offset})
 • `/status` - Voir les prédictions en cours
+• `/lag` - Retard sur le canal source
+• `/stats` - Taux de réussite et séries
+• `/profile [cpu|mem] [secondes]` - Profil CPU ou mémoire
 • `/debug` - Informations système""")
 
 # ==================== TRANSFERT COMMANDS ====================
@@ -678,15 +719,85 @@ async def status_api(request):
         "current_game": current_game_number,
         "prediction_offset": prediction_offset,
         "pending_predictions": len(pending_predictions),
+        "freshness": freshness_tracker.get_stats(),
+        "dedup": {
+            "messages": processed_messages.get_stats(),
+            "finalized": processed_finalized.get_stats()
+        },
         "timestamp": datetime.now().isoformat()
     }
     return web.json_response(status_data)
 
+# Valeurs lues au moment du scrape /metrics (les globales peuvent être remplacées, d'où les lambdas)
+metrics.pending_predictions.set_function(lambda: {('config',): len(pending_predictions)})
+metrics.queue_depth.set_function(lambda: {('queued_predictions',): len(queued_predictions)})
+metrics.dedup_hits.set_function(lambda: {('messages',): processed_messages.hits, ('finalized',): processed_finalized.hits})
+
+async def slow_updates_api(request):
+    """Journal des updates lents avec le détail par étape (ADMIN_TOKEN requis)"""
+    if not check_admin_token(request.headers.get(ADMIN_TOKEN_HEADER) or request.query.get('token')):
+        return web.json_response({'error': 'forbidden'}, status=403)
+    try:
+        limit = int(request.query.get('limit', '50'))
+    except ValueError:
+        limit = 50
+    return web.json_response({'tracing': tracer.get_stats(), 'slow_updates': tracer.get_slow(limit)})
+
+async def stats_api(request):
+    """Taux de réussite glissants et séries des prédictions résolues (ADMIN_TOKEN requis)"""
+    if not check_admin_token(request.headers.get(ADMIN_TOKEN_HEADER) or request.query.get('token')):
+        return web.json_response({'error': 'forbidden'}, status=403)
+    return web.json_response(prediction_stats.get_stats())
+
+async def profile_api(request):
+    """
+    Profil à la demande (ADMIN_TOKEN requis): ?mode=cpu|memory&seconds=N&format=folded|top|json
+    folded: piles repliées pour flamegraph.pl / speedscope, top: tableau façon pstats
+    """
+    if not check_admin_token(request.headers.get(ADMIN_TOKEN_HEADER) or request.query.get('token')):
+        return web.json_response({'error': 'forbidden'}, status=403)
+    mode = request.query.get('mode', 'cpu')
+    output = request.query.get('format', 'folded' if mode == 'cpu' else 'top')
+    if mode not in MODES or output not in ('folded', 'top', 'json') or (mode == 'memory' and output == 'folded'):
+        return web.json_response({'error': 'mode ou format invalide'}, status=400)
+    try:
+        seconds = float(request.query.get('seconds', '0'))
+    except ValueError:
+        return web.json_response({'error': 'seconds invalide'}, status=400)
+    if not math.isfinite(seconds):
+        return web.json_response({'error': 'seconds invalide'}, status=400)
+    
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(None, profiler.run, mode, seconds)
+    except ProfilerBusy as e:
+        return web.json_response({'error': str(e)}, status=409)
+    
+    if output == 'json':
+        return web.json_response(result)
+    if output == 'folded':
+        return web.Response(text=result['folded'] + '\n')
+    return web.Response(text=(format_cpu_table(result) if mode == 'cpu' else format_memory_report(result)) + '\n')
+
+# Structures mesurées avant/après un profil mémoire (les globales peuvent être remplacées, d'où les lambdas)
+profiler.register_structure('pending_predictions', lambda: len(pending_predictions))
+profiler.register_structure('queued_predictions', lambda: len(queued_predictions))
+profiler.register_structure('recent_games', lambda: len(recent_games))
+profiler.register_structure('processed_messages', lambda: len(processed_messages))
+profiler.register_structure('processed_finalized', lambda: len(processed_finalized))
+
+async def metrics_api(request):
+    return web.Response(body=metrics.registry.render().encode('utf-8'),
+                        headers={'Content-Type': metrics.CONTENT_TYPE})
+
 async def start_web_server():
     app = web.Application()
     app.router.add_get('/', index)
     app.router.add_get('/health', health_check)
     app.router.add_get('/status', status_api)
+    app.router.add_get('/metrics', metrics_api)
+    app.router.add_get('/admin/slow-updates', slow_updates_api)
+    app.router.add_get('/admin/stats', stats_api)
+    app.router.add_get('/admin/profile', profile_api)
     
     runner = web.AppRunner(app)
     await runner.setup()
@@ -727,7 +838,8 @@ async def start_bot():
             logger.error(f"❌ Prédiction: {e}")
         
         logger.info(f"⚙️ OFFSET=+{prediction_offset}, MAX={MAX_PENDING_PREDICTIONS}")
-        logger.info("🎯 Prédiction immédiate | Vérification sur finalisés | N→N+3")
+        logger.info(f"🎯 Prédiction immédiate | Vérification sur finalisés | N→N+{verification_engine.depth} "
+                    f"(≥{verification_engine.min_cards} carte(s))")
         return True
         
     except Exception as e:
@@ -0,0 +1,103 @@
+"""
+Bounded sliding-window deduplication shared by both bots
+"""
+
+import os
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+DEDUP_MAX_ENTRIES = int(os.getenv('DEDUP_MAX_ENTRIES', '2000'))
+DEDUP_MAX_AGE = float(os.getenv('DEDUP_MAX_AGE', '3600'))  # seconds
+DEDUP_GAME_WINDOW = int(os.getenv('DEDUP_GAME_WINDOW', '50'))  # games
+
+DedupKey = Tuple[Optional[int], Optional[int], Optional[int], int]
+
+
+def fingerprint(text: str) -> int:
+    """Stable content fingerprint (CRC32 of the UTF-8 text)"""
+    return zlib.crc32(text.encode('utf-8'))
+
+
+class SlidingDedup:
+    """
+    Remembers recently processed (chat, message_id, game number, content) keys.
+
+    Memory is fixed: entries expire once they are older than `max_age` seconds
+    or more than `game_window` games behind the highest game number seen, and
+    the oldest entries are evicted beyond `max_entries`. Expiry only looks at
+    the front of the insertion order: an entry behind a still-live one stays
+    until that one expires (bounded by `max_entries`), which is exact for
+    messages arriving in game order. Hit/miss counters show how often
+    duplicates are caught.
+    """
+
+    def __init__(self, max_entries: int = DEDUP_MAX_ENTRIES, max_age: float = DEDUP_MAX_AGE,
+                 game_window: int = DEDUP_GAME_WINDOW, clock: Callable[[], float] = time.time):
+        self.max_entries = max(1, max_entries)
+        self.max_age = max_age
+        self.game_window = game_window
+        self.clock = clock
+        self._entries: "OrderedDict[DedupKey, Tuple[float, Optional[int]]]" = OrderedDict()
+        self._newest_game: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def seen(self, chat_id: Optional[int], message_id: Optional[int], game_number: Optional[int], text: str = '') -> bool:
+        """Return True if this key was already processed, otherwise record it and return False"""
+        key = (chat_id, message_id, game_number, fingerprint(text))
+        now = self.clock()
+        with self._lock:
+            if game_number is not None and (self._newest_game is None or game_number > self._newest_game):
+                self._newest_game = game_number
+            self._expire(now)
+
+            if key in self._entries:
+                self.hits += 1
+                return True
+
+            self._entries[key] = (now, game_number)
+            self.misses += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return False
+
+    def _expire(self, now: float) -> None:
+        # Front-only: entries are checked in insertion order and the scan stops at the first live one
+        while self._entries:
+            key, (timestamp, game_number) = next(iter(self._entries.items()))
+            too_old = now - timestamp > self.max_age
+            out_of_window = (
+                game_number is not None and self._newest_game is not None
+                and self._newest_game - game_number > self.game_window
+            )
+            if not (too_old or out_of_window):
+                break
+            del self._entries[key]
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._newest_game = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return dedup counters"""
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
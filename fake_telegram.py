@@ -0,0 +1,143 @@
+"""
+Local in-process stand-in for api.telegram.org, for load tests and replays
+
+Point the bot at it with TELEGRAM_API_BASE=<FakeTelegramAPI.base_url>.
+"""
+
+import json
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FakeTelegramAPI:
+    """
+    Minimal Bot API server answering sendMessage, editMessageText,
+    sendDocument, setWebhook, getMe and friends on a local port.
+
+    `latency` (+ up to `jitter`) seconds are added to every call, and a
+    `rate_limit_ratio` share of calls is answered with 429 / retry_after,
+    like the real API under flood control.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit_ratio: float = 0.0, retry_after: int = 1, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_message_id = 0
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeTelegramAPI':
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-telegram-api", daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 Fausse API Telegram démarrée sur {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeTelegramAPI':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Calls answered per method, and how many of them were rate limited"""
+        return {'calls': dict(self.calls), 'rate_limited': dict(self.rate_limited)}
+
+    def respond(self, method: str, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Build the (HTTP status, JSON body) answer to one API call"""
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        with self._lock:
+            self.calls[method] += 1
+            if self.rate_limit_ratio and self._random.random() < self.rate_limit_ratio:
+                self.rate_limited[method] += 1
+                return 429, {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after}
+                }
+            if method in ('sendMessage', 'sendDocument'):
+                self._next_message_id += 1
+                message_id = self._next_message_id
+            else:
+                message_id = payload.get('message_id')
+
+        now = int(time.time())
+        if method in ('sendMessage', 'sendDocument', 'editMessageText'):
+            return 200, {'ok': True, 'result': {
+                'message_id': message_id,
+                'chat': {'id': _to_int(payload.get('chat_id'))},
+                'date': now,
+                'text': payload.get('text', '')
+            }}
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}}
+        return 200, {'ok': True, 'result': True}
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self, body: bytes) -> None:
+                # Path: /bot<token>/<method>
+                method = self.path.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1]
+                payload = {}
+                if body and self.headers.get('Content-Type', '').startswith('application/json'):
+                    try:
+                        payload = json.loads(body)
+                    except ValueError:
+                        payload = {}
+                status, answer = api.respond(method, payload)
+                data = json.dumps(answer).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                self._handle(self.rfile.read(length) if length else b'')
+
+            def do_GET(self) -> None:
+                self._handle(b'')
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def _to_int(value: Any) -> Any:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
@@ -0,0 +1,182 @@
+"""
+Freshness: delay between the source channel posting / editing a game and our
+prediction or verification edit landing
+
+The source timestamp is Telegram's `edit_date` (or `date`) of the update being
+handled. It is held in a context variable for the duration of the handler
+(update worker thread or Telethon task), so the send sites only say what they
+sent: track() for calls answered through a Future, record() once an awaited
+call returned. Lags use the local clock against Telegram's second-resolution
+timestamps, so they are accurate to about a second.
+
+Per kind (reception, prediction, verification), the last FRESHNESS_WINDOW lags
+are kept for rolling percentiles. We are flagged as behind the source channel
+when the median of the last FRESHNESS_ALERT_SAMPLES prediction / verification
+lags exceeds FRESHNESS_BEHIND_SECONDS.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Dict, Any, Deque, List, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+FRESHNESS_ENABLED = os.getenv('FRESHNESS_ENABLED', 'true').lower() == 'true'
+FRESHNESS_WINDOW = int(os.getenv('FRESHNESS_WINDOW', '500'))
+FRESHNESS_BEHIND_SECONDS = float(os.getenv('FRESHNESS_BEHIND_SECONDS', '30'))
+FRESHNESS_ALERT_SAMPLES = int(os.getenv('FRESHNESS_ALERT_SAMPLES', '5'))
+
+KINDS = ('reception', 'prediction', 'verification')
+
+freshness_lag = registry.histogram(
+    'freshness_lag_seconds', 'Delay from the source post/edit to our update landing', ('kind',),
+    buckets=(0.5, 1, 2, 3, 5, 10, 20, 30, 60, 120, 300, 600))
+freshness_behind = registry.gauge(
+    'freshness_behind', '1 while we are behind the source channel')
+
+_source_ts: ContextVar[Optional[float]] = ContextVar('freshness_source_ts', default=None)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class FreshnessTracker:
+    """Rolling lag windows per kind and the behind-the-source flag"""
+
+    def __init__(self, window: int = FRESHNESS_WINDOW, behind_seconds: float = FRESHNESS_BEHIND_SECONDS,
+                 alert_samples: int = FRESHNESS_ALERT_SAMPLES, enabled: bool = FRESHNESS_ENABLED):
+        self.enabled = enabled
+        self.behind_seconds = behind_seconds
+        self.windows: Dict[str, Deque[float]] = {kind: deque(maxlen=max(1, window)) for kind in KINDS}
+        self.recent: Deque[float] = deque(maxlen=max(1, alert_samples))
+        self.counts: Dict[str, int] = {kind: 0 for kind in KINDS}
+        self.last_lag: Dict[str, Optional[float]] = {kind: None for kind in KINDS}
+        self.behind = False
+        self.behind_since: Optional[float] = None
+        self.behind_episodes = 0
+        self._lock = threading.Lock()
+        freshness_behind.set_function(lambda: 1 if self.behind else 0)
+
+    def begin(self, source_ts: Optional[float]):
+        """Set the source timestamp of the update being handled; returns the token for end()"""
+        if not self.enabled or not source_ts:
+            return None
+        token = _source_ts.set(float(source_ts))
+        self._add('reception', time.time() - source_ts)
+        return token
+
+    def end(self, token) -> None:
+        if token is not None:
+            _source_ts.reset(token)
+
+    def record(self, kind: str) -> None:
+        """Record now as the landing time of a `kind` call for the update being handled"""
+        source_ts = _source_ts.get()
+        if source_ts is not None:
+            self._add(kind, time.time() - source_ts)
+
+    def track(self, future: Future, kind: str) -> Future:
+        """Record the landing time of an asynchronous call once it succeeded"""
+        source_ts = _source_ts.get()
+        if source_ts is None:
+            return future
+
+        def done(completed: Future) -> None:
+            try:
+                result = completed.result()
+            except Exception:
+                return
+            # Raw API response (sendMessage) or boolean (edit coalescer)
+            if result is True or (isinstance(result, dict) and result.get('ok')):
+                self._add(kind, time.time() - source_ts)
+
+        future.add_done_callback(done)
+        return future
+
+    def _add(self, kind: str, lag: float) -> None:
+        lag = max(0.0, lag)
+        freshness_lag.labels(kind).observe(lag)
+        with self._lock:
+            self.windows[kind].append(lag)
+            self.counts[kind] += 1
+            self.last_lag[kind] = lag
+            if kind == 'reception':
+                return
+            self.recent.append(lag)
+            median = sorted(self.recent)[len(self.recent) // 2]
+            was_behind = self.behind
+            self.behind = len(self.recent) == self.recent.maxlen and median > self.behind_seconds
+            if self.behind and not was_behind:
+                self.behind_since = time.time()
+                self.behind_episodes += 1
+            elif was_behind and not self.behind:
+                self.behind_since = None
+        if self.behind and not was_behind:
+            logger.warning(f"🐌 EN RETARD sur le canal source: retard médian {median:.1f}s "
+                           f"(seuil {self.behind_seconds:.0f}s)")
+        elif was_behind and not self.behind:
+            logger.info(f"✅ Retard résorbé: retard médian {median:.1f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Rolling percentiles (seconds) per kind and the behind flag"""
+        with self._lock:
+            windows = {kind: sorted(values) for kind, values in self.windows.items()}
+            stats = {
+                'enabled': self.enabled,
+                'behind': self.behind,
+                'behind_since': self.behind_since,
+                'behind_episodes': self.behind_episodes,
+                'behind_threshold_s': self.behind_seconds
+            }
+            counts = dict(self.counts)
+            last = dict(self.last_lag)
+        for kind, values in windows.items():
+            stats[kind] = {
+                'count': counts[kind],
+                'window': len(values),
+                'last': round(last[kind], 2) if last[kind] is not None else None,
+                'p50': round(_percentile(values, 0.50), 2) if values else None,
+                'p90': round(_percentile(values, 0.90), 2) if values else None,
+                'p99': round(_percentile(values, 0.99), 2) if values else None,
+                'max': round(values[-1], 2) if values else None
+            }
+        return stats
+
+    def format_report(self) -> str:
+        """Text report for the /lag admin command"""
+        stats = self.get_stats()
+        if not self.enabled:
+            return "⏱️ Mesure de fraîcheur désactivée (FRESHNESS_ENABLED=false)"
+        labels = {'reception': "📥 Réception", 'prediction': "🔮 Prédiction", 'verification': "✅ Vérification"}
+        lines = ["⏱️ **RETARD DEPUIS LE CANAL SOURCE** (secondes)"]
+        for kind in KINDS:
+            kind_stats = stats[kind]
+            if not kind_stats['window']:
+                lines.append(f"{labels[kind]}: aucune mesure")
+                continue
+            lines.append(f"{labels[kind]}: p50 {kind_stats['p50']} | p90 {kind_stats['p90']} | "
+                         f"p99 {kind_stats['p99']} | max {kind_stats['max']} | dernier {kind_stats['last']} "
+                         f"({kind_stats['window']} mesures)")
+        if stats['behind']:
+            lines.append(f"\n🐌 EN RETARD sur le canal source (seuil {stats['behind_threshold_s']:.0f}s)")
+        else:
+            lines.append(f"\n🟢 À jour (seuil {stats['behind_threshold_s']:.0f}s)")
+        return "\n".join(lines)
+
+
+# Global instance
+freshness_tracker = FreshnessTracker()
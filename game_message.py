@@ -0,0 +1,198 @@
+"""
+Parse-once representation of Baccarat source channel messages
+"""
+
+import re
+from itertools import product
+from typing import Dict, Optional, Tuple, Union
+
+# Card suits in counting order (❤️ is normalized to ♥️)
+SUITS = ("♠️", "♥️", "♦️", "♣️")
+
+# Suit index from the base character, with or without the emoji variation selector
+SUIT_INDEX = {'♠': 0, '♥': 1, '❤': 1, '♦': 2, '♣': 3}
+SUIT_BITS = (1, 2, 4, 8)
+ALL_SUITS_MASK = 0b1111
+
+# Missing-color rule: ♣️/♦️ missing → +4, ♠️/♥️ missing → +2
+MISSING_COLOR_OFFSETS = {"♣️": 4, "♦️": 4, "♠️": 2, "♥️": 2}
+
+PENDING_INDICATORS = ('⏰', '▶', '🕐', '➡️')
+COMPLETION_INDICATORS = ('✅', '🔰')
+
+# Same matching as the original per-rule regexes: the game number and the #R/#X
+# tags are found anywhere in the text, parentheses included
+GAME_NUMBER_PATTERN = re.compile(r'#[nN](\d+)')
+GROUP_PATTERN = re.compile(r'\(([^)]+)\)')
+
+# Cards counted by the CardPredictor rules: the variation selector is required, as in
+# the original string counts ('K♠9♥' holds no card for them)
+CARD_SYMBOLS = ("♠️", "♥️", "♦️", "♣️")
+
+
+class ParsedGameMessage:
+    """Compact representation of a source message, built once and shared by every rule"""
+
+    __slots__ = (
+        'text', 'game_number', 'has_r_tag', 'has_x_tag',
+        'has_pending', 'has_completion', 'has_final',
+        'groups', 'group_suit_counts', 'group_masks', 'group_first_suits', 'winning_group'
+    )
+
+    def __init__(self, text: str, game_number: Optional[int], has_r_tag: bool, has_x_tag: bool,
+                 has_pending: bool, has_completion: bool, has_final: bool,
+                 groups: Tuple[str, ...], group_suit_counts: Tuple[Tuple[int, int, int, int], ...],
+                 winning_group: Optional[int]):
+        self.text = text
+        self.game_number = game_number
+        self.has_r_tag = has_r_tag
+        self.has_x_tag = has_x_tag
+        self.has_pending = has_pending
+        self.has_completion = has_completion
+        self.has_final = has_final
+        self.groups = groups  # Normalized content of each parentheses group
+        self.group_suit_counts = group_suit_counts  # (♠️, ♥️, ♦️, ♣️) counts per group
+        self.group_masks = tuple(suit_mask(counts) for counts in group_suit_counts)  # 4-bit presence per group
+        self.group_first_suits = tuple(first_suit(group) for group in groups)  # Suit of the first card per group
+        self.winning_group = winning_group  # Index of the first group after 🔰
+
+    @classmethod
+    def from_record(cls, text: str, game_number: Optional[int], has_r_tag: bool, has_x_tag: bool,
+                    has_pending: bool, has_completion: bool, has_final: bool,
+                    group_suit_counts: Tuple[Tuple[int, int, int, int], ...],
+                    group_first_suits: Tuple[Optional[str], ...],
+                    winning_group: Optional[int]) -> 'ParsedGameMessage':
+        """
+        Rebuild a parsed message from its encoded fields without tokenizing the text.
+        Group contents are not kept (empty strings): rules only read counts, masks and first suits.
+        """
+        parsed = cls.__new__(cls)
+        parsed.text = text
+        parsed.game_number = game_number
+        parsed.has_r_tag = has_r_tag
+        parsed.has_x_tag = has_x_tag
+        parsed.has_pending = has_pending
+        parsed.has_completion = has_completion
+        parsed.has_final = has_final
+        parsed.groups = ('',) * len(group_suit_counts)
+        parsed.group_suit_counts = group_suit_counts
+        parsed.group_masks = tuple(suit_mask(counts) for counts in group_suit_counts)
+        parsed.group_first_suits = group_first_suits
+        parsed.winning_group = winning_group
+        return parsed
+
+    def card_count(self, group_index: int) -> int:
+        """Total number of cards in a group (0 if the group does not exist)"""
+        if group_index >= len(self.group_suit_counts):
+            return 0
+        return sum(self.group_suit_counts[group_index])
+
+    def has_suit(self, group_index: int, suit: str) -> bool:
+        """Whether a suit is present in a group (constant-time mask test)"""
+        index = suit_index(suit)
+        if index is None or group_index >= len(self.group_masks):
+            return False
+        return bool(self.group_masks[group_index] & SUIT_BITS[index])
+
+    def first_card_suit(self, group_index: int = 0) -> Optional[str]:
+        """Suit of the first card of a group (None if the group is missing or has no card)"""
+        if group_index >= len(self.group_first_suits):
+            return None
+        return self.group_first_suits[group_index]
+
+    def __repr__(self) -> str:
+        return f"ParsedGameMessage(game={self.game_number}, groups={self.groups})"
+
+
+def count_cards(group: str) -> Tuple[int, int, int, int]:
+    """Encode a normalized group as a (♠️, ♥️, ♦️, ♣️) count vector of CARD_SYMBOLS"""
+    return (group.count(CARD_SYMBOLS[0]), group.count(CARD_SYMBOLS[1]),
+            group.count(CARD_SYMBOLS[2]), group.count(CARD_SYMBOLS[3]))
+
+
+def count_suits(group: str) -> Tuple[int, int, int, int]:
+    """Encode a group as a (♠️, ♥️, ♦️, ♣️) count vector, variation selectors optional (config.py)"""
+    return (group.count('♠'), group.count('♥') + group.count('❤'), group.count('♦'), group.count('♣'))
+
+
+def first_suit(group: str) -> Optional[str]:
+    """Suit (as in SUITS) of the first card symbol found in a group"""
+    for char in group:
+        index = SUIT_INDEX.get(char)
+        if index is not None:
+            return SUITS[index]
+    return None
+
+
+def suit_mask(counts: Tuple[int, int, int, int]) -> int:
+    """4-bit presence mask of a count vector"""
+    return (counts[0] > 0) | (counts[1] > 0) << 1 | (counts[2] > 0) << 2 | (counts[3] > 0) << 3
+
+
+def suit_index(suit: str) -> Optional[int]:
+    """Index of a suit symbol in SUITS ('♥', '♥️', '❤️' all map to hearts)"""
+    return SUIT_INDEX.get(suit[:1])
+
+
+def _build_missing_color_table() -> Dict[Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]], Tuple[str, int]]:
+    """
+    Precompute the missing-color rule over every valid encoding: both groups hold
+    exactly 2 cards and their union covers exactly 3 suits.
+    """
+    two_card_vectors = [counts for counts in product(range(3), repeat=4) if sum(counts) == 2]
+    table = {}
+    for first, second in product(two_card_vectors, repeat=2):
+        missing = ALL_SUITS_MASK & ~(suit_mask(first) | suit_mask(second))
+        if missing in SUIT_BITS:
+            missing_color = SUITS[SUIT_BITS.index(missing)]
+            table[(first, second)] = (missing_color, MISSING_COLOR_OFFSETS[missing_color])
+    return table
+
+
+MISSING_COLOR_TABLE = _build_missing_color_table()
+
+
+def lookup_missing_color(first: Tuple[int, int, int, int], second: Tuple[int, int, int, int]) -> Optional[Tuple[str, int]]:
+    """(missing_color, offset) for two group encodings, or None if the rule does not apply"""
+    return MISSING_COLOR_TABLE.get((first, second))
+
+
+def parse_game_message(text: str) -> ParsedGameMessage:
+    """Parse a source message once; every rule then reads the result"""
+    match = GAME_NUMBER_PATTERN.search(text)
+    game_number = int(match.group(1)) if match else None
+    groups = []
+    group_starts = []
+
+    for match in GROUP_PATTERN.finditer(text):
+        groups.append(match.group(1).replace("❤️", "♥️"))
+        group_starts.append(match.start())
+
+    has_final = '🔰' in text
+    winning_group = None
+    if has_final:
+        final_pos = text.find('🔰')
+        for index, start in enumerate(group_starts):
+            if start > final_pos:
+                winning_group = index
+                break
+
+    return ParsedGameMessage(
+        text=text,
+        game_number=game_number,
+        has_r_tag='#R' in text,
+        has_x_tag='#X' in text,
+        has_pending=any(indicator in text for indicator in PENDING_INDICATORS),
+        has_completion=has_final or '✅' in text,
+        has_final=has_final,
+        groups=tuple(groups),
+        group_suit_counts=tuple(count_cards(group) for group in groups),
+        winning_group=winning_group
+    )
+
+
+def ensure_parsed(message: Union[str, ParsedGameMessage]) -> ParsedGameMessage:
+    """Accept either raw text (legacy callers) or an already parsed message"""
+    if isinstance(message, ParsedGameMessage):
+        return message
+    return parse_game_message(message)
@@ -2,21 +2,28 @@
 Event handlers for the Telegram bot - adapted for webhook deployment
 """
 
+import html
 import logging
 import os
+import threading
 from datetime import datetime, timedelta
 from collections import defaultdict
-from typing import Dict, Any, Optional
-import requests # Added import for requests
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Optional, Tuple
+from telegram_api import get_transport
+from outbound import get_dispatcher, EditCoalescer
+from game_message import ParsedGameMessage, parse_game_message
+from tracing import span, attach_future
+from freshness import freshness_tracker
+from stats import prediction_stats
+from profiler import profiler, ProfilerBusy, format_summary, parse_profile_args
+from predictor_registry import SOURCE_CHANNEL_IDS
 
 logger = logging.getLogger(__name__)
 
 # Rate limiting storage
 user_message_counts = defaultdict(list)
 
-# Target channel ID for Baccarat Kouamé
-TARGET_CHANNEL_ID = -1002682552255
-
 # Target channel ID for predictions and updates
 PREDICTION_CHANNEL_ID = -1002875505624
 
@@ -75,6 +82,10 @@ HELP_MESSAGE = """
 • `/redi` - Redirection rapide vers le chat actuel
 • `/announce [message]` - Envoyer une annonce officielle
 • `/reset` - Réinitialiser toutes les prédictions
+• `/shadow` - Taux de réussite des stratégies (live et ombre)
+• `/lag` - Retard des prédictions sur le canal source
+• `/stats` - Taux de réussite (50/200/tout) et séries
+• `/profile [cpu|mem] [secondes]` - Profil CPU ou mémoire du bot en production (admin)
 
 🔮 Fonctionnalités avancées :
 - Le bot analyse automatiquement les messages contenant des combinaisons de cartes
@@ -151,23 +162,33 @@ class TelegramHandlers:
 
     def __init__(self, bot_token: str):
         self.bot_token = bot_token
-        self.base_url = f"https://api.telegram.org/bot{bot_token}"
-        # Import card_predictor locally to avoid circular imports
+        self.transport = get_transport(bot_token)
+        self.dispatcher = get_dispatcher(bot_token)
+        self.edit_coalescer = EditCoalescer(self.dispatcher)
+        self.base_url = self.transport.base_url
+        # Import the predictor registry locally to avoid circular imports
         try:
-            from card_predictor import card_predictor
-            self.card_predictor = card_predictor
+            from predictor_registry import predictor_registry
+            self.predictor_registry = predictor_registry
+            self.card_predictor = predictor_registry.primary
         except ImportError:
             logger.error("Failed to import card_predictor")
+            self.predictor_registry = None
             self.card_predictor = None
 
         # Store redirected channels for each source chat
         self.redirected_channels = {}
 
+        # Predictions whose send is still queued: (predictor or strategy, target game) -> Future
+        # resolved once the message_id is stored, so a verification arriving first can wait for it
+        self._pending_sends: Dict[Tuple[Any, int], Future] = {}
+
         # Deployment file path - use final2025.zip
         self.deployment_file_path = "final2025.zip"
 
     def handle_update(self, update: Dict[str, Any]) -> None:
         """Handle incoming update with intelligent routing"""
+        freshness_token = self._begin_freshness(update)
         try:
             # Handle regular messages
             if 'message' in update:
@@ -197,6 +218,19 @@ class TelegramHandlers:
 
         except Exception as e:
             logger.error(f"Error handling update: {e}")
+        finally:
+            freshness_tracker.end(freshness_token)
+
+    def _begin_freshness(self, update: Dict[str, Any]):
+        """Start measuring lag from the source post/edit, for messages of followed source channels only"""
+        for update_type in ('edited_channel_post', 'channel_post', 'edited_message', 'message'):
+            message = update.get(update_type)
+            if message:
+                sender_chat_id = message.get('sender_chat', {}).get('id', message.get('chat', {}).get('id'))
+                if self.get_predictor(sender_chat_id) is None:
+                    return None
+                return freshness_tracker.begin(message.get('edit_date') or message.get('date'))
+        return None
 
     def _handle_command(self, message: Dict[str, Any]) -> None:
         """Handle commands directly"""
@@ -241,6 +275,14 @@ class TelegramHandlers:
                 self._handle_cooldown_command(chat_id, text, user_id)
             elif text.startswith('/redirect'):
                 self._handle_redirect_command(chat_id, text, user_id)
+            elif text.startswith('/shadow'):
+                self._handle_shadow_command(chat_id, user_id)
+            elif text.startswith('/lag'):
+                self._handle_lag_command(chat_id, user_id)
+            elif text.startswith('/stats'):
+                self._handle_stats_command(chat_id, user_id)
+            elif text.startswith('/profile'):
+                self._handle_profile_command(chat_id, text, user_id)
             elif text.startswith('/announce'):
                 self._handle_announce_command(chat_id, text, user_id)
             else:
@@ -274,11 +316,14 @@ class TelegramHandlers:
                     self._handle_regular_message(message)
 
                     # Also process for card prediction in channels/groups (for polling mode)
-                    if chat_type in ['group', 'supergroup', 'channel'] and self.card_predictor:
-                        self._process_card_message(message)
+                    if chat_type in ['group', 'supergroup', 'channel'] and self.predictor_registry:
+                        # Analyse unique du message, partagée par toutes les règles
+                        with span('parse'):
+                            parsed = parse_game_message(message['text'])
+                        self._process_card_message(message, parsed)
 
                         # NOUVEAU: Vérification sur messages normaux aussi
-                        self._process_verification_on_normal_message(message)
+                        self._process_verification_on_normal_message(message, parsed)
 
             # Handle new chat members
             if 'new_chat_members' in message:
@@ -309,19 +354,24 @@ class TelegramHandlers:
                 logger.info(f"✏️ WEBHOOK - Contenu édité: {text[:100]}...")
 
                 # Skip card prediction if card_predictor is not available
-                if not self.card_predictor:
+                if not self.predictor_registry:
                     logger.warning("❌ Card predictor not available")
                     return
 
-                # Vérifier que c'est du canal autorisé
-                if sender_chat_id != TARGET_CHANNEL_ID:
+                # Vérifier que c'est un canal source suivi (un shard par canal)
+                predictor = self.get_predictor(sender_chat_id)
+                if not predictor:
                     logger.warning(f"🚫 Message édité ignoré - Canal non autorisé: {sender_chat_id}")
                     return
 
-                logger.info(f"✅ WEBHOOK - Message édité du canal autorisé: {TARGET_CHANNEL_ID}")
+                logger.info(f"✅ WEBHOOK - Message édité du canal autorisé: {sender_chat_id}")
+
+                # Analyse unique du message, partagée par toutes les règles
+                with span('parse'):
+                    parsed = parse_game_message(text)
 
                 # TRAITEMENT MESSAGES ÉDITÉS AMÉLIORÉ - Prédiction ET Vérification
-                has_completion = self.card_predictor.has_completion_indicators(text)
+                has_completion = predictor.has_completion_indicators(parsed)
                 has_bozato = '🔰' in text
                 has_checkmark = '✅' in text
 
@@ -330,28 +380,33 @@ class TelegramHandlers:
 
                 if has_completion:
                     logger.info(f"🎯 ÉDITION FINALISÉE - Traitement prédiction ET vérification")
+                    predictor.mark_finalized(message_id)
 
                     # SYSTÈME 1: PRÉDICTION AUTOMATIQUE (messages édités avec finalisation)
-                    should_predict, game_number, prediction_data = self.card_predictor.should_predict(text)
+                    with span('should_predict'):
+                        should_predict, game_number, prediction_data = predictor.should_predict(
+                            parsed, chat_id=sender_chat_id, message_id=message_id
+                        )
 
                     if should_predict and game_number is not None and prediction_data is not None:
-                        prediction = self.card_predictor.make_prediction(game_number, prediction_data)
+                        with span('make_prediction'):
+                            prediction = predictor.make_prediction(game_number, prediction_data)
                         logger.info(f"🔮 PRÉDICTION depuis ÉDITION: {prediction}")
 
                         # Envoyer la prédiction et stocker les informations
-                        target_channel = self.get_redirect_channel(sender_chat_id)
-                        sent_message_info = self.send_message(target_channel, prediction)
-                        if sent_message_info and isinstance(sent_message_info, dict) and 'message_id' in sent_message_info:
-                            predicted_costume, offset = prediction_data
-                            target_game = game_number + offset
-                            self.card_predictor.sent_predictions[target_game] = {
-                                'chat_id': target_channel,
-                                'message_id': sent_message_info['message_id']
-                            }
-                            logger.info(f"📝 PRÉDICTION STOCKÉE pour jeu {target_game} vers canal {target_channel}")
+                        target_channel = self.get_redirect_channel(sender_chat_id, predictor)
+                        # Envoi asynchrone - le message_id est stocké à la réception de la réponse
+                        predicted_costume, offset = prediction_data
+                        target_game = game_number + offset
+                        send_future = freshness_tracker.track(self.send_message_async(target_channel, prediction), 'prediction')
+                        self._track_send(
+                            predictor, target_game, send_future,
+                            lambda future: self._store_sent_prediction(future, target_game, target_channel, predictor)
+                        )
 
                     # SYSTÈME 2: VÉRIFICATION UNIFIÉE (messages édités avec finalisation)
-                    verification_result = self.card_predictor._verify_prediction_common(text, is_edited=True)
+                    with span('verify'):
+                        verification_result = predictor._verify_prediction_common(parsed, is_edited=True)
                     if verification_result:
                         logger.info(f"🔍 ✅ VÉRIFICATION depuis ÉDITION: {verification_result}")
 
@@ -360,28 +415,19 @@ class TelegramHandlers:
                             new_message = verification_result.get('new_message')
 
                             # Tenter d'éditer le message de prédiction existant
-                            if predicted_game in self.card_predictor.sent_predictions and new_message:
-                                message_info = self.card_predictor.sent_predictions[predicted_game]
-                                edit_success = self.edit_message(
-                                    message_info['chat_id'],
-                                    message_info['message_id'],
-                                    new_message
-                                )
-
-                                if edit_success:
-                                    logger.info(f"🔍 ✅ MESSAGE ÉDITÉ avec succès - Prédiction {predicted_game}")
-                                else:
-                                    logger.error(f"🔍 ❌ ÉCHEC ÉDITION - Prédiction {predicted_game}")
-                            else:
-                                logger.warning(f"🔍 ⚠️ AUCUN MESSAGE STOCKÉ pour {predicted_game}")
+                            if new_message:
+                                self._edit_prediction_message(predicted_game, new_message, predictor)
                     else:
                         logger.info(f"🔍 ⭕ AUCUNE VÉRIFICATION depuis édition")
 
+                    # SYSTÈME 3: STRATÉGIES ADDITIONNELLES sur le même message analysé
+                    self._run_strategies(parsed, sender_chat_id, predictor)
+
                 # Gestion des messages temporaires
-                elif self.card_predictor.has_pending_indicators(text):
+                elif parsed.has_pending:
                     logger.info(f"⏰ WEBHOOK - Message temporaire détecté, en attente de finalisation")
                     if message_id:
-                        self.card_predictor.pending_edits[message_id] = {
+                        predictor.pending_edits[message_id] = {
                             'original_text': text,
                             'timestamp': datetime.now()
                         }
@@ -389,7 +435,106 @@ class TelegramHandlers:
         except Exception as e:
             logger.error(f"❌ Error handling edited message via webhook: {e}")
 
-    def _process_card_message(self, message: Dict[str, Any]) -> None:
+    def _edit_prediction_message(self, predicted_game: int, new_message: str, predictor=None) -> None:
+        """Edit a stored prediction message through the edit coalescer (non-blocking)"""
+        predictor = predictor or self.card_predictor
+        if self._defer_until_sent(predictor, predicted_game,
+                                  lambda: self._edit_prediction_message(predicted_game, new_message, predictor)):
+            return
+        message_info = predictor.sent_predictions.get(predicted_game)
+        if not message_info:
+            logger.warning(f"🔍 ⚠️ AUCUN MESSAGE STOCKÉ pour {predicted_game}")
+            return
+
+        def _log_edit_result(future: Future) -> None:
+            if future.exception() is None and future.result():
+                logger.info(f"🔍 ✅ MESSAGE ÉDITÉ avec succès - Prédiction {predicted_game}")
+            else:
+                logger.error(f"🔍 ❌ ÉCHEC ÉDITION - Prédiction {predicted_game}")
+
+        edit_future = self.edit_message_async(message_info['chat_id'], message_info['message_id'], new_message)
+        edit_future.add_done_callback(_log_edit_result)
+        freshness_tracker.track(edit_future, 'verification')
+
+    def _run_strategies(self, parsed: ParsedGameMessage, sender_chat_id: int, predictor) -> None:
+        """Feed a finalized game to the shard's strategy engine, post new predictions and edit resolved ones"""
+        engine = self.predictor_registry.get_engine(sender_chat_id) if self.predictor_registry else None
+        if not engine:
+            return
+
+        with span('strategies'):
+            created, resolved = engine.handle(parsed)
+
+        for strategy, predicted_game, prediction in resolved:
+            self._edit_strategy_prediction(strategy, predicted_game, prediction['final_message'])
+
+        for strategy, target_game, prediction in created:
+            if strategy.shadow:
+                # Mode ombre: vérifiée et comptée, jamais publiée
+                continue
+            target_channel = strategy.output_channel or self.get_redirect_channel(sender_chat_id, predictor)
+            send_future = freshness_tracker.track(self.send_message_async(target_channel, prediction['message_text']), 'prediction')
+            self._track_send(
+                strategy, target_game, send_future,
+                lambda future, strategy=strategy, target_game=target_game, target_channel=target_channel:
+                    self._store_strategy_prediction(future, strategy, target_game, target_channel)
+            )
+
+    def _edit_strategy_prediction(self, strategy, predicted_game: int, final_message: str) -> None:
+        """Edit a resolved strategy prediction, once its send has completed"""
+        if self._defer_until_sent(strategy, predicted_game,
+                                  lambda: self._edit_strategy_prediction(strategy, predicted_game, final_message)):
+            return
+        message_info = strategy.sent_predictions.pop(predicted_game, None)
+        if message_info:
+            freshness_tracker.track(
+                self.edit_message_async(message_info['chat_id'], message_info['message_id'], final_message),
+                'verification'
+            )
+
+    def _track_send(self, owner, target_game: int, send_future: Future, store: Callable[[Future], None]) -> None:
+        """Run `store` when the prediction send completes; edits requested meanwhile wait for it"""
+        key = (owner, target_game)
+        stored: Future = Future()
+        self._pending_sends[key] = stored
+
+        def _on_sent(future: Future) -> None:
+            try:
+                store(future)
+            finally:
+                # Drop the placeholder before releasing the waiting edits: they then read the stored message_id
+                if self._pending_sends.get(key) is stored:
+                    del self._pending_sends[key]
+                stored.set_result(None)
+
+        send_future.add_done_callback(_on_sent)
+
+    def _defer_until_sent(self, owner, target_game: int, retry: Callable[[], None]) -> bool:
+        """Replay `retry` once the pending send for `target_game` is stored; False when no send is pending"""
+        stored = self._pending_sends.get((owner, target_game))
+        if stored is None:
+            return False
+        logger.info(f"🔍 ⏳ Envoi de la prédiction {target_game} en cours - édition différée")
+        stored.add_done_callback(lambda _: retry())
+        return True
+
+    def _store_strategy_prediction(self, future: Future, strategy, target_game: int, target_channel: int) -> None:
+        """Store the message_id of a strategy prediction so it can be edited on verification"""
+        try:
+            result = future.result()
+            sent_message_info = result.get('result') if result.get('ok') else None
+            if sent_message_info and 'message_id' in sent_message_info:
+                self.edit_coalescer.remember(target_channel, sent_message_info['message_id'], sent_message_info.get('text', ''))
+                strategy.sent_predictions[target_game] = {
+                    'chat_id': target_channel,
+                    'message_id': sent_message_info['message_id']
+                }
+            else:
+                logger.error(f"Failed to send {strategy.name} prediction for game {target_game}: {result}")
+        except Exception as e:
+            logger.error(f"Error sending {strategy.name} prediction for game {target_game}: {e}")
+
+    def _process_card_message(self, message: Dict[str, Any], parsed: Optional[ParsedGameMessage] = None) -> None:
         """Process message for card prediction (works for both regular and edited messages)"""
         try:
             chat_id = message['chat']['id']
@@ -397,48 +542,49 @@ class TelegramHandlers:
             sender_chat = message.get('sender_chat', {})
             sender_chat_id = sender_chat.get('id', chat_id)
 
-            # Only process messages from Baccarat Kouamé channel
-            if sender_chat_id != TARGET_CHANNEL_ID:
+            # Only process messages from followed source channels (one shard per channel)
+            predictor = self.get_predictor(sender_chat_id)
+            if not predictor:
                 logger.info(f"🚫 Message ignoré - Canal non autorisé: {sender_chat_id}")
                 return
 
-            if not text or not self.card_predictor:
+            if not text:
                 return
 
             logger.info(f"🎯 Traitement message CANAL AUTORISÉ: {text[:50]}...")
 
+            if parsed is None:
+                parsed = parse_game_message(text)
+
             # Store temporary messages with pending indicators
-            if self.card_predictor.has_pending_indicators(text):
+            if parsed.has_pending:
                 message_id = message.get('message_id')
                 if message_id:
-                    self.card_predictor.temporary_messages[message_id] = text
+                    predictor.temporary_messages[message_id] = text
                     logger.info(f"⏰ Message temporaire stocké: {message_id}")
 
             # VÉRIFICATION AMÉLIORÉE - Messages normaux avec 🔰 ou ✅
-            has_completion = self.card_predictor.has_completion_indicators(text)
+            has_completion = predictor.has_completion_indicators(parsed)
 
             if has_completion:
                 logger.info(f"🔍 MESSAGE NORMAL avec finalisation: {text[:50]}...")
-                verification_result = self.card_predictor._verify_prediction_common(text, is_edited=False)
+                predictor.mark_finalized(message.get('message_id'))
+                with span('verify'):
+                    verification_result = predictor._verify_prediction_common(parsed, is_edited=False)
                 if verification_result:
                     logger.info(f"🔍 ✅ VÉRIFICATION depuis MESSAGE NORMAL: {verification_result}")
 
                     if verification_result['type'] == 'edit_message':
                         predicted_game = verification_result['predicted_game']
-                        if predicted_game in self.card_predictor.sent_predictions:
-                            message_info = self.card_predictor.sent_predictions[predicted_game]
-                            edit_success = self.edit_message(
-                                message_info['chat_id'],
-                                message_info['message_id'],
-                                verification_result['new_message']
-                            )
-                            if edit_success:
-                                logger.info(f"✅ MESSAGE ÉDITÉ depuis message normal - Prédiction {predicted_game}")
+                        self._edit_prediction_message(predicted_game, verification_result['new_message'], predictor)
+
+                # Stratégies additionnelles sur le même message analysé
+                self._run_strategies(parsed, sender_chat_id, predictor)
 
         except Exception as e:
             logger.error(f"Error processing card message: {e}")
 
-    def _process_verification_on_normal_message(self, message: Dict[str, Any]) -> None:
+    def _process_verification_on_normal_message(self, message: Dict[str, Any], parsed: Optional[ParsedGameMessage] = None) -> None:
         """Process verification on normal messages (not just edited ones)"""
         try:
             text = message.get('text', '')
@@ -446,28 +592,26 @@ class TelegramHandlers:
             sender_chat = message.get('sender_chat', {})
             sender_chat_id = sender_chat.get('id', chat_id)
 
-            # Only process messages from Baccarat Kouamé channel
-            if sender_chat_id != TARGET_CHANNEL_ID:
+            # Only process messages from followed source channels (one shard per channel)
+            predictor = self.get_predictor(sender_chat_id)
+            if not predictor:
                 return
 
-            if not text or not self.card_predictor:
+            if not text:
                 return
 
-            has_completion = self.card_predictor.has_completion_indicators(text)
+            if parsed is None:
+                parsed = parse_game_message(text)
+
+            has_completion = predictor.has_completion_indicators(parsed)
 
             if has_completion:
-                verification_result = self.card_predictor._verify_prediction_common(text, is_edited=False)
+                with span('verify'):
+                    verification_result = predictor._verify_prediction_common(parsed, is_edited=False)
                 if verification_result:
                     if verification_result['type'] == 'edit_message':
                         predicted_game = verification_result['predicted_game']
-
-                        if predicted_game in self.card_predictor.sent_predictions:
-                            message_info = self.card_predictor.sent_predictions[predicted_game]
-                            edit_success = self.edit_message(
-                                message_info['chat_id'],
-                                message_info['message_id'],
-                                verification_result['new_message']
-                            )
+                        self._edit_prediction_message(predicted_game, verification_result['new_message'], predictor)
 
         except Exception as e:
             logger.error(f"❌ Error processing verification on normal message: {e}")
@@ -600,15 +744,14 @@ class TelegramHandlers:
                     "• Gunicorn avec 1 worker\n"
                     "• Timeout 120 secondes\n\n"
                     "🎯 **CANAUX CONFIGURÉS :**\n"
-                    "• Canal SOURCE : -1002682552255 (Baccarat Kouamé)\n"
-                    "• Canal PRÉDICTIONS : -1002875505624 (envoi automatique)\n\n"
+                    f"{self._configured_channels_text()}\n"
                     "🔍 **SYSTÈME DE VÉRIFICATION :**\n"
                     "• +0 → ✅0️⃣ | +1 → ✅1️⃣ | +2 → ✅2️⃣ | +3 → ✅3️⃣\n"
                     "• Aucun match → ❌\n\n"
                     "⚠️ **RÈGLE #R EXCLUSIVE :**\n"
                     "Le bot analyse UNIQUEMENT les messages contenant #R\n"
                     "Tous les autres messages sont ignorés\n\n"
-                    "🎯 Le bot enverra automatiquement les prédictions au canal -1002875505624 !"
+                    "🎯 Le bot enverra automatiquement les prédictions aux canaux ci-dessus !"
                 )
 
         except Exception as e:
@@ -711,13 +854,108 @@ class TelegramHandlers:
                 self.send_message(chat_id, "❌ Nombre invalide")
                 return
 
-            if self.card_predictor:
-                self.card_predictor.prediction_cooldown = seconds
+            if self.predictor_registry:
+                for predictor in self.predictor_registry:
+                    predictor.set_prediction_cooldown(seconds)
                 self.send_message(chat_id, f"✅ Cooldown mis à jour: {seconds}s")
 
         except Exception as e:
             logger.error(f"Error handling cooldown command: {e}")
 
+    def _handle_shadow_command(self, chat_id: int, user_id: Optional[int] = None) -> None:
+        """Handle /shadow command - compare live and shadow strategy hit rates"""
+        try:
+            if user_id and not self._is_authorized_user(user_id):
+                self.send_message(chat_id, "🚫 Vous n'êtes pas autorisé à utiliser ce bot.")
+                return
+
+            if not self.predictor_registry:
+                return
+
+            lines = ["🕶️ **STRATÉGIES - TAUX DE RÉUSSITE**"]
+            for source_id, predictor in self.predictor_registry.items():
+                with predictor.lock:
+                    archived = list(predictor.predictions.archive.values())
+                wins = sum(1 for prediction in archived if prediction.get('status') == 'correct')
+                rate = f"{wins / len(archived):.0%}" if archived else "-"
+                lines.append(f"\n📡 Canal {source_id}")
+                lines.append(f"• principale (live): {wins}/{len(archived)} ✅ ({rate})")
+
+                engine = self.predictor_registry.get_engine(source_id)
+                for name, stats in (engine.get_stats() if engine else {}).items():
+                    resolved = stats['wins'] + stats['losses']
+                    rate = f"{stats['win_rate']:.0%}" if stats['win_rate'] is not None else "-"
+                    mode = "ombre" if stats['shadow'] else "live"
+                    by_offset = " ".join(f"✅{offset}️⃣{count}" for offset, count in enumerate(stats['wins_by_offset']))
+                    lines.append(f"• {name} ({mode}): {stats['wins']}/{resolved} ✅ ({rate}) | {by_offset} | ⏳{stats['pending']}")
+
+            self.send_message(chat_id, "\n".join(lines))
+
+        except Exception as e:
+            logger.error(f"Error handling shadow command: {e}")
+
+    def _handle_lag_command(self, chat_id: int, user_id: Optional[int] = None) -> None:
+        """Handle /lag command - rolling lag percentiles from the source post to our post/edit"""
+        try:
+            if user_id and not self._is_authorized_user(user_id):
+                self.send_message(chat_id, "🚫 Vous n'êtes pas autorisé à utiliser ce bot.")
+                return
+            self.send_message(chat_id, freshness_tracker.format_report())
+        except Exception as e:
+            logger.error(f"Error handling lag command: {e}")
+
+    def _handle_stats_command(self, chat_id: int, user_id: Optional[int] = None) -> None:
+        """Handle /stats command - rolling win rates by suit, offset and strategy, and streaks"""
+        try:
+            if user_id and not self._is_authorized_user(user_id):
+                self.send_message(chat_id, "🚫 Vous n'êtes pas autorisé à utiliser ce bot.")
+                return
+            self.send_message(chat_id, prediction_stats.format_report())
+        except Exception as e:
+            logger.error(f"Error handling stats command: {e}")
+
+    def _handle_profile_command(self, chat_id: int, text: str, user_id: Optional[int] = None) -> None:
+        """Handle /profile command - sample the running bot (CPU or memory) for N seconds, admin only"""
+        try:
+            if not user_id or not self._is_authorized_user(user_id):
+                self.send_message(chat_id, "🚫 Vous n'êtes pas autorisé à utiliser ce bot.")
+                return
+
+            try:
+                args = parse_profile_args(text)
+            except ValueError as e:
+                self.send_message(chat_id, f"❌ {e}\nUsage: /profile [cpu|mem] [secondes]")
+                return
+            if profiler.running:
+                self.send_message(chat_id, f"⏳ Profil {profiler.running} déjà en cours, réessayez plus tard.")
+                return
+
+            seconds = profiler.clamp_seconds(args['seconds'])
+            self.send_message(chat_id, f"🔬 Profil {args['mode']} en cours pendant {seconds:.0f}s...")
+            # Hors du worker d'updates: le profil dure plusieurs secondes
+            threading.Thread(target=self._run_profile, args=(chat_id, args['mode'], seconds),
+                             name="profiler", daemon=True).start()
+
+        except Exception as e:
+            logger.error(f"Error handling profile command: {e}")
+
+    def _run_profile(self, chat_id: int, mode: str, seconds: float) -> None:
+        """Run a profile and send its summary and full dump (folded stacks or memory report)"""
+        try:
+            result = profiler.run(mode, seconds)
+        except ProfilerBusy as e:
+            self.send_message(chat_id, f"⏳ {e}")
+            return
+        except Exception as e:
+            logger.error(f"Error running profile: {e}")
+            self.send_message(chat_id, f"❌ Erreur du profil: {e}")
+            return
+
+        self.send_message(chat_id, f"<pre>{html.escape(format_summary(result))}</pre>")
+        if result['path']:
+            caption = "🔥 Piles repliées (flamegraph.pl, speedscope)" if mode == 'cpu' else "🧠 Rapport mémoire complet"
+            self.send_document(chat_id, result['path'], caption=caption, mime_type='text/plain')
+
     def _handle_announce_command(self, chat_id: int, text: str, user_id: Optional[int] = None) -> None:
         """Handle /announce command"""
         try:
@@ -731,13 +969,14 @@ class TelegramHandlers:
                 return
 
             announcement_text = parts[1]
-            target_channel = self.get_redirect_channel(-1002682552255)
             formatted_message = f"📢 **ANONCE OFFICIELLE** 📢\n\n{announcement_text}"
 
-            sent_message_info = self.send_message(target_channel, formatted_message)
+            # Every prediction channel once, even if several sources share it
+            target_channels = dict.fromkeys(self.get_redirect_channel(source_id) for source_id in SOURCE_CHANNEL_IDS)
+            sent = [target for target in target_channels if self.send_message(target, formatted_message)]
 
-            if sent_message_info:
-                self.send_message(chat_id, "✅ Annonce envoyée avec succès !")
+            if sent:
+                self.send_message(chat_id, f"✅ Annonce envoyée avec succès ({len(sent)}/{len(target_channels)} canaux) !")
 
         except Exception as e:
             logger.error(f"Error handling announce command: {e}")
@@ -755,8 +994,9 @@ class TelegramHandlers:
                 return
 
             if parts[1] == "clear":
-                if self.card_predictor:
-                    self.card_predictor.redirect_channels.clear()
+                if self.predictor_registry:
+                    for predictor in self.predictor_registry:
+                        predictor.clear_redirect_channels()
                     self.send_message(chat_id, "✅ Redirections supprimées")
                 return
 
@@ -772,7 +1012,9 @@ class TelegramHandlers:
                 return
 
             if self.card_predictor:
-                self.card_predictor.set_redirect_channel(source_id, target_id)
+                # La redirection est portée par le shard du canal source
+                predictor = self.get_predictor(source_id) or self.card_predictor
+                predictor.set_redirect_channel(source_id, target_id)
                 self.send_message(chat_id, f"✅ Redirection: {source_id} → {target_id}")
 
         except Exception as e:
@@ -799,8 +1041,9 @@ class TelegramHandlers:
                 self.send_message(chat_id, "❌ Position invalide")
                 return
 
-            if self.card_predictor:
-                self.card_predictor.set_position_preference(position)
+            if self.predictor_registry:
+                for predictor in self.predictor_registry:
+                    predictor.set_position_preference(position)
                 self.send_message(chat_id, f"✅ Position de carte: {position}")
 
         except Exception as e:
@@ -854,17 +1097,32 @@ class TelegramHandlers:
             if user_id and not self._is_authorized_user(user_id):
                 return
 
-            if self.card_predictor:
-                self.card_predictor.sent_predictions = {}
+            if self.predictor_registry:
+                for predictor in self.predictor_registry:
+                    predictor.clear_sent_predictions()
                 self.send_message(sender_chat_id, "✅ Prédictions supprimées.")
 
         except Exception as e:
             logger.error(f"Error handling reset command: {e}")
 
-    def get_redirect_channel(self, source_chat_id: int) -> int:
+    def get_predictor(self, source_chat_id: int):
+        """CardPredictor shard following this source channel, or None if it is not followed"""
+        if not self.predictor_registry:
+            return None
+        return self.predictor_registry.get(source_chat_id)
+
+    def _configured_channels_text(self) -> str:
+        """One line per followed source channel with the channel its predictions go to"""
+        return "".join(
+            f"• Canal SOURCE : {source_id} → PRÉDICTIONS : {self.get_redirect_channel(source_id)}\n"
+            for source_id in SOURCE_CHANNEL_IDS
+        )
+
+    def get_redirect_channel(self, source_chat_id: int, predictor=None) -> int:
         """Get the target channel for redirection"""
-        if self.card_predictor and hasattr(self.card_predictor, 'redirect_channels'):
-            redirect_target = self.card_predictor.redirect_channels.get(source_chat_id)
+        predictor = predictor or self.get_predictor(source_chat_id) or self.card_predictor
+        if predictor and hasattr(predictor, 'redirect_channels'):
+            redirect_target = predictor.redirect_channels.get(source_chat_id)
             if redirect_target:
                 return redirect_target
 
@@ -874,18 +1132,33 @@ class TelegramHandlers:
 
         return PREDICTION_CHANNEL_ID
 
-    def send_message(self, chat_id: int, text: str) -> Dict[str, Any] | bool:
-        """Send text message to user using direct API call"""
+    def _store_sent_prediction(self, future: Future, target_game: int, target_channel: int, predictor=None) -> None:
+        """Store the message_id of a sent prediction so it can be edited on verification"""
         try:
-            url = f"{self.base_url}/sendMessage"
-            data = {
-                'chat_id': chat_id,
-                'text': text,
-                'parse_mode': 'HTML'
-            }
+            result = future.result()
+            sent_message_info = result.get('result') if result.get('ok') else None
+            if sent_message_info and 'message_id' in sent_message_info:
+                self.edit_coalescer.remember(target_channel, sent_message_info['message_id'], sent_message_info.get('text', ''))
+                (predictor or self.card_predictor).record_sent_prediction(target_game, target_channel, sent_message_info['message_id'])
+                logger.info(f"📝 PRÉDICTION STOCKÉE pour jeu {target_game} vers canal {target_channel}")
+            else:
+                logger.error(f"Failed to send prediction for game {target_game}: {result}")
+        except Exception as e:
+            logger.error(f"Error sending prediction for game {target_game}: {e}")
 
-            response = requests.post(url, json=data, timeout=10)
-            result = response.json()
+    def send_message_async(self, chat_id: int, text: str) -> Future:
+        """Queue a text message; the Future resolves to the raw API response"""
+        data = {
+            'chat_id': chat_id,
+            'text': text,
+            'parse_mode': 'HTML'
+        }
+        return attach_future(self.dispatcher.submit('sendMessage', data, chat_id=chat_id), 'send_message')
+
+    def send_message(self, chat_id: int, text: str) -> Dict[str, Any] | bool:
+        """Send text message to user through the rate-limited dispatcher"""
+        try:
+            result = self.send_message_async(chat_id, text).result()
 
             if result.get('ok'):
                 logger.info(f"Message sent successfully to chat {chat_id}")
@@ -898,22 +1171,20 @@ class TelegramHandlers:
             logger.error(f"Error sending message: {e}")
             return False
 
-    def send_document(self, chat_id: int, file_path: str) -> bool:
+    def send_document(self, chat_id: int, file_path: str, caption: str = '📦 Package de déploiement pour render.com',
+                      mime_type: str = 'application/zip') -> bool:
         """Send document file to user"""
         try:
-            url = f"{self.base_url}/sendDocument"
-
             with open(file_path, 'rb') as file:
                 files = {
-                    'document': (os.path.basename(file_path), file, 'application/zip')
+                    'document': (os.path.basename(file_path), file, mime_type)
                 }
                 data = {
                     'chat_id': chat_id,
-                    'caption': '📦 Package de déploiement pour render.com'
+                    'caption': caption
                 }
 
-                response = requests.post(url, data=data, files=files, timeout=60)
-                result = response.json()
+                result = self.dispatcher.call('sendDocument', data, chat_id=chat_id, files=files, timeout=60)
 
                 if result.get('ok'):
                     logger.info(f"Document sent successfully to chat {chat_id}")
@@ -929,27 +1200,18 @@ class TelegramHandlers:
             logger.error(f"Error sending document: {e}")
             return False
 
-    def edit_message(self, chat_id: int, message_id: int, new_text: str) -> bool:
-        """Edit an existing message using direct API call"""
-        try:
-            url = f"{self.base_url}/editMessageText"
-            data = {
-                'chat_id': chat_id,
-                'message_id': message_id,
-                'text': new_text,
-                'parse_mode': 'HTML'
-            }
-
-            response = requests.post(url, json=data, timeout=10)
-            result = response.json()
+    def edit_message_async(self, chat_id: int, message_id: int, new_text: str) -> Future:
+        """Queue an edit; repeated edits of the same message are coalesced and no-op edits dropped"""
+        return attach_future(self.edit_coalescer.submit(chat_id, message_id, new_text), 'edit_message')
 
-            if result.get('ok'):
+    def edit_message(self, chat_id: int, message_id: int, new_text: str) -> bool:
+        """Edit an existing message through the edit coalescer and wait for the result"""
+        try:
+            success = self.edit_message_async(chat_id, message_id, new_text).result()
+            if success:
                 logger.info(f"Message edited successfully in chat {chat_id}")
-                return True
-            else:
-                logger.error(f"Failed to edit message: {result}")
-                return False
+            return success
 
         except Exception as e:
             logger.error(f"Error editing message: {e}")
-            return False
\ No newline at end of file
+            return False
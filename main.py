@@ -2,10 +2,20 @@
 Main entry point for the Telegram bot deployment on render.com
 """
 import os
+import time
+import atexit
 import logging
-from flask import Flask, request
+import threading
+from flask import Flask, Response, request
 from bot import TelegramBot
-from config import Config
+from settings import Config
+from update_queue import UpdateQueue
+from capture import create_capture_from_env
+import metrics
+from tracing import tracer
+from admin_auth import check_admin_token, ADMIN_TOKEN_HEADER
+from stats import prediction_stats
+from profiler import profiler
 
 # Configure logging
 logging.basicConfig(
@@ -21,6 +31,28 @@ app = Flask(__name__)
 try:
     config = Config()
     bot = TelegramBot(config.BOT_TOKEN)
+    update_queue = UpdateQueue(bot.handle_update)
+    update_queue.start()
+    # Capture optionnelle des updates bruts (CAPTURE_DIR) pour rejeu et benchmarks
+    update_capture = create_capture_from_env()
+    if update_capture:
+        atexit.register(update_capture.close)
+    # Préchauffage des connexions keep-alive vers api.telegram.org sans bloquer le démarrage
+    threading.Thread(target=bot.transport.warm_up, name="telegram-warm-up", daemon=True).start()
+    # Écrire les derniers enregistrements du journal d'état à l'arrêt
+    if bot.handlers.predictor_registry:
+        atexit.register(bot.handlers.predictor_registry.close)
+        metrics.pending_predictions.set_function(bot.handlers.predictor_registry.pending_by_source)
+        metrics.dedup_hits.set_function(bot.handlers.predictor_registry.dedup_hits_by_source)
+        # Structures mesurées avant/après un /profile mem
+        shards = bot.handlers.predictor_registry
+        profiler.register_structure('predictions.pending', lambda: shards.total(lambda shard: len(shard.predictions.pending)))
+        profiler.register_structure('predictions.archive', lambda: shards.total(lambda shard: len(shard.predictions.archive)))
+        profiler.register_structure('processed_messages', lambda: shards.total(lambda shard: len(shard.processed_messages)))
+    # Compteurs déjà tenus par les composants: lus au moment du scrape, aucun coût par update
+    metrics.queue_depth.set_function(lambda: {('updates',): update_queue.depth(), ('outbound',): bot.dispatcher.depth()})
+    metrics.updates_dropped.set_function(lambda: update_queue.dropped_count)
+    metrics.send_failures.set_function(lambda: bot.dispatcher.failed_count)
     logger.info("✅ Bot initialisé avec succès")
 except ValueError as e:
     logger.error(f"❌ ERREUR CRITIQUE: {e}")
@@ -33,39 +65,68 @@ except Exception as e:
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Handle incoming webhook from Telegram"""
+    start = time.perf_counter()
+    # Trace de l'update: décodage ici, attente en file et étapes de traitement dans le worker
+    trace = tracer.start('webhook')
     try:
+        if update_capture:
+            # Corps brut tel que reçu, écrit hors du thread de requête
+            update_capture.record(request.get_data())
+
         update = request.get_json()
+        if trace is not None:
+            trace.mark('json_decode')
 
-        # Log type de message reçu avec détails
-        if 'message' in update:
-            msg = update['message']
-            chat_id = msg.get('chat', {}).get('id', 'unknown')
-            user_id = msg.get('from', {}).get('id', 'unknown')
-            text = msg.get('text', '')[:50]
-            logger.info(f"📨 WEBHOOK - Message normal | Chat:{chat_id} | User:{user_id} | Text:{text}...")
-        elif 'edited_message' in update:
-            msg = update['edited_message']
-            chat_id = msg.get('chat', {}).get('id', 'unknown')
-            user_id = msg.get('from', {}).get('id', 'unknown')
-            text = msg.get('text', '')[:50]
-            logger.info(f"✏️ WEBHOOK - Message édité | Chat:{chat_id} | User:{user_id} | Text:{text}...")
-
-        logger.info(f"Webhook received update: {update}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Webhook received update: {update}")
 
         if update:
-            # Traitement direct pour meilleure réactivité
-            bot.handle_update(update)
-            logger.info("Update processed successfully")
+            if trace is not None:
+                trace.attrs['update_id'] = update.get('update_id')
+            # Mise en file d'attente - réponse immédiate à Telegram, traitement par les workers
+            if not update_queue.submit(update, trace):
+                logger.warning("Update dropped - queue full")
 
         return 'OK', 200
     except Exception as e:
         logger.error(f"Error handling webhook: {e}")
         return 'Error', 500
+    finally:
+        metrics.webhook_duration.observe(time.perf_counter() - start)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for render.com"""
-    return {'status': 'healthy', 'service': 'telegram-bot'}, 200
+    return {
+        'status': 'healthy',
+        'service': 'telegram-bot',
+        'update_queue': update_queue.get_stats(),
+        'telegram_api': bot.transport.get_latency_stats(),
+        'outbound': bot.dispatcher.get_stats(),
+        'edits': bot.handlers.edit_coalescer.get_stats(),
+        'predictors': bot.handlers.predictor_registry.get_stats() if bot.handlers.predictor_registry else {},
+        'capture': update_capture.get_stats() if update_capture else None
+    }, 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/admin/slow-updates', methods=['GET'])
+def slow_updates():
+    """Slow-update log with per-stage breakdown (ADMIN_TOKEN required)"""
+    if not check_admin_token(request.headers.get(ADMIN_TOKEN_HEADER) or request.args.get('token')):
+        return {'error': 'forbidden'}, 403
+    limit = request.args.get('limit', default=50, type=int)
+    return {'tracing': tracer.get_stats(), 'slow_updates': tracer.get_slow(limit)}, 200
+
+@app.route('/admin/stats', methods=['GET'])
+def prediction_stats_endpoint():
+    """Rolling win rates and streaks of resolved predictions (ADMIN_TOKEN required)"""
+    if not check_admin_token(request.headers.get(ADMIN_TOKEN_HEADER) or request.args.get('token')):
+        return {'error': 'forbidden'}, 403
+    return prediction_stats.get_stats(), 200
 
 @app.route('/', methods=['GET'])
 def home():
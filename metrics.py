@@ -0,0 +1,255 @@
+"""
+Prometheus-style metrics (text exposition format 0.0.4), without external dependency
+
+Recording on the hot path is one dict lookup for labelled metrics plus a
+locked add (histograms: one bisect more), about a microsecond per record.
+Values that components already count (queue depth, dedup hits, dispatcher
+failures...) are not recorded twice: they are read at scrape time through
+set_function().
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds: webhook handling is sub-millisecond, Telegram API calls tens to hundreds of ms
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+# Scrape-time value: a number (unlabelled metric) or {label values: number}
+MetricFunction = Callable[[], Union[float, Dict[LabelValues, float]]]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Value:
+    """One counter / gauge time series"""
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    """One histogram time series: per-bucket counts, sum and count"""
+
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    """Metric family: one time series per label values tuple"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        self._children_lock = threading.Lock()
+        self._function: Optional[MetricFunction] = None
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """Time series for these label values (created on first use)"""
+        child = self._children.get(values)
+        if child is None:
+            key = tuple(str(value) for value in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+            with self._children_lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def set_function(self, function: MetricFunction) -> None:
+        """Read the value(s) from `function` at scrape time instead of recording them"""
+        self._function = function
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        if self._function is not None:
+            result = self._function()
+            if not isinstance(result, dict):
+                result = {(): result}
+            return [('', _format_labels(self.labelnames, key), value) for key, value in result.items()]
+        return [('', _format_labels(self.labelnames, key), child.value) for key, child in list(self._children.items())]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(bucket for bucket in buckets if bucket != math.inf))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        samples = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                samples.append(('_bucket', _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"'), cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics of one process, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        if not metric.labelnames:
+            # Unlabelled series are exposed (at 0) before their first update
+            metric.labels()
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # A failing scrape-time function must not hide the other metrics
+                lines.append(f"# {metric.name} indisponible: {_escape(str(e))}")
+        return '\n'.join(lines) + '\n'
+
+
+# Global instance
+registry = MetricsRegistry()
+
+# Hot path (recorded)
+webhook_duration = registry.histogram(
+    'webhook_request_duration_seconds', 'Time spent handling one webhook request')
+update_duration = registry.histogram(
+    'update_processing_duration_seconds', 'Time spent processing one update in the update workers')
+telegram_api_duration = registry.histogram(
+    'telegram_api_request_duration_seconds', 'Telegram API call latency', ('method',))
+predictions_made = registry.counter(
+    'predictions_total', 'Predictions made', ('source',))
+prediction_wins = registry.counter(
+    'prediction_wins_total', 'Predictions won, by verification offset', ('source', 'offset'))
+prediction_losses = registry.counter(
+    'prediction_losses_total', 'Predictions lost', ('source',))
+send_failures = registry.counter(
+    'telegram_send_failures_total', 'Telegram calls that failed after retries')
+
+# Read at scrape time (set_function)
+dedup_hits = registry.counter(
+    'dedup_hits_total', 'Duplicate messages skipped', ('cache',))
+updates_dropped = registry.counter(
+    'updates_dropped_total', 'Updates dropped because the update queue was full')
+pending_predictions = registry.gauge(
+    'pending_predictions', 'Predictions waiting for verification', ('source',))
+queue_depth = registry.gauge(
+    'queue_depth', 'Items waiting in a queue', ('queue',))
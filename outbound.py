@@ -0,0 +1,458 @@
+"""
+Rate-limit-aware outbound dispatcher for Telegram Bot API calls
+"""
+
+import os
+import time
+import heapq
+import random
+import itertools
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Dict, Any, Deque, Optional, List, Tuple
+
+import requests
+
+from telegram_api import TelegramTransport, get_transport
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+OUTBOUND_WORKERS = int(os.getenv('OUTBOUND_WORKERS', '4'))
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))  # messages per second, all chats
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))  # messages per second, private chats
+OUTBOUND_GROUP_RATE = float(os.getenv('OUTBOUND_GROUP_RATE', str(20 / 60)))  # messages per second, groups/channels
+OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', '3'))
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '5'))
+OUTBOUND_BACKOFF_BASE = 0.5  # seconds
+OUTBOUND_BACKOFF_MAX = 30.0  # seconds
+EDIT_CACHE_SIZE = int(os.getenv('EDIT_CACHE_SIZE', '1000'))
+
+# Methods that post something new: sent twice, they post twice
+NON_IDEMPOTENT_PREFIXES = ('send', 'forward', 'copy')
+
+
+def is_idempotent(method: str) -> bool:
+    """Whether a Bot API call can be retried after a read timeout without side effects"""
+    return not method.startswith(NON_IDEMPOTENT_PREFIXES)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; reserve() returns how long to wait for a token"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token (possibly going into debt) and return the wait in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class OutboundJob:
+    """One pending Bot API call"""
+
+    __slots__ = ('method', 'payload', 'chat_id', 'files', 'timeout', 'future', 'attempts', 'slot_reserved')
+
+    def __init__(self, method: str, payload: Dict[str, Any], chat_id: Optional[int],
+                 files: Optional[Dict[str, Any]], timeout: float):
+        self.method = method
+        self.payload = payload
+        self.chat_id = chat_id
+        self.files = files
+        self.timeout = timeout
+        self.future: Future = Future()
+        self.attempts = 0
+        self.slot_reserved = False  # rate-limit tokens already taken for the next attempt
+
+
+class OutboundDispatcher:
+    """
+    Sends every outbound Bot API call through per-chat and global token buckets.
+
+    Calls are queued per chat and executed by a pool of worker threads. A chat
+    has at most one call in progress, so messages to the same chat keep their
+    order. A chat that has to wait (token bucket, 429 `retry_after` given by
+    Telegram, backoff after a network or 5xx error) goes back on a schedule
+    heap with the time it becomes ready, and the worker moves on to other
+    chats: a flood-limited group never holds up the others. submit() returns
+    a Future resolving to the decoded API response.
+
+    sendMessage, sendDocument, forwardMessage... are retried only after a
+    connection error, a 429 or a 5xx; a read timeout or an undecodable
+    response fails them, since Telegram may already have posted the message.
+    """
+
+    def __init__(self, transport: TelegramTransport,
+                 workers: int = OUTBOUND_WORKERS,
+                 global_rate: float = OUTBOUND_GLOBAL_RATE,
+                 chat_rate: float = OUTBOUND_CHAT_RATE,
+                 group_rate: float = OUTBOUND_GROUP_RATE,
+                 chat_burst: int = OUTBOUND_CHAT_BURST,
+                 max_retries: int = OUTBOUND_MAX_RETRIES):
+        self.transport = transport
+        self.workers = max(1, workers)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._blocked_until: Dict[Optional[int], float] = {}
+        self._lock = threading.Lock()
+
+        # Per-chat FIFO of calls; a chat with calls has exactly one entry in the schedule heap
+        # or one call in progress
+        self._chat_jobs: Dict[Optional[int], Deque[OutboundJob]] = {}
+        self._schedule: List[Tuple[float, int, Optional[int]]] = []  # (ready at, sequence, chat_id)
+        self._sequence = itertools.count()
+        self._ready = threading.Condition(threading.Lock())
+        self._pending = 0
+
+        self._threads: List[threading.Thread] = []
+        self.sent_count = 0
+        self.retry_count = 0
+        self.rate_limited_count = 0
+        self.failed_count = 0
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"outbound-worker-{index}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, method: str, payload: Dict[str, Any], chat_id: Optional[int] = None,
+               files: Optional[Dict[str, Any]] = None, timeout: float = 10) -> Future:
+        """Queue a Bot API call and return a Future of its JSON response"""
+        if not self._threads:
+            self.start()
+        if chat_id is None:
+            chat_id = payload.get('chat_id')
+        job = OutboundJob(method, payload, chat_id, files, timeout)
+        with self._ready:
+            self._pending += 1
+            jobs = self._chat_jobs.get(chat_id)
+            if jobs is None:
+                # Idle chat: ready right away
+                self._chat_jobs[chat_id] = deque([job])
+                self._schedule_locked(chat_id, 0.0)
+            else:
+                jobs.append(job)
+        return job.future
+
+    def call(self, method: str, payload: Dict[str, Any], chat_id: Optional[int] = None,
+             files: Optional[Dict[str, Any]] = None, timeout: float = 10) -> Dict[str, Any]:
+        """Blocking helper: submit and wait for the response"""
+        future = self.submit(method, payload, chat_id=chat_id, files=files, timeout=timeout)
+        return future.result()
+
+    def depth(self) -> int:
+        """Number of calls waiting to be sent or in progress"""
+        return self._pending
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return dispatcher counters"""
+        return {
+            'depth': self.depth(),
+            'waiting_chats': len(self._schedule),
+            'sent': self.sent_count,
+            'retries': self.retry_count,
+            'rate_limited': self.rate_limited_count,
+            'failed': self.failed_count
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            with self._lock:
+                bucket = self._chat_buckets.get(chat_id)
+                if bucket is None:
+                    # Negative ids are groups and channels, limited to ~20 messages per minute
+                    rate = self.group_rate if chat_id < 0 else self.chat_rate
+                    bucket = TokenBucket(rate, self.chat_burst)
+                    self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _schedule_locked(self, chat_id: Optional[int], ready_at: float) -> None:
+        heapq.heappush(self._schedule, (ready_at, next(self._sequence), chat_id))
+        self._ready.notify()
+
+    def _next_job(self) -> OutboundJob:
+        """Wait for the earliest chat whose ready time has come; returns its oldest call"""
+        with self._ready:
+            while True:
+                if not self._schedule:
+                    self._ready.wait()
+                    continue
+                ready_at, _, chat_id = self._schedule[0]
+                delay = ready_at - time.monotonic()
+                if delay > 0:
+                    self._ready.wait(delay)
+                    continue
+                heapq.heappop(self._schedule)
+                return self._chat_jobs[chat_id][0]
+
+    def _finish_attempt(self, job: OutboundJob, delay: Optional[float]) -> None:
+        """Put the chat back on the schedule: after `delay` to retry `job`, or right away for its next call"""
+        with self._ready:
+            if delay is not None:
+                self._schedule_locked(job.chat_id, time.monotonic() + delay)
+                return
+            self._pending -= 1
+            jobs = self._chat_jobs[job.chat_id]
+            jobs.popleft()
+            if jobs:
+                self._schedule_locked(job.chat_id, 0.0)
+            else:
+                del self._chat_jobs[job.chat_id]
+
+    def _reserve_tokens(self, chat_id: Optional[int]) -> float:
+        """Take per-chat and global tokens; returns the wait before they are available"""
+        wait = 0.0
+        if isinstance(chat_id, int):
+            wait = self._chat_bucket(chat_id).reserve()
+        return max(wait, self.global_bucket.reserve())
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(OUTBOUND_BACKOFF_MAX, OUTBOUND_BACKOFF_BASE * (2 ** (attempts - 1)))
+        return delay + random.uniform(0, delay / 2)
+
+    def _execute(self, job: OutboundJob) -> Optional[float]:
+        """
+        One step of a call, never sleeping: returns None once its Future is resolved,
+        else the seconds to wait before the chat is tried again
+        """
+        if not job.slot_reserved:
+            # Chat paused by a 429: wait without taking tokens
+            blocked_for = self._blocked_until.get(job.chat_id, 0) - time.monotonic()
+            if blocked_for > 0:
+                return blocked_for
+            job.slot_reserved = True
+            wait = self._reserve_tokens(job.chat_id)
+            if wait > 0:
+                return wait
+
+        job.slot_reserved = False
+        job.attempts += 1
+        try:
+            if job.files:
+                # Rewind file objects before a retry
+                for value in job.files.values():
+                    if isinstance(value, tuple) and len(value) > 1 and hasattr(value[1], 'seek'):
+                        value[1].seek(0)
+                result = self.transport.call(job.method, data=job.payload, files=job.files, timeout=job.timeout)
+            else:
+                result = self.transport.call(job.method, json=job.payload, timeout=job.timeout)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # A read timeout or an undecodable response may follow a request Telegram
+            # already executed: a send is only retried when the connection itself failed
+            never_sent = isinstance(e, requests.exceptions.ConnectionError)  # ConnectTimeout included
+            if job.attempts > self.max_retries or not (never_sent or is_idempotent(job.method)):
+                if job.attempts <= self.max_retries:
+                    logger.warning(f"⚠️ {job.method} non renvoyé ({e!r}): Telegram a pu le traiter")
+                self._count('failed_count')
+                job.future.set_exception(e)
+                return None
+            delay = self._backoff(job.attempts)
+            self._count('retry_count')
+            logger.warning(f"⚠️ {job.method} échec réseau ({e}), nouvel essai dans {delay:.1f}s")
+            return delay
+
+        error_code = result.get('error_code')
+        if result.get('ok') or error_code is None:
+            self._count('sent_count')
+            job.future.set_result(result)
+            return None
+
+        if error_code == 429 and job.attempts <= self.max_retries:
+            retry_after = float(result.get('parameters', {}).get('retry_after', 1))
+            self._blocked_until[job.chat_id] = time.monotonic() + retry_after
+            self._count('rate_limited_count')
+            self._count('retry_count')
+            logger.warning(f"⏳ 429 sur {job.method} (chat {job.chat_id}) - attente {retry_after}s")
+            return retry_after
+
+        if error_code >= 500 and job.attempts <= self.max_retries:
+            delay = self._backoff(job.attempts)
+            self._count('retry_count')
+            logger.warning(f"⚠️ {job.method} erreur {error_code}, nouvel essai dans {delay:.1f}s")
+            return delay
+
+        # Client errors are final: hand the response back to the caller
+        self._count('failed_count')
+        job.future.set_result(result)
+        return None
+
+    def _worker_loop(self) -> None:
+        while True:
+            job = self._next_job()
+            try:
+                delay = self._execute(job)
+            except Exception as e:
+                delay = None
+                self._count('failed_count')
+                if not job.future.done():
+                    job.future.set_exception(e)
+                logger.error(f"❌ Erreur dispatcher sortant: {e}")
+            self._finish_attempt(job, delay)
+
+
+class EditCoalescer:
+    """
+    Coalesces editMessageText calls per (chat_id, message_id).
+
+    While an edit is in flight, later edits of the same message replace each
+    other and only the latest text is sent once the first one completes.
+    Edits whose text equals what was last sent are dropped, so Telegram's
+    "message is not modified" error is never triggered by our own calls.
+    submit() returns a Future resolving to True when the latest text is live.
+    """
+
+    def __init__(self, dispatcher: OutboundDispatcher, max_entries: int = EDIT_CACHE_SIZE):
+        self.dispatcher = dispatcher
+        self.max_entries = max_entries
+        # Re-entrant: a completed dispatcher Future runs its callback immediately
+        self._lock = threading.RLock()
+        self._last_sent: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+        self._in_flight: Dict[Tuple[int, int], Tuple[str, Future]] = {}
+        self._pending: Dict[Tuple[int, int], Tuple[str, Future]] = {}
+        self.submitted_count = 0
+        self.sent_count = 0
+        self.coalesced_count = 0
+        self.suppressed_count = 0
+
+    def remember(self, chat_id: int, message_id: int, text: str) -> None:
+        """Record the current text of a message (e.g. right after sending it)"""
+        with self._lock:
+            self._remember_locked((chat_id, message_id), text)
+
+    def submit(self, chat_id: int, message_id: int, text: str) -> Future:
+        """Request an edit; returns a Future resolving to True/False"""
+        key = (chat_id, message_id)
+        with self._lock:
+            self.submitted_count += 1
+
+            pending = self._pending.get(key)
+            if pending is not None:
+                # Replace the queued text, every waiter gets the latest result
+                self.coalesced_count += 1
+                self._pending[key] = (text, pending[1])
+                return pending[1]
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                if in_flight[0] == text:
+                    self.suppressed_count += 1
+                    return in_flight[1]
+                result_future: Future = Future()
+                self._pending[key] = (text, result_future)
+                return result_future
+
+            if self._last_sent.get(key) == text:
+                self.suppressed_count += 1
+                return self._done(True)
+
+            result_future = Future()
+            self._start_locked(key, text, result_future)
+            return result_future
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return coalescing counters"""
+        return {
+            'submitted': self.submitted_count,
+            'sent': self.sent_count,
+            'coalesced': self.coalesced_count,
+            'suppressed': self.suppressed_count,
+            'in_flight': len(self._in_flight)
+        }
+
+    @staticmethod
+    def _done(value: bool) -> Future:
+        future: Future = Future()
+        future.set_result(value)
+        return future
+
+    def _remember_locked(self, key: Tuple[int, int], text: str) -> None:
+        self._last_sent[key] = text
+        self._last_sent.move_to_end(key)
+        while len(self._last_sent) > self.max_entries:
+            self._last_sent.popitem(last=False)
+
+    def _start_locked(self, key: Tuple[int, int], text: str, result_future: Future) -> None:
+        chat_id, message_id = key
+        data = {
+            'chat_id': chat_id,
+            'message_id': message_id,
+            'text': text,
+            'parse_mode': 'HTML'
+        }
+        self._in_flight[key] = (text, result_future)
+        self.sent_count += 1
+        api_future = self.dispatcher.submit('editMessageText', data, chat_id=chat_id)
+        api_future.add_done_callback(lambda future: self._on_done(key, text, result_future, future))
+
+    def _on_done(self, key: Tuple[int, int], text: str, result_future: Future, api_future: Future) -> None:
+        try:
+            result = api_future.result()
+            # "message is not modified" means the text is already live
+            success = bool(result.get('ok')) or 'message is not modified' in result.get('description', '')
+            if not success:
+                logger.error(f"Failed to edit message: {result}")
+        except Exception as e:
+            logger.error(f"Error editing message: {e}")
+            success = False
+
+        with self._lock:
+            if success:
+                self._remember_locked(key, text)
+            self._in_flight.pop(key, None)
+            pending = self._pending.pop(key, None)
+            if pending is not None:
+                pending_text, pending_future = pending
+                if self._last_sent.get(key) == pending_text:
+                    self.suppressed_count += 1
+                    pending_future.set_result(True)
+                else:
+                    self._start_locked(key, pending_text, pending_future)
+
+        result_future.set_result(success)
+
+
+# Shared dispatchers, one per bot token
+_dispatchers: Dict[str, OutboundDispatcher] = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_dispatcher(token: str) -> OutboundDispatcher:
+    """Return the shared dispatcher for a bot token, creating it on first use"""
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(token)
+        if dispatcher is None:
+            dispatcher = OutboundDispatcher(get_transport(token))
+            _dispatchers[token] = dispatcher
+        return dispatcher
@@ -0,0 +1,86 @@
+"""
+Prediction storage indexed by target game, with a bounded archive of resolved predictions
+"""
+
+import os
+import logging
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, Any, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Number of resolved predictions kept for reference (overridable through environment variables)
+PREDICTION_ARCHIVE_SIZE = int(os.getenv('PREDICTION_ARCHIVE_SIZE', '500'))
+
+
+class PredictionStore(MutableMapping):
+    """
+    Dict-like store of predictions keyed by target game number.
+
+    Pending predictions live in `pending`; once a prediction is resolved it is
+    moved to a bounded `archive` (oldest entries evicted first). Lookups by
+    game number work across both, so existing dict-style callers keep working,
+    while verification only ever looks at the handful of pending entries in
+    its window.
+    """
+
+    def __init__(self, archive_size: int = PREDICTION_ARCHIVE_SIZE):
+        self.archive_size = max(0, archive_size)
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.archive: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+
+    def __getitem__(self, game_number: int) -> Dict[str, Any]:
+        if game_number in self.pending:
+            return self.pending[game_number]
+        return self.archive[game_number]
+
+    def __setitem__(self, game_number: int, prediction: Dict[str, Any]) -> None:
+        if prediction.get('status', 'pending') == 'pending':
+            self.archive.pop(game_number, None)
+            self.pending[game_number] = prediction
+        else:
+            self.pending.pop(game_number, None)
+            self._archive(game_number, prediction)
+
+    def __delitem__(self, game_number: int) -> None:
+        if game_number in self.pending:
+            del self.pending[game_number]
+        else:
+            del self.archive[game_number]
+
+    def __contains__(self, game_number: object) -> bool:
+        return game_number in self.pending or game_number in self.archive
+
+    def __iter__(self) -> Iterator[int]:
+        yield from list(self.pending)
+        yield from list(self.archive)
+
+    def __len__(self) -> int:
+        return len(self.pending) + len(self.archive)
+
+    def clear(self) -> None:
+        self.pending.clear()
+        self.archive.clear()
+
+    def pending_in_window(self, game_number: int, depth: int = 3) -> List[Tuple[int, Dict[str, Any]]]:
+        """Pending predictions targeting games [game_number - depth, game_number], oldest first"""
+        window = []
+        for predicted_game in range(game_number - depth, game_number + 1):
+            prediction = self.pending.get(predicted_game)
+            if prediction is not None:
+                window.append((predicted_game, prediction))
+        return window
+
+    def resolve(self, game_number: int) -> None:
+        """Move a prediction whose status is final from pending to the archive"""
+        prediction = self.pending.pop(game_number, None)
+        if prediction is not None:
+            self._archive(game_number, prediction)
+
+    def _archive(self, game_number: int, prediction: Dict[str, Any]) -> None:
+        self.archive[game_number] = prediction
+        self.archive.move_to_end(game_number)
+        while len(self.archive) > self.archive_size:
+            evicted_game, _ = self.archive.popitem(last=False)
+            logger.debug(f"🗄️ Prédiction archivée {evicted_game} évincée")
@@ -0,0 +1,154 @@
+"""
+Registry of per-source-channel CardPredictor shards
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+from card_predictor import CardPredictor, TARGET_CHANNEL_ID
+from strategies import StrategyEngine, parse_strategies, SHADOW_STRATEGIES
+
+logger = logging.getLogger(__name__)
+
+# Source channels followed by the bot, comma-separated (overridable through environment variables)
+SOURCE_CHANNEL_IDS = [
+    int(chat_id) for chat_id in os.getenv('SOURCE_CHANNEL_IDS', str(TARGET_CHANNEL_ID)).split(',')
+    if chat_id.strip()
+]
+
+
+class PredictorRegistry:
+    """
+    One CardPredictor shard per source channel.
+
+    Each shard owns its cooldown, pending predictions, dedup window, redirect
+    targets, state journal and strategy engine (STRATEGIES and
+    SHADOW_STRATEGIES). Updates are routed by sender_chat.id, and the update
+    queue pins each chat to a single worker, so shards never contend with
+    each other. A shard is still reached from other threads (outbound send
+    callbacks storing message ids, admin commands looping over every shard,
+    metrics and profiler readers): each one has its own lock (`shard.lock`),
+    taken by its state-changing methods and by the readers below.
+
+    The shard for TARGET_CHANNEL_ID keeps the historical `card_predictor`
+    state name, so its journaled state survives the move to shards. Shards
+    are created on first use, not at import: a shard opens its state journal
+    and starts the journal and TTL-sweeper threads, which offline tools
+    importing this module must not pay for.
+    """
+
+    def __init__(self, source_ids: Optional[List[int]] = None):
+        self._shards: Dict[int, CardPredictor] = {}
+        self._engines: Dict[int, StrategyEngine] = {}
+        self._lock = threading.Lock()
+        self._source_ids = list(source_ids if source_ids is not None else SOURCE_CHANNEL_IDS)
+        self._loaded = False
+
+    def _load(self) -> None:
+        """Create the shards of the configured source channels on first use"""
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                for source_id in self._source_ids:
+                    self._add(source_id)
+                self._loaded = True
+
+    def add(self, source_id: int) -> CardPredictor:
+        """Create (or return) the shard following `source_id`"""
+        self._load()
+        with self._lock:
+            return self._add(source_id)
+
+    def _add(self, source_id: int) -> CardPredictor:
+        """add() body, called with self._lock held"""
+        shard = self._shards.get(source_id)
+        if shard is None:
+            state_name = 'card_predictor' if source_id == TARGET_CHANNEL_ID else f"card_predictor_{abs(source_id)}"
+            shard = CardPredictor(state_name=state_name)
+            # Copy-on-write so readers never need the lock
+            engines = dict(self._engines)
+            engines[source_id] = StrategyEngine(
+                parse_strategies() + parse_strategies(SHADOW_STRATEGIES, shadow=True)
+            )
+            self._engines = engines
+            shards = dict(self._shards)
+            shards[source_id] = shard
+            self._shards = shards
+            logger.info(f"🧩 Shard de prédiction actif pour le canal source {source_id}")
+        return shard
+
+    def get(self, source_id: int) -> Optional[CardPredictor]:
+        """Shard following `source_id`, or None if the channel is not followed"""
+        self._load()
+        return self._shards.get(source_id)
+
+    def get_engine(self, source_id: int) -> Optional[StrategyEngine]:
+        """Strategy engine of the shard following `source_id`"""
+        self._load()
+        return self._engines.get(source_id)
+
+    @property
+    def primary(self) -> Optional[CardPredictor]:
+        """Shard of the historical source channel (or the first one configured)"""
+        self._load()
+        return self._shards.get(TARGET_CHANNEL_ID) or next(iter(self._shards.values()), None)
+
+    def __iter__(self) -> Iterator[CardPredictor]:
+        self._load()
+        return iter(list(self._shards.values()))
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._shards)
+
+    def items(self) -> List[Tuple[int, CardPredictor]]:
+        self._load()
+        return list(self._shards.items())
+
+    def close(self) -> None:
+        """Flush every shard's state journal (shards never used are not created)"""
+        for shard in list(self._shards.values()):
+            shard.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-shard counters keyed by source channel id"""
+        stats = {}
+        for source_id, shard in self.items():
+            with shard.lock:
+                stats[str(source_id)] = {
+                    'pending_predictions': len(shard.predictions.pending),
+                    'dedup': shard.processed_messages.get_stats(),
+                    'awaiting_finalization': shard.awaiting_finalization(),
+                    'state_journal': shard.journal.get_stats() if shard.journal else None
+                }
+            stats[str(source_id)]['strategies'] = self._engines[source_id].get_stats()
+        return stats
+
+    def total(self, size: Callable[[CardPredictor], int]) -> int:
+        """Sum of `size(shard)` over the shards, each read under its lock (profiler structures)"""
+        total = 0
+        for shard in self:
+            with shard.lock:
+                total += size(shard)
+        return total
+
+    def pending_by_source(self) -> Dict[Tuple[str], int]:
+        """Pending predictions per shard and per strategy (pending_predictions gauge)"""
+        pending = {}
+        for source_id, shard in self.items():
+            with shard.lock:
+                pending[(shard.metrics_source,)] = len(shard.predictions.pending)
+            for key, count in self._engines[source_id].pending_by_strategy().items():
+                pending[key] = pending.get(key, 0) + count
+        return pending
+
+    def dedup_hits_by_source(self) -> Dict[Tuple[str], int]:
+        """Duplicate messages skipped per shard (dedup_hits_total counter)"""
+        return {(shard.metrics_source,): shard.processed_messages.hits for shard in self}
+
+
+# Global instance
+predictor_registry = PredictorRegistry()
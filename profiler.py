@@ -0,0 +1,267 @@
+"""
+On-demand sampling profiler and memory growth snapshots for the running bots
+
+CPU: a background thread samples the stacks of every other thread
+(sys._current_frames) every PROFILE_INTERVAL_MS for N seconds. The result is
+kept as folded stacks ("thread;module:function;... count", the input format
+of flamegraph.pl / speedscope / inferno) and a pstats-like table of self and
+cumulative sample counts per function. Nothing is installed in the profiled
+threads, so the overhead is that of the sampling thread alone, and only
+while a profile is running.
+
+Memory: tracemalloc traces allocations for N seconds; the snapshot diff shows
+the source lines that allocated the most in that window, and the registered
+structures (predictions, dedup windows, recent games...) are measured before
+and after to show which ones are growing.
+
+One profile runs at a time; dumps are written to PROFILE_DIR.
+"""
+
+import os
+import sys
+import math
+import time
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DEFAULT_SECONDS = float(os.getenv('PROFILE_DEFAULT_SECONDS', '10'))
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '120'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+MODES = ('cpu', 'memory')
+
+
+class ProfilerBusy(RuntimeError):
+    """A profile is already running"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class Profiler:
+    """Runs one CPU or memory profile at a time and writes its dump"""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: float = PROFILE_MAX_SECONDS,
+                 directory: str = PROFILE_DIR):
+        self.interval = max(0.001, interval_ms / 1000)
+        self.max_seconds = max_seconds
+        self.directory = directory
+        self.structures: Dict[str, Callable[[], int]] = {}
+        self.running: Optional[str] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def register_structure(self, name: str, size: Callable[[], int]) -> None:
+        """Measure `size()` (e.g. a len) before and after each memory profile"""
+        self.structures[name] = size
+
+    def clamp_seconds(self, seconds: Optional[float]) -> float:
+        if seconds is None or not math.isfinite(seconds) or seconds <= 0:
+            seconds = PROFILE_DEFAULT_SECONDS
+        return min(float(seconds), self.max_seconds)
+
+    def run(self, mode: str = 'cpu', seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Profile for `seconds` (blocking); raises ProfilerBusy when a profile is already running"""
+        if mode not in MODES:
+            raise ValueError(f"mode inconnu: {mode} (cpu ou memory)")
+        seconds = self.clamp_seconds(seconds)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy(f"profil {self.running} déjà en cours")
+        try:
+            self.running = mode
+            logger.info(f"🔬 Profil {mode} démarré pour {seconds:.0f}s")
+            result = self._profile_cpu(seconds) if mode == 'cpu' else self._profile_memory(seconds)
+            result['path'] = self._save(result)
+            self.last_result = result
+            logger.info(f"🔬 Profil {mode} terminé: {result['path']}")
+            return result
+        finally:
+            self.running = None
+            self._lock.release()
+
+    def _profile_cpu(self, seconds: float) -> Dict[str, Any]:
+        own_ident = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, str(ident)))
+                stacks[';'.join(reversed(labels))] += 1
+            samples += 1
+            time.sleep(self.interval)
+
+        self_counts: Counter = Counter()
+        cumulative_counts: Counter = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')[1:]  # without the thread name
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for label in set(frames):
+                cumulative_counts[label] += count
+        total = sum(stacks.values())
+        top = [{
+            'function': label,
+            'self': self_counts[label],
+            'cumulative': cumulative,
+            'self_pct': round(100 * self_counts[label] / total, 1) if total else 0.0,
+            'cumulative_pct': round(100 * cumulative / total, 1) if total else 0.0
+        } for label, cumulative in cumulative_counts.most_common()]
+        top.sort(key=lambda entry: (entry['self'], entry['cumulative']), reverse=True)
+
+        return {
+            'mode': 'cpu',
+            'seconds': round(time.perf_counter() - started, 2),
+            'interval_ms': self.interval * 1000,
+            'samples': samples,
+            'stack_samples': total,
+            'folded': '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common()),
+            'top': top
+        }
+
+    def _measure_structures(self) -> Dict[str, Optional[int]]:
+        sizes = {}
+        for name, size in self.structures.items():
+            try:
+                sizes[name] = size()
+            except Exception as e:
+                logger.warning(f"⚠️ Taille de {name} indisponible: {e}")
+                sizes[name] = None
+        return sizes
+
+    def _profile_memory(self, seconds: float, limit: int = 25) -> Dict[str, Any]:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        try:
+            before_sizes = self._measure_structures()
+            before = tracemalloc.take_snapshot()
+            started = time.perf_counter()
+            time.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            after_sizes = self._measure_structures()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+        top = [{
+            'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'size_diff_kb': round(stat.size_diff / 1024, 1),
+            'count_diff': stat.count_diff,
+            'size_kb': round(stat.size / 1024, 1)
+        } for stat in diff[:limit]]
+        structures = {name: {
+            'before': before_sizes[name],
+            'after': after_sizes[name],
+            'growth': after_sizes[name] - before_sizes[name]
+            if before_sizes[name] is not None and after_sizes[name] is not None else None
+        } for name in self.structures}
+
+        return {
+            'mode': 'memory',
+            'seconds': round(time.perf_counter() - started, 2),
+            'traced_current_kb': round(current / 1024, 1),
+            'traced_peak_kb': round(peak / 1024, 1),
+            'structures': structures,
+            'top': top
+        }
+
+    def _save(self, result: Dict[str, Any]) -> Optional[str]:
+        """Write the dump (folded stacks for cpu, text report for memory); returns its path"""
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        extension = 'folded' if result['mode'] == 'cpu' else 'txt'
+        path = os.path.join(self.directory, f"profile-{result['mode']}-{stamp}.{extension}")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(result['folded'] if result['mode'] == 'cpu' else format_memory_report(result))
+                f.write('\n')
+            return path
+        except OSError as e:
+            logger.error(f"❌ Écriture du profil impossible ({path}): {e}")
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'interval_ms': self.interval * 1000,
+            'max_seconds': self.max_seconds,
+            'structures': list(self.structures),
+            'last_path': self.last_result['path'] if self.last_result else None
+        }
+
+
+def format_cpu_table(result: Dict[str, Any], limit: int = 40) -> str:
+    """pstats-like table of a CPU profile: samples where the function runs (self) or is on the stack (cum)"""
+    lines = [f"{result['stack_samples']} échantillons de pile en {result['seconds']}s "
+             f"(intervalle {result['interval_ms']:.0f} ms)",
+             f"{'self':>8} {'self%':>6} {'cum':>8} {'cum%':>6}  fonction"]
+    for entry in result['top'][:limit]:
+        lines.append(f"{entry['self']:>8} {entry['self_pct']:>6.1f} {entry['cumulative']:>8} "
+                     f"{entry['cumulative_pct']:>6.1f}  {entry['function']}")
+    return '\n'.join(lines)
+
+
+def format_memory_report(result: Dict[str, Any], limit: int = 25) -> str:
+    """Text report of a memory profile: structure growth, then top allocating lines"""
+    lines = [f"Mémoire tracée: {result['traced_current_kb']} Ko (pic {result['traced_peak_kb']} Ko) "
+             f"sur {result['seconds']}s", "", "Structures (avant -> après):"]
+    for name, sizes in result['structures'].items():
+        growth = f"{sizes['growth']:+d}" if sizes['growth'] is not None else '?'
+        lines.append(f"  {name}: {sizes['before']} -> {sizes['after']} ({growth})")
+    lines.extend(["", "Allocations par ligne (écart Ko, écart blocs, total Ko):"])
+    for entry in result['top'][:limit]:
+        lines.append(f"  {entry['size_diff_kb']:+10.1f} {entry['count_diff']:+8d} {entry['size_kb']:>10.1f}  {entry['location']}")
+    return '\n'.join(lines)
+
+
+def format_summary(result: Dict[str, Any], limit: int = 15) -> str:
+    """Short report for the /profile commands (the full dump is sent as a file)"""
+    if result['mode'] == 'cpu':
+        return f"🔬 PROFIL CPU\n{format_cpu_table(result, limit)}"
+    return f"🧠 PROFIL MÉMOIRE\n{format_memory_report(result, limit)}"
+
+
+def parse_profile_args(text: str) -> Dict[str, Any]:
+    """Parse '/profile [cpu|mem] [seconds]' arguments, in any order"""
+    mode, seconds = 'cpu', None
+    for arg in text.split()[1:]:
+        if arg.lower() in ('mem', 'memory', 'memoire', 'mémoire'):
+            mode = 'memory'
+        elif arg.lower() == 'cpu':
+            mode = 'cpu'
+        else:
+            try:
+                seconds = float(arg)
+            except ValueError:
+                raise ValueError(f"argument invalide: {arg}")
+            if not math.isfinite(seconds):
+                raise ValueError(f"durée invalide: {arg}")
+    return {'mode': mode, 'seconds': seconds}
+
+
+# Global instance
+profiler = Profiler()
@@ -0,0 +1,117 @@
+"""
+Time-warp replay of captured updates against the Flask app and a fake Telegram API
+
+Starts FakeTelegramAPI, points the bot at it (TELEGRAM_API_BASE), then POSTs
+every captured update to main.app's /webhook at the recorded pace divided by
+`speed` (0 = as fast as possible). Reports webhook latency percentiles,
+outbound API calls and dropped updates.
+
+Usage:
+    python replay.py capture_dir_or_file [--speed 1|10|0] [--latency 0.05] [--rate-limit 0.01]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+
+from capture import read_capture
+from fake_telegram import FakeTelegramAPI
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_replay(updates: List[Tuple[float, bytes]], speed: float = 0, latency: float = 0.0,
+               jitter: float = 0.0, rate_limit_ratio: float = 0.0, drain_timeout: float = 60.0) -> Dict[str, Any]:
+    """
+    Replay (arrival timestamp, raw update) pairs through main.app.
+    main is imported here, after TELEGRAM_API_BASE has been pointed at the fake API.
+    """
+    with FakeTelegramAPI(latency=latency, jitter=jitter, rate_limit_ratio=rate_limit_ratio) as api:
+        os.environ['TELEGRAM_API_BASE'] = api.base_url
+        os.environ.setdefault('BOT_TOKEN', '0:replay')
+        import main
+
+        client = main.app.test_client()
+        latencies = []
+        statuses: Dict[int, int] = {}
+        first_ts = updates[0][0] if updates else 0.0
+        started = time.perf_counter()
+
+        for ts, raw in updates:
+            if speed > 0:
+                # Respect the recorded spacing, compressed by `speed`
+                delay = (ts - first_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            request_start = time.perf_counter()
+            response = client.post('/webhook', data=raw, content_type='application/json')
+            latencies.append((time.perf_counter() - request_start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        sent_elapsed = time.perf_counter() - started
+
+        # Wait for the update workers and the outbound dispatcher to finish
+        deadline = time.monotonic() + drain_timeout
+        while time.monotonic() < deadline and (main.update_queue.depth() or main.bot.dispatcher.depth()):
+            time.sleep(0.05)
+        total_elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        queue_stats = main.update_queue.get_stats()
+        return {
+            'updates': len(updates),
+            'speed': speed or 'max',
+            'send_elapsed_s': round(sent_elapsed, 3),
+            'total_elapsed_s': round(total_elapsed, 3),
+            'updates_per_s': round(len(updates) / sent_elapsed, 1) if sent_elapsed else None,
+            'webhook_ms': {
+                'p50': round(percentile(latencies, 0.50), 3) if latencies else None,
+                'p99': round(percentile(latencies, 0.99), 3) if latencies else None,
+                'max': round(latencies[-1], 3) if latencies else None
+            },
+            'http_status': statuses,
+            'dropped_updates': queue_stats.get('dropped', 0),
+            'update_queue': queue_stats,
+            'outbound': main.bot.dispatcher.get_stats(),
+            'fake_api': api.get_stats()
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rejeu accéléré d'une capture d'updates contre une fausse API Telegram")
+    parser.add_argument('capture', help="Fichier ou dossier de capture (CAPTURE_DIR)")
+    parser.add_argument('--speed', type=float, default=0, help="1 = temps réel, 10 = 10x, 0 = au plus vite")
+    parser.add_argument('--latency', type=float, default=0.0, help="Latence ajoutée par appel API (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Latence aléatoire additionnelle max (s)")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Part des appels répondus en 429")
+    parser.add_argument('--limit', type=int, default=0, help="Nombre maximum d'updates rejoués")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    updates = []
+    for item in read_capture(args.capture):
+        updates.append(item)
+        if args.limit and len(updates) >= args.limit:
+            break
+
+    report = run_replay(updates, speed=args.speed, latency=args.latency, jitter=args.jitter,
+                        rate_limit_ratio=args.rate_limit)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
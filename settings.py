@@ -0,0 +1,42 @@
+"""
+Settings of both bots, read from environment variables
+
+Config: the webhook bot (main.py). The module-level constants: the Telethon
+bot (config.py), which used to import them from a `config` module of its own
+name - a circular import that made config.py impossible to load.
+"""
+
+import os
+
+# Configuration constants (overridable through environment variables)
+API_ID = int(os.getenv('API_ID', '0'))
+API_HASH = os.getenv('API_HASH', '')
+BOT_TOKEN = os.getenv('BOT_TOKEN', '')
+ADMIN_ID = int(os.getenv('ADMIN_ID', '0'))
+SOURCE_CHANNEL_ID = int(os.getenv('SOURCE_CHANNEL_ID', '-1002682552255'))
+PREDICTION_CHANNEL_ID = int(os.getenv('PREDICTION_CHANNEL_ID', '-1002875505624'))
+PORT = int(os.getenv('PORT', '10000'))
+PREDICTION_OFFSET = int(os.getenv('PREDICTION_OFFSET', '2'))
+
+# Suits as found in a normalized group (see config.normalize_suits)
+ALL_SUITS = ['♠', '♥', '♦', '♣']
+
+# Displayed suit of each normalized suit; predictions carry the displayed form
+SUIT_DISPLAY = {'♠': '♠️', '♥': '❤️', '♦': '♦️', '♣': '♣️'}
+
+SUIT_NAMES = {'♠️': 'Pique', '❤️': 'Cœur', '♦️': 'Carreau', '♣️': 'Trèfle'}
+
+# Backup prediction after a loss: the other suit of the same color
+SUIT_MAPPING = {'♠️': '♣️', '♣️': '♠️', '❤️': '♦️', '♦️': '❤️'}
+
+
+class Config:
+    """Configuration of the webhook bot"""
+
+    def __init__(self):
+        self.BOT_TOKEN = os.getenv('BOT_TOKEN', '')
+        if not self.BOT_TOKEN:
+            raise ValueError("BOT_TOKEN manquant dans les variables d'environnement")
+        self.WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+        self.PORT = int(os.getenv('PORT') or 5000)
+        self.DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
@@ -0,0 +1,174 @@
+"""
+Append-only state journal with periodic snapshots for fast restarts
+"""
+
+import os
+import json
+import logging
+import threading
+from contextlib import nullcontext
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+STATE_DIR = os.getenv('STATE_DIR', '.state')
+STATE_JOURNAL_ENABLED = os.getenv('STATE_JOURNAL_ENABLED', 'true').lower() == 'true'
+JOURNAL_FLUSH_INTERVAL = float(os.getenv('JOURNAL_FLUSH_INTERVAL', '0.2'))  # seconds
+JOURNAL_SNAPSHOT_EVERY = int(os.getenv('JOURNAL_SNAPSHOT_EVERY', '500'))  # records
+JOURNAL_FSYNC = os.getenv('JOURNAL_FSYNC', 'false').lower() == 'true'
+
+
+class StateJournal:
+    """
+    Journal of state mutations stored as compact JSON lines.
+
+    append() only buffers the record; a writer thread commits everything
+    buffered since the last commit with a single write (group commit) every
+    `flush_interval` seconds. After `snapshot_every` records the owner asks
+    for a snapshot (request_snapshot); the writer thread captures the full
+    state and writes it, then truncates the journal. The owner passes the lock
+    it holds while mutating its state and appending (`state_lock`), so the
+    capture never sees a half-applied mutation. On restart, load() returns
+    the last snapshot plus the records written after it, which the owner
+    replays. Records must be idempotent "set" operations, since a record can
+    land in both the snapshot and the journal that follows it.
+    """
+
+    def __init__(self, name: str, directory: str = STATE_DIR,
+                 flush_interval: float = JOURNAL_FLUSH_INTERVAL,
+                 snapshot_every: int = JOURNAL_SNAPSHOT_EVERY,
+                 fsync: bool = JOURNAL_FSYNC, state_lock: Optional[Any] = None):
+        self.name = name
+        self.directory = directory
+        self.journal_path = os.path.join(directory, f"{name}.journal")
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot")
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.state_lock = state_lock
+
+        os.makedirs(directory, exist_ok=True)
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._snapshot_provider: Optional[Callable[[], Dict[str, Any]]] = None
+        self.records_since_snapshot = 0
+        self.committed_count = 0
+        self.commit_batches = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"journal-{name}", daemon=True)
+        self._thread.start()
+
+    def append(self, op: str, *args: Any) -> None:
+        """Buffer one mutation record; it is committed by the writer thread"""
+        line = json.dumps([op, *args], separators=(',', ':'), ensure_ascii=False, default=str)
+        with self._lock:
+            self._buffer.append(line)
+            self.records_since_snapshot += 1
+
+    def needs_snapshot(self) -> bool:
+        return self.records_since_snapshot >= self.snapshot_every and self._snapshot_provider is None
+
+    def request_snapshot(self, state_provider: Callable[[], Dict[str, Any]]) -> None:
+        """Have the writer thread take a snapshot with `state_provider` (returns immediately)"""
+        self._snapshot_provider = state_provider
+        self._wakeup.set()
+
+    def flush(self) -> None:
+        """Commit every buffered record now"""
+        with self._write_lock:
+            with self._lock:
+                lines = self._buffer
+                self._buffer = []
+            if not lines:
+                return
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self.committed_count += len(lines)
+            self.commit_batches += 1
+
+    def snapshot(self, state_provider: Callable[[], Dict[str, Any]]) -> None:
+        """Persist a full state snapshot and start a fresh journal"""
+        with self._write_lock:
+            # State lock first (the owner appends while holding it), then the append lock:
+            # every buffered record is already in `state`, every later record goes to the fresh journal
+            with self.state_lock or nullcontext(), self._lock:
+                state = state_provider()
+                self._buffer = []
+                self.records_since_snapshot = 0
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, separators=(',', ':'), ensure_ascii=False, default=str)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            open(self.journal_path, 'w').close()
+        logger.info(f"💾 Snapshot d'état écrit: {self.snapshot_path}")
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[List[Any]]]:
+        """Return (snapshot or None, journal records written after it)"""
+        snapshot = None
+        records = []
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Snapshot illisible ({self.snapshot_path}): {e}")
+
+        try:
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            # Torn write at the end of the journal (crash during commit)
+                            logger.warning(f"⚠️ Enregistrement de journal corrompu ignoré")
+        except Exception as e:
+            logger.warning(f"⚠️ Journal illisible ({self.journal_path}): {e}")
+
+        self.records_since_snapshot = len(records)
+        return snapshot, records
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(5)
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return journal counters"""
+        return {
+            'buffered': len(self._buffer),
+            'committed': self.committed_count,
+            'commit_batches': self.commit_batches,
+            'records_since_snapshot': self.records_since_snapshot
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Erreur écriture journal d'état: {e}")
+            provider = self._snapshot_provider
+            if provider is not None:
+                try:
+                    self.snapshot(provider)
+                except Exception as e:
+                    logger.error(f"❌ Erreur snapshot d'état: {e}")
+                finally:
+                    self._snapshot_provider = None
@@ -0,0 +1,220 @@
+"""
+Incremental win-rate and streak statistics of resolved predictions
+
+Every resolved prediction (✅0️⃣–✅3️⃣ or ❌) is recorded once as an outcome.
+Each rolling window (last STATS_WINDOWS outcomes, plus all of them) keeps
+running counters broken down by predicted suit, prediction offset,
+verification step and strategy: recording an outcome adds it to every window
+and subtracts the outcome falling out of the bounded ones, so recording and
+reading are O(1) in the number of outcomes, without rescanning history.
+Current and longest win / loss streaks are kept overall and per strategy.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Deque, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+STATS_WINDOWS = os.getenv('STATS_WINDOWS', '50,200')  # bounded windows, the "all" window is always kept
+
+
+class Outcome(NamedTuple):
+    strategy: str
+    suit: str
+    offset: Optional[int]  # target game - predicted_from
+    step: Optional[int]  # verification step of a win (0 for ✅0️⃣), None for a loss
+
+    @property
+    def won(self) -> bool:
+        return self.step is not None
+
+
+class _Tally:
+    """Resolved / won counts of one breakdown key"""
+
+    __slots__ = ('resolved', 'wins')
+
+    def __init__(self):
+        self.resolved = 0
+        self.wins = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'resolved': self.resolved,
+            'wins': self.wins,
+            'losses': self.resolved - self.wins,
+            'win_rate': round(self.wins / self.resolved, 3) if self.resolved else None
+        }
+
+
+class _Window:
+    """Running counters over the last `size` outcomes (all of them when size is None)"""
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = size
+        self.outcomes: Deque[Outcome] = deque()
+        self.total = _Tally()
+        self.by_suit: Dict[str, _Tally] = {}
+        self.by_offset: Dict[Optional[int], _Tally] = {}
+        self.by_strategy: Dict[str, _Tally] = {}
+        self.by_step: Dict[int, int] = {}
+
+    def add(self, outcome: Outcome) -> None:
+        self._apply(outcome, 1)
+        if self.size is not None:
+            self.outcomes.append(outcome)
+            if len(self.outcomes) > self.size:
+                self._apply(self.outcomes.popleft(), -1)
+
+    def _apply(self, outcome: Outcome, sign: int) -> None:
+        won = sign if outcome.won else 0
+        for tally in (self.total,
+                      self.by_suit.setdefault(outcome.suit, _Tally()),
+                      self.by_offset.setdefault(outcome.offset, _Tally()),
+                      self.by_strategy.setdefault(outcome.strategy, _Tally())):
+            tally.resolved += sign
+            tally.wins += won
+        if outcome.won:
+            self.by_step[outcome.step] = self.by_step.get(outcome.step, 0) + sign
+
+    def to_dict(self) -> Dict[str, Any]:
+        def breakdown(tallies: Dict[Any, _Tally]) -> Dict[str, Dict[str, Any]]:
+            return {str(key): tally.to_dict() for key, tally in sorted(tallies.items(), key=lambda item: str(item[0]))
+                    if tally.resolved}
+
+        return dict(self.total.to_dict(), **{
+            'by_suit': breakdown(self.by_suit),
+            'by_offset': breakdown(self.by_offset),
+            'by_strategy': breakdown(self.by_strategy),
+            'wins_by_step': {str(step): count for step, count in sorted(self.by_step.items()) if count}
+        })
+
+
+class _Streak:
+    """Current and longest win / loss streaks"""
+
+    __slots__ = ('current_won', 'current', 'longest_win', 'longest_loss')
+
+    def __init__(self):
+        self.current_won: Optional[bool] = None
+        self.current = 0
+        self.longest_win = 0
+        self.longest_loss = 0
+
+    def add(self, won: bool) -> None:
+        if won == self.current_won:
+            self.current += 1
+        else:
+            self.current_won = won
+            self.current = 1
+        if won:
+            self.longest_win = max(self.longest_win, self.current)
+        else:
+            self.longest_loss = max(self.longest_loss, self.current)
+
+    def to_dict(self) -> Dict[str, Any]:
+        kind = None if self.current_won is None else ('win' if self.current_won else 'loss')
+        return {
+            'current': self.current,
+            'current_kind': kind,
+            'longest_win': self.longest_win,
+            'longest_loss': self.longest_loss
+        }
+
+
+def parse_windows(value: str) -> List[int]:
+    """Parse bounded window sizes such as '50,200', skipping invalid entries"""
+    sizes = []
+    for item in value.split(','):
+        item = item.strip()
+        if item.isdigit() and int(item) > 0 and int(item) not in sizes:
+            sizes.append(int(item))
+    return sorted(sizes)
+
+
+class PredictionStats:
+    """Rolling windows and streaks of the resolved predictions of one process"""
+
+    def __init__(self, windows: Optional[List[int]] = None):
+        sizes = parse_windows(STATS_WINDOWS) if windows is None else sorted(set(windows))
+        self.windows: Dict[str, _Window] = {str(size): _Window(size) for size in sizes}
+        self.windows['all'] = _Window()
+        self.streak = _Streak()
+        self.streaks: Dict[str, _Streak] = {}
+        self._lock = threading.Lock()
+
+    def record(self, strategy: str, suit: str, offset: Optional[int], step: Optional[int]) -> None:
+        """Record a resolved prediction: `step` is the verification step of a win, None for a loss"""
+        outcome = Outcome(strategy, suit, offset, step)
+        with self._lock:
+            for window in self.windows.values():
+                window.add(outcome)
+            self.streak.add(outcome.won)
+            self.streaks.setdefault(strategy, _Streak()).add(outcome.won)
+
+    def record_prediction(self, strategy: str, target_game: int, prediction: Dict[str, Any]) -> None:
+        """Record a prediction resolved by verify_pending_window (CardPredictor / Strategy record layout)"""
+        won = prediction.get('status') == 'correct'
+        predicted_from = prediction.get('predicted_from')
+        self.record(strategy, prediction.get('predicted_costume', '?'),
+                    target_game - predicted_from if predicted_from is not None else prediction.get('offset'),
+                    prediction.get('verification_count', 0) if won else None)
+
+    def reset(self) -> None:
+        with self._lock:
+            sizes = [window.size for window in self.windows.values() if window.size is not None]
+            self.windows = {str(size): _Window(size) for size in sizes}
+            self.windows['all'] = _Window()
+            self.streak = _Streak()
+            self.streaks = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Every window with its breakdowns, and the streaks"""
+        with self._lock:
+            return {
+                'windows': {name: window.to_dict() for name, window in self.windows.items()},
+                'streak': self.streak.to_dict(),
+                'streaks_by_strategy': {name: streak.to_dict() for name, streak in sorted(self.streaks.items())}
+            }
+
+    def format_report(self) -> str:
+        """Text report for the /stats command"""
+        stats = self.get_stats()
+        overall = stats['windows']['all']
+        if not overall['resolved']:
+            return "📊 Aucune prédiction résolue pour le moment"
+
+        def rate(entry: Dict[str, Any]) -> str:
+            return f"{entry['wins']}/{entry['resolved']} ✅ ({entry['win_rate']:.0%})"
+
+        lines = ["📊 **STATISTIQUES DES PRÉDICTIONS**"]
+        for name, window in stats['windows'].items():
+            if not window['resolved']:
+                continue
+            label = "Tout l'historique" if name == 'all' else f"{name} dernières"
+            steps = " ".join(f"✅{step}️⃣{count}" for step, count in window['wins_by_step'].items())
+            lines.append(f"\n📈 **{label}**: {rate(window)} | {steps} ❌{window['losses']}")
+            lines.append("• Couleurs: " + " | ".join(f"{suit} {rate(entry)}" for suit, entry in window['by_suit'].items()))
+            lines.append("• Décalages: " + " | ".join(f"+{offset} {rate(entry)}" for offset, entry in window['by_offset'].items()))
+            if len(window['by_strategy']) > 1 or name == 'all':
+                lines.append("• Stratégies: " + " | ".join(f"{strategy} {rate(entry)}"
+                                                            for strategy, entry in window['by_strategy'].items()))
+
+        streak = stats['streak']
+        current = "✅" if streak['current_kind'] == 'win' else "❌"
+        lines.append(f"\n🔥 Série en cours: {streak['current']} {current} | "
+                     f"Record: {streak['longest_win']} ✅ / {streak['longest_loss']} ❌")
+        if len(stats['streaks_by_strategy']) > 1:
+            for strategy, entry in stats['streaks_by_strategy'].items():
+                current = "✅" if entry['current_kind'] == 'win' else "❌"
+                lines.append(f"• {strategy}: {entry['current']} {current} | "
+                             f"Record: {entry['longest_win']} ✅ / {entry['longest_loss']} ❌")
+        return "\n".join(lines)
+
+
+# Global instance
+prediction_stats = PredictionStats()
@@ -0,0 +1,258 @@
+"""
+Pluggable prediction strategies evaluated in one pass over the parsed source stream
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Callable, Deque, List, Optional, Sequence, Tuple
+
+from card_predictor import find_missing_color, is_missing_color_source, verify_pending_window
+from dedup import SlidingDedup
+from game_message import ParsedGameMessage, suit_index, SUITS
+from metrics import predictions_made, prediction_wins, prediction_losses
+from prediction_store import PredictionStore
+from stats import prediction_stats
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+# STRATEGIES: "name:rule[:key=value...]" separated by ';'
+# e.g. "premiere_carte:first_card:offset=2:cooldown=60:channel=-1001234567890"
+STRATEGIES = os.getenv('STRATEGIES', '')
+# SHADOW_STRATEGIES: same format; evaluated and verified on the live stream, never posted
+SHADOW_STRATEGIES = os.getenv('SHADOW_STRATEGIES', '')
+STRATEGY_HISTORY_SIZE = int(os.getenv('STRATEGY_HISTORY_SIZE', '20'))  # finalized games kept per engine
+FIRST_CARD_OFFSET = int(os.getenv('PREDICTION_OFFSET', '2'))
+
+# A rule looks at the parsed game and the recent finalized games (oldest first)
+# and returns (suit, offset) to predict game N + offset, or None
+Rule = Callable[[ParsedGameMessage, Sequence[ParsedGameMessage]], Optional[Tuple[str, int]]]
+
+
+def missing_color_rule(parsed: ParsedGameMessage, history: Sequence[ParsedGameMessage]) -> Optional[Tuple[str, int]]:
+    """Missing color of the first two 2-card groups on #R games (CardPredictor's own check)"""
+    if not is_missing_color_source(parsed):
+        return None
+    return find_missing_color(parsed)
+
+
+def first_card_rule(parsed: ParsedGameMessage, history: Sequence[ParsedGameMessage]) -> Optional[Tuple[str, int]]:
+    """Suit of the first card of the first group (rule of the Telethon bot in config.py)"""
+    suit = parsed.first_card_suit(0)
+    if suit is None:
+        return None
+    return suit, FIRST_CARD_OFFSET
+
+
+RULES: Dict[str, Rule] = {
+    'missing_color': missing_color_rule,
+    'first_card': first_card_rule,
+}
+
+
+def register_rule(name: str, rule: Rule) -> None:
+    """Make a rule available to STRATEGIES specs"""
+    RULES[name] = rule
+
+
+class Strategy:
+    """
+    One prediction rule with its own cooldown, offset, output channel and
+    pending predictions. Predictions use the same record layout and the same
+    ✅0️⃣–✅3️⃣/❌ verification as CardPredictor.
+
+    A shadow strategy is evaluated and verified exactly like a live one but
+    its predictions are never posted; only its counters are kept.
+    """
+
+    def __init__(self, name: str, rule: Rule, cooldown: float = 30, offset: Optional[int] = None,
+                 output_channel: Optional[int] = None, max_pending: int = 5,
+                 verification_depth: int = 3, shadow: bool = False,
+                 suit_offsets: Optional[Dict[str, int]] = None, clock: Callable[[], float] = time.time):
+        self.name = name
+        self.rule = rule
+        self.cooldown = cooldown
+        self.offset = offset  # Overrides the offset returned by the rule
+        self.suit_offsets = suit_offsets or {}  # Per predicted suit offset overrides
+        self.shadow = shadow
+        self.output_channel = output_channel  # None: redirect channel of the source
+        self.max_pending = max_pending
+        self.verification_depth = verification_depth
+        self.clock = clock
+        self.predictions = PredictionStore()
+        self.sent_predictions: Dict[int, Dict[str, int]] = {}
+        self.last_prediction_time = 0.0
+        self.emitted = 0
+        self.wins = 0
+        self.losses = 0
+        self.wins_by_offset = [0] * (verification_depth + 1)  # ✅0️⃣, ✅1️⃣, ...
+
+    def evaluate(self, parsed: ParsedGameMessage,
+                 history: Sequence[ParsedGameMessage]) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Run the rule on a finalized game; returns (target_game, prediction) when it fires"""
+        result = self.rule(parsed, history)
+        if not result:
+            return None
+        suit, offset = result
+        if self.offset is not None:
+            offset = self.offset
+        offset = self.suit_offsets.get(suit, offset)
+
+        now = self.clock()
+        if self.last_prediction_time and now - self.last_prediction_time < self.cooldown:
+            return None
+
+        target_game = parsed.game_number + offset
+        if target_game in self.predictions.pending or len(self.predictions.pending) >= self.max_pending:
+            return None
+
+        prediction = {
+            'predicted_costume': suit,
+            'status': 'pending',
+            'predicted_from': parsed.game_number,
+            'verification_count': 0,
+            'message_text': f"🔵{target_game}🔵:{suit} statut :⏳",
+            'offset': offset,
+            'strategy': self.name
+        }
+        self.predictions[target_game] = prediction
+        self.last_prediction_time = now
+        self.emitted += 1
+        predictions_made.labels(self.name).inc()
+        logger.info(f"🧠 STRATÉGIE {self.name} - Jeu {parsed.game_number}: prédiction {suit} pour {target_game} (+{offset})")
+        return target_game, prediction
+
+    def verify(self, parsed: ParsedGameMessage) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Verify pending predictions against a finalized game"""
+        resolved = verify_pending_window(self.predictions, parsed, self.verification_depth)
+        if resolved is not None:
+            if resolved[1]['status'] == 'correct':
+                self.wins += 1
+                self.wins_by_offset[resolved[1]['verification_count']] += 1
+                prediction_wins.labels(self.name, str(resolved[1]['verification_count'])).inc()
+            else:
+                self.losses += 1
+                prediction_losses.labels(self.name).inc()
+            prediction_stats.record_prediction(self.name, resolved[0], resolved[1])
+        return resolved
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return strategy counters"""
+        resolved = self.wins + self.losses
+        return {
+            'shadow': self.shadow,
+            'emitted': self.emitted,
+            'pending': len(self.predictions.pending),
+            'wins': self.wins,
+            'losses': self.losses,
+            'wins_by_offset': list(self.wins_by_offset),
+            'win_rate': round(self.wins / resolved, 3) if resolved else None
+        }
+
+
+class StrategyEngine:
+    """
+    Feeds every finalized game of one source channel, parsed once, to all
+    enabled strategies in a single pass. Each game is handled once even if
+    its final version arrives both as a new message and as an edit.
+    """
+
+    def __init__(self, strategies: Optional[List[Strategy]] = None, history_size: int = STRATEGY_HISTORY_SIZE):
+        self.strategies: List[Strategy] = list(strategies or [])
+        self.history: Deque[ParsedGameMessage] = deque(maxlen=history_size)
+        self._handled = SlidingDedup(max_entries=history_size * 4)
+        self._lock = threading.Lock()
+
+    def add(self, strategy: Strategy) -> None:
+        with self._lock:
+            self.strategies.append(strategy)
+
+    def __len__(self) -> int:
+        return len(self.strategies)
+
+    def handle(self, parsed: ParsedGameMessage) -> Tuple[List[Tuple[Strategy, int, Dict[str, Any]]],
+                                                          List[Tuple[Strategy, int, Dict[str, Any]]]]:
+        """
+        Verify then evaluate every strategy on a finalized game.
+        Returns (new predictions, resolved predictions) as (strategy, target_game, prediction).
+        """
+        created = []
+        resolved = []
+        if not self.strategies or parsed.game_number is None or not parsed.has_completion:
+            return created, resolved
+
+        with self._lock:
+            if self._handled.seen(None, None, parsed.game_number):
+                return created, resolved
+
+            history = tuple(self.history)
+            for strategy in self.strategies:
+                try:
+                    result = strategy.verify(parsed)
+                    if result is not None:
+                        resolved.append((strategy, result[0], result[1]))
+                    result = strategy.evaluate(parsed, history)
+                    if result is not None:
+                        created.append((strategy, result[0], result[1]))
+                except Exception as e:
+                    logger.error(f"❌ Erreur stratégie {strategy.name}: {e}")
+            self.history.append(parsed)
+
+        return created, resolved
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-strategy counters"""
+        with self._lock:
+            return {strategy.name: strategy.get_stats() for strategy in self.strategies}
+
+    def pending_by_strategy(self) -> Dict[Tuple[str], int]:
+        """Pending predictions per strategy (pending_predictions gauge)"""
+        with self._lock:
+            return {(strategy.name,): len(strategy.predictions.pending) for strategy in self.strategies}
+
+
+def parse_suit_offsets(value: str) -> Dict[str, int]:
+    """Parse per-suit offsets such as '♣4/♦4/♠3/♥3'"""
+    offsets = {}
+    for item in value.split('/'):
+        item = item.strip()
+        index = suit_index(item)
+        if index is None:
+            raise ValueError(f"couleur inconnue: {item}")
+        offsets[SUITS[index]] = int(item.lstrip('♠♥❤♦♣\ufe0f'))
+    return offsets
+
+
+def parse_strategies(spec: str = STRATEGIES, shadow: bool = False) -> List[Strategy]:
+    """
+    Build strategies from a STRATEGIES / SHADOW_STRATEGIES spec, skipping invalid entries.
+    Options: cooldown, offset, offsets (per suit, e.g. ♣4/♦4/♠3/♥3), channel, max_pending, depth.
+    """
+    strategies = []
+    for entry in spec.split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split(':')
+        if len(parts) < 2 or parts[1] not in RULES:
+            logger.warning(f"⚠️ Stratégie ignorée (règle inconnue): {entry}")
+            continue
+        options = dict(part.split('=', 1) for part in parts[2:] if '=' in part)
+        try:
+            strategies.append(Strategy(
+                name=parts[0],
+                rule=RULES[parts[1]],
+                cooldown=float(options.get('cooldown', 30)),
+                offset=int(options['offset']) if 'offset' in options else None,
+                output_channel=int(options['channel']) if 'channel' in options else None,
+                max_pending=int(options.get('max_pending', 5)),
+                verification_depth=int(options.get('depth', 3)),
+                shadow=shadow,
+                suit_offsets=parse_suit_offsets(options['offsets']) if 'offsets' in options else None
+            ))
+        except ValueError as e:
+            logger.warning(f"⚠️ Stratégie ignorée ({entry}): {e}")
+    return strategies
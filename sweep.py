@@ -0,0 +1,257 @@
+"""
+Parallel parameter sweep over recorded source-channel history
+
+The history is parsed once in the parent process and encoded into a flat
+binary file of fixed-size records (plus a text blob). Every worker of the
+process pool memory-maps that file read-only and rebuilds the parsed
+messages from the encoded fields, so no worker tokenizes a single message.
+Each sweep point is then a plain backtest replay (see backtest.py).
+
+Swept parameters (--engine predictor, the default):
+    cooldown       CardPredictor.prediction_cooldown (and the first_card strategy cooldown)
+    depth          verification depth N..N+depth (CardPredictor and first_card)
+    offset         offset of the first_card strategy
+    max_pending    max_pending of the first_card strategy
+    position       CardPredictor.position_preference
+
+The first_card strategy only borrows config.py's rule (suit of the first card):
+it is verified on presence of the suit, without backup predictions, so its
+columns are not config.py's results. To sweep config.py itself, use
+--engine config: config.py is replayed (placeholder credentials, nothing is
+sent) with depth (VERIFICATION_DEPTH), min_cards (VERIFICATION_MIN_CARDS,
+1 = presence), offset (PREDICTION_OFFSET) and max_pending
+(MAX_PENDING_PREDICTIONS), backups after a loss included.
+
+Usage:
+    python sweep.py history.jsonl --cooldown 0,30,60 --depth 2,3 --offset 1,2,3 --max-pending 3,5 [--workers 8] [--csv out.csv]
+    python sweep.py history.jsonl --engine config --depth 2,3,4 --min-cards 1,2,3 --max-pending 5,20
+"""
+
+import os
+import sys
+import csv
+import mmap
+import time
+import struct
+import logging
+import argparse
+import tempfile
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from backtest import HistoryRecord, load_history, replay_card_predictor, replay_config_bot, WIN_STATUSES
+from game_message import ParsedGameMessage, parse_game_message, SUITS, SUIT_INDEX
+from strategies import Strategy, first_card_rule
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'JKRH'
+HEADER = struct.Struct('<4sIQ')  # magic, max groups, record count
+MAX_GROUPS = 3
+# ts, kind, chat_id, message_id, game_number (-1: none), flags, group count, winning group (-1: none),
+# MAX_GROUPS x (♠️, ♥️, ♦️, ♣️ counts, first suit index or -1), text offset, text length
+RECORD = struct.Struct('<dBqqiBBb' + '4Bb' * MAX_GROUPS + 'QI')
+
+FLAG_R, FLAG_X, FLAG_PENDING, FLAG_COMPLETION, FLAG_FINAL = 1, 2, 4, 8, 16
+KINDS = ('new', 'edit')
+
+
+def encode_history(records: List[HistoryRecord], path: str) -> None:
+    """Parse every record once and write the encoded history file"""
+    texts = []
+    text_offset = 0
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, MAX_GROUPS, len(records)))
+        for record in records:
+            parsed = parse_game_message(record.text)
+            flags = ((FLAG_R if parsed.has_r_tag else 0) | (FLAG_X if parsed.has_x_tag else 0)
+                     | (FLAG_PENDING if parsed.has_pending else 0)
+                     | (FLAG_COMPLETION if parsed.has_completion else 0) | (FLAG_FINAL if parsed.has_final else 0))
+            groups = []
+            for index in range(MAX_GROUPS):
+                if index < len(parsed.group_suit_counts):
+                    first = parsed.first_card_suit(index)
+                    groups.extend(parsed.group_suit_counts[index])
+                    groups.append(SUIT_INDEX[first[:1]] if first else -1)
+                else:
+                    groups.extend((0, 0, 0, 0, -1))
+            text = record.text.encode('utf-8')
+            f.write(RECORD.pack(
+                record.ts, KINDS.index(record.kind), record.chat_id, record.message_id,
+                parsed.game_number if parsed.game_number is not None else -1, flags,
+                min(len(parsed.group_suit_counts), MAX_GROUPS),
+                parsed.winning_group if parsed.winning_group is not None and parsed.winning_group < MAX_GROUPS else -1,
+                *groups, text_offset, len(text)
+            ))
+            texts.append(text)
+            text_offset += len(text)
+        for text in texts:
+            f.write(text)
+
+
+def decode_history(buffer) -> Tuple[List[HistoryRecord], List[ParsedGameMessage]]:
+    """Rebuild records and parsed messages from an encoded history buffer (e.g. an mmap)"""
+    magic, max_groups, count = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or max_groups != MAX_GROUPS:
+        raise ValueError("Fichier d'historique encodé invalide")
+    blob_start = HEADER.size + count * RECORD.size
+
+    records = []
+    parsed_messages = []
+    for position in range(HEADER.size, blob_start, RECORD.size):
+        fields = RECORD.unpack_from(buffer, position)
+        ts, kind, chat_id, message_id, game_number, flags, group_count, winning_group = fields[:8]
+        text_offset, text_length = fields[-2:]
+        text = bytes(buffer[blob_start + text_offset:blob_start + text_offset + text_length]).decode('utf-8')
+
+        counts = []
+        first_suits = []
+        for index in range(group_count):
+            group = fields[8 + index * 5:8 + index * 5 + 5]
+            counts.append(tuple(group[:4]))
+            first_suits.append(SUITS[group[4]] if group[4] >= 0 else None)
+
+        records.append(HistoryRecord(ts, KINDS[kind], chat_id, message_id, text))
+        parsed_messages.append(ParsedGameMessage.from_record(
+            text, game_number if game_number >= 0 else None,
+            bool(flags & FLAG_R), bool(flags & FLAG_X), bool(flags & FLAG_PENDING),
+            bool(flags & FLAG_COMPLETION), bool(flags & FLAG_FINAL),
+            tuple(counts), tuple(first_suits), winning_group if winning_group >= 0 else None
+        ))
+    return records, parsed_messages
+
+
+# Worker-side history, decoded once per process from the shared mapping
+_history: Optional[Tuple[List[HistoryRecord], List[ParsedGameMessage]]] = None
+
+
+def _init_worker(path: str) -> None:
+    global _history
+    logging.disable(logging.WARNING)
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _history = decode_history(buffer)
+
+
+def run_point(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Replay the shared history with one parameter set, returns one result row"""
+    records, parsed_messages = _history
+    if params.get('engine') == 'config':
+        result = replay_config_bot(records, prediction_offset=params['offset'], max_pending=params['max_pending'],
+                                   verification_depth=params['depth'], min_cards=params['min_cards'])
+        return _result_row(params, result, ('config',))
+
+    first_card = Strategy(
+        'first_card', first_card_rule,
+        cooldown=params['cooldown'], offset=params['offset'], max_pending=params['max_pending'],
+        verification_depth=params['depth'], shadow=True
+    )
+    result = replay_card_predictor(
+        records, prediction_cooldown=params['cooldown'], position_preference=params['position'],
+        verification_depth=params['depth'], strategies=[first_card], parsed_messages=parsed_messages
+    )
+
+    return _result_row(params, result, ('primary', 'first_card'))
+
+
+def _result_row(params: Dict[str, Any], result: Any, sources: Tuple[str, ...]) -> Dict[str, Any]:
+    row = dict(params)
+    for source in sources:
+        distribution = result.distribution(source)
+        wins = sum(distribution[status] for status in WIN_STATUSES)
+        resolved = wins + distribution['❌']
+        row[f'{source}_predictions'] = sum(distribution.values())
+        row[f'{source}_wins'] = wins
+        row[f'{source}_losses'] = distribution['❌']
+        row[f'{source}_win_rate'] = round(wins / resolved, 4) if resolved else None
+    row['replay_s'] = round(result.elapsed, 3)
+    return row
+
+
+def sweep(history_path: str, grid: Dict[str, List[Any]], workers: Optional[int] = None,
+          encoded_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Run every point of the parameter grid over a process pool"""
+    records = load_history(history_path)
+    own_file = encoded_path is None
+    if own_file:
+        handle, encoded_path = tempfile.mkstemp(suffix='.hist')
+        os.close(handle)
+    try:
+        encode_history(records, encoded_path)
+        names = list(grid)
+        points = [dict(zip(names, values)) for values in product(*(grid[name] for name in names))]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(encoded_path,)) as pool:
+            return list(pool.map(run_point, points))
+    finally:
+        if own_file:
+            os.unlink(encoded_path)
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    """Aligned text table of sweep results"""
+    if not rows:
+        return ''
+    columns = list(rows[0])
+    cells = [[str(row[column]) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[index]) for line in cells)) for index, column in enumerate(columns)]
+    lines = ['  '.join(column.rjust(width) for column, width in zip(columns, widths))]
+    lines.extend('  '.join(cell.rjust(width) for cell, width in zip(line, widths)) for line in cells)
+    return '\n'.join(lines)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Balayage parallèle des paramètres de prédiction")
+    parser.add_argument('history', help="Fichier JSON lines de l'historique du canal source")
+    parser.add_argument('--cooldown', type=_int_list, default=[30])
+    parser.add_argument('--depth', type=_int_list, default=[3])
+    parser.add_argument('--offset', type=_int_list, default=[2])
+    parser.add_argument('--max-pending', type=_int_list, default=[5])
+    parser.add_argument('--position', type=_int_list, default=[1])
+    parser.add_argument('--engine', choices=['predictor', 'config'], default='predictor')
+    parser.add_argument('--min-cards', type=_int_list, default=[3], help="VERIFICATION_MIN_CARDS (moteur config)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sort', default=None, help="Colonne de tri (décroissant, défaut: taux de réussite)")
+    parser.add_argument('--csv', help="Écrire le tableau en CSV")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.engine == 'config':
+        grid = {
+            'engine': ['config'],
+            'depth': args.depth,
+            'min_cards': args.min_cards,
+            'offset': args.offset,
+            'max_pending': args.max_pending,
+        }
+    else:
+        grid = {
+            'cooldown': args.cooldown,
+            'depth': args.depth,
+            'offset': args.offset,
+            'max_pending': args.max_pending,
+            'position': args.position,
+        }
+    sort = args.sort or ('config_win_rate' if args.engine == 'config' else 'primary_win_rate')
+
+    started = time.perf_counter()
+    rows = sweep(args.history, grid, workers=args.workers)
+    elapsed = time.perf_counter() - started
+    rows.sort(key=lambda row: row.get(sort) or 0, reverse=True)
+
+    print(format_table(rows))
+    print(f"\n{len(rows)} point(s) en {elapsed:.1f}s")
+    if args.csv and rows:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Shared keep-alive HTTP transport for the Telegram Bot API
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import telegram_api_duration
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '8'))
+
+
+class TelegramTransport:
+    """
+    Pooled transport shared by every component talking to the Bot API.
+
+    One requests.Session keeps TCP+TLS connections to api.telegram.org alive
+    between calls. The pool is bounded: at most `pool_size` connections are
+    opened and callers wait for a free one instead of opening more.
+    """
+
+    def __init__(self, token: str, api_base: str = TELEGRAM_API_BASE, pool_size: int = TELEGRAM_POOL_SIZE):
+        self.token = token
+        self.api_base = api_base.rstrip('/')
+        self.base_url = f"{self.api_base}/bot{token}"
+        self.pool_size = max(1, pool_size)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            pool_block=True
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Connection': 'keep-alive'})
+
+        self._stats_lock = threading.Lock()
+        self.latency_stats: Dict[str, Dict[str, float]] = {}
+
+    def warm_up(self, connections: Optional[int] = None) -> int:
+        """Pre-open keep-alive connections so the first real calls skip the handshake"""
+        connections = min(connections or self.pool_size, self.pool_size)
+        threads = [threading.Thread(target=self._warm_one, daemon=True) for _ in range(connections)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(15)
+        logger.info(f"🔌 Pool HTTP Telegram préchauffé : {connections} connexion(s)")
+        return connections
+
+    def _warm_one(self) -> None:
+        try:
+            self.call('getMe', timeout=10, http_method='GET')
+        except Exception as e:
+            logger.warning(f"⚠️ Préchauffage connexion échoué: {e}")
+
+    def call(self, method: str, json: Optional[Dict[str, Any]] = None,
+             data: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None,
+             timeout: float = 10, http_method: str = 'POST') -> Dict[str, Any]:
+        """
+        Call a Bot API method and return the decoded JSON response.
+        Network errors are raised as requests.exceptions.RequestException.
+        """
+        url = f"{self.base_url}/{method}"
+        start = time.perf_counter()
+        try:
+            if http_method == 'GET':
+                response = self.session.get(url, params=json, timeout=timeout)
+            else:
+                response = self.session.post(url, json=json, data=data, files=files, timeout=timeout)
+            return response.json()
+        finally:
+            self._record_latency(method, time.perf_counter() - start)
+
+    def _record_latency(self, method: str, elapsed: float) -> None:
+        telegram_api_duration.labels(method).observe(elapsed)
+        with self._stats_lock:
+            stats = self.latency_stats.get(method)
+            if stats is None:
+                stats = {'count': 0, 'total': 0.0, 'min': elapsed, 'max': 0.0, 'first': elapsed, 'last': 0.0}
+                self.latency_stats[method] = stats
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['min'] = min(stats['min'], elapsed)
+            stats['max'] = max(stats['max'], elapsed)
+            stats['last'] = elapsed
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-method latency summary in milliseconds"""
+        with self._stats_lock:
+            return {
+                method: {
+                    'count': stats['count'],
+                    'avg_ms': round(stats['total'] / stats['count'] * 1000, 2),
+                    'min_ms': round(stats['min'] * 1000, 2),
+                    'max_ms': round(stats['max'] * 1000, 2),
+                    'first_ms': round(stats['first'] * 1000, 2),
+                    'last_ms': round(stats['last'] * 1000, 2)
+                }
+                for method, stats in self.latency_stats.items()
+            }
+
+
+# Shared transports, one per bot token
+_transports: Dict[str, TelegramTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(token: str) -> TelegramTransport:
+    """Return the shared transport for a bot token, creating it on first use"""
+    with _transports_lock:
+        transport = _transports.get(token)
+        if transport is None:
+            transport = TelegramTransport(token)
+            _transports[token] = transport
+        return transport
@@ -0,0 +1,206 @@
+"""
+Per-stage tracing of update handling, with a ring-buffered log of slow updates
+
+A trace follows one update: code along the way records stages with span()
+(timed blocks) or attach_future() (asynchronous calls, e.g. a sendMessage
+queued on the outbound dispatcher, timed until their response). The active
+trace lives in a context variable, so it follows the update worker thread
+and the asyncio task of the Telethon handlers without being passed around;
+without an active trace span() is a shared no-op. Stages may nest (e.g.
+verify includes the edit_message it triggers in config.py).
+
+An update is finished once its handler has returned and every attached call
+has completed. Updates slower than TRACE_SLOW_THRESHOLD_MS are kept, with
+their stage breakdown, in the last TRACE_SLOW_LOG_SIZE slow-log entries.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, Any, Deque, List, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+TRACE_SLOW_THRESHOLD_MS = float(os.getenv('TRACE_SLOW_THRESHOLD_MS', '500'))
+TRACE_SLOW_LOG_SIZE = int(os.getenv('TRACE_SLOW_LOG_SIZE', '200'))
+
+stage_duration = registry.histogram(
+    'update_stage_duration_seconds', 'Time spent per update handling stage', ('stage',))
+
+_current_trace: ContextVar[Optional['UpdateTrace']] = ContextVar('update_trace', default=None)
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace: 'UpdateTrace', name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self) -> '_Span':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.trace.add(self.name, time.perf_counter() - self.start)
+
+
+class UpdateTrace:
+    """Stage timings of one update (a stage recorded twice accumulates)"""
+
+    __slots__ = ('tracer', 'kind', 'attrs', 'stages', 'started', 'started_at', 'ended', '_last_mark', '_open', '_lock')
+
+    def __init__(self, tracer: 'Tracer', kind: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.kind = kind
+        self.attrs = attrs
+        self.stages: Dict[str, float] = {}
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.ended = self.started
+        self._last_mark = self.started
+        self._open = 1  # the handler itself, plus one per attached call
+        self._lock = threading.Lock()
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def mark(self, name: str) -> None:
+        """Record the time elapsed since the previous mark (or the start) as stage `name`, e.g. queue_wait"""
+        now = time.perf_counter()
+        self.add(name, now - self._last_mark)
+        self._last_mark = now
+
+    def attach(self, future: Future, name: str) -> Future:
+        """Time `future` from now to its completion as stage `name`; the update waits for it"""
+        start = time.perf_counter()
+        with self._lock:
+            self._open += 1
+
+        def done(_: Future) -> None:
+            self.add(name, time.perf_counter() - start)
+            self._release()
+
+        future.add_done_callback(done)
+        return future
+
+    def finish(self) -> None:
+        """End of the handler; the trace completes once attached calls are done too"""
+        self._release()
+
+    def _release(self) -> None:
+        with self._lock:
+            self._open -= 1
+            if self._open:
+                return
+            self.ended = time.perf_counter()
+        self.tracer.complete(self)
+
+    @property
+    def total_ms(self) -> float:
+        return (self.ended - self.started) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='milliseconds'),
+            'total_ms': round(self.total_ms, 3),
+            'stages_ms': {name: round(seconds * 1000, 3) for name, seconds in
+                          sorted(self.stages.items(), key=lambda item: item[1], reverse=True)},
+            **self.attrs
+        }
+
+
+class Tracer:
+    """Creates update traces and keeps the slowest ones in a ring buffer"""
+
+    def __init__(self, threshold_ms: float = TRACE_SLOW_THRESHOLD_MS, size: int = TRACE_SLOW_LOG_SIZE,
+                 enabled: bool = TRACING_ENABLED):
+        self.threshold_ms = threshold_ms
+        self.enabled = enabled
+        self.slow_log: Deque[Dict[str, Any]] = deque(maxlen=max(1, size))
+        self.traced_count = 0
+        self.slow_count = 0
+        self._lock = threading.Lock()
+
+    def start(self, kind: str, **attrs: Any) -> Optional[UpdateTrace]:
+        """New trace (not yet active), or None when tracing is disabled"""
+        if not self.enabled:
+            return None
+        return UpdateTrace(self, kind, attrs)
+
+    def complete(self, trace: UpdateTrace) -> None:
+        for name, seconds in trace.stages.items():
+            stage_duration.labels(name).observe(seconds)
+        total_ms = trace.total_ms
+        with self._lock:
+            self.traced_count += 1
+            if total_ms < self.threshold_ms:
+                return
+            self.slow_count += 1
+            entry = trace.to_dict()
+            self.slow_log.append(entry)
+        logger.warning(f"🐢 Update lent ({total_ms:.0f} ms): {entry['stages_ms']}")
+
+    def get_slow(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent slow updates first"""
+        with self._lock:
+            entries = list(self.slow_log)
+        return entries[::-1][:max(0, limit)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'threshold_ms': self.threshold_ms,
+            'traced': self.traced_count,
+            'slow': self.slow_count,
+            'slow_log_size': len(self.slow_log)
+        }
+
+
+def activate(trace: Optional[UpdateTrace]):
+    """Make `trace` the active trace of the current thread / task; returns the token for deactivate()"""
+    return _current_trace.set(trace)
+
+
+def deactivate(token) -> None:
+    _current_trace.reset(token)
+
+
+def current_trace() -> Optional[UpdateTrace]:
+    return _current_trace.get()
+
+
+def span(name: str):
+    """Timed stage of the active trace (no-op without one)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+def attach_future(future: Future, name: str) -> Future:
+    """Time an asynchronous call as a stage of the active trace (no-op without one)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attach(future, name)
+    return future
+
+
+# Global instance
+tracer = Tracer()
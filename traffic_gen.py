@@ -0,0 +1,254 @@
+"""
+Synthetic "Baccarat Kouamé" style source-channel traffic for load tests
+
+Each game is dealt with baccarat drawing rules and posted either directly in
+its final form, or first as a pending message (⏰/▶) that is edited a few
+seconds later into its final form (✅/🔰). Output is Bot API updates
+(channel_post / edited_channel_post), as consumed by
+TelegramHandlers.handle_update, or Telethon-like events for config.py.
+
+Usage:
+    python traffic_gen.py --games 1000 --channels 2 --rate 5 > updates.jsonl
+    python traffic_gen.py --games 1000 --capture captures/   # for replay.py
+"""
+
+import sys
+import json
+import time
+import heapq
+import random
+import argparse
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+# Target channel ID for Baccarat Kouamé (TARGET_CHANNEL_ID), first generated channel
+TARGET_CHANNEL_ID = -1002682552255
+
+SUITS = ('♠️', '♥️', '♦️', '♣️')
+RANKS = ('A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K')
+GAMES_PER_DAY = 1440
+
+
+def card_value(rank: str) -> int:
+    if rank == 'A':
+        return 1
+    if rank in ('10', 'J', 'Q', 'K'):
+        return 0
+    return int(rank)
+
+
+class GameDealer:
+    """Deals baccarat games (player / banker hands with third-card rules)"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def _card(self) -> Tuple[str, str]:
+        return self.rng.choice(RANKS), self.rng.choice(SUITS)
+
+    @staticmethod
+    def total(hand: List[Tuple[str, str]]) -> int:
+        return sum(card_value(rank) for rank, _ in hand) % 10
+
+    def deal(self) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        player = [self._card(), self._card()]
+        banker = [self._card(), self._card()]
+        player_total, banker_total = self.total(player), self.total(banker)
+        if player_total >= 8 or banker_total >= 8:
+            return player, banker
+
+        player_third = None
+        if player_total <= 5:
+            player_third = self._card()
+            player.append(player_third)
+
+        if player_third is None:
+            if banker_total <= 5:
+                banker.append(self._card())
+        else:
+            third = card_value(player_third[0])
+            draws = (
+                banker_total <= 2
+                or (banker_total == 3 and third != 8)
+                or (banker_total == 4 and 2 <= third <= 7)
+                or (banker_total == 5 and 4 <= third <= 7)
+                or (banker_total == 6 and third in (6, 7))
+            )
+            if draws:
+                banker.append(self._card())
+        return player, banker
+
+
+def format_hand(hand: List[Tuple[str, str]]) -> str:
+    return ''.join(f"{rank}{suit}" for rank, suit in hand)
+
+
+def format_game(game_number: int, player: List[Tuple[str, str]], banker: List[Tuple[str, str]],
+                final: bool, use_final_marker: bool, r_tag: bool, extra_group: Optional[str] = None) -> str:
+    """Render one game as posted in the source channel"""
+    player_total, banker_total = GameDealer.total(player), GameDealer.total(banker)
+    if not final:
+        return f"⏰#N{game_number}. ▶ {player_total}({format_hand(player[:2])}) - {banker_total}({format_hand(banker[:2])})"
+
+    tie = player_total == banker_total
+    marker = '🔰' if use_final_marker else '✅'
+    player_mark = marker if player_total >= banker_total else ''
+    banker_mark = marker if banker_total >= player_total and not player_mark else ''
+    tags = [f"#T{player_total + banker_total}"]
+    if r_tag:
+        tags.append('#R')
+    if tie:
+        tags.append('#X')
+    text = (f"#N{game_number}. {player_mark}{player_total}({format_hand(player)}) - "
+            f"{banker_mark}{banker_total}({format_hand(banker)})")
+    if extra_group:
+        text += f" ({extra_group})"
+    text += ' ' + ' '.join(tags)
+    return text
+
+
+class TrafficGenerator:
+    """
+    Generates timestamped source-channel updates.
+
+    `rate` is the number of games per second per channel; `pending_ratio`
+    is the share of games first posted as pending messages, edited
+    `edit_delay` seconds later (uniform range).
+    """
+
+    def __init__(self, channels: int = 1, rate: float = 1.0, pending_ratio: float = 0.7,
+                 r_tag_ratio: float = 0.5, final_marker_ratio: float = 0.3, third_group_ratio: float = 0.1,
+                 edit_delay: Tuple[float, float] = (3.0, 15.0), seed: Optional[int] = None,
+                 channel_ids: Optional[List[int]] = None, start_ts: Optional[float] = None):
+        self.rng = random.Random(seed)
+        self.dealer = GameDealer(self.rng)
+        self.channel_ids = channel_ids or [TARGET_CHANNEL_ID] + [-1001000000000 - index for index in range(1, channels)]
+        self.rate = rate
+        self.pending_ratio = pending_ratio
+        self.r_tag_ratio = r_tag_ratio
+        self.final_marker_ratio = final_marker_ratio
+        self.third_group_ratio = third_group_ratio
+        self.edit_delay = edit_delay
+        self.start_ts = start_ts if start_ts is not None else time.time()
+        self._update_id = 0
+        self._message_ids = {chat_id: 0 for chat_id in self.channel_ids}
+
+    def events(self, games: int) -> Iterator[Tuple[float, str, int, int, str]]:
+        """(ts, kind 'new'|'edit', chat_id, message_id, text) for `games` games per channel, in time order"""
+        heap: List[Tuple[float, int, str, int, int, str]] = []
+        sequence = 0
+        for chat_id in self.channel_ids:
+            ts = self.start_ts
+            game_number = self.rng.randint(1, GAMES_PER_DAY)
+            for _ in range(games):
+                ts += self.rng.expovariate(self.rate) if self.rate > 0 else 0
+                player, banker = self.dealer.deal()
+                r_tag = self.rng.random() < self.r_tag_ratio
+                marker = self.rng.random() < self.final_marker_ratio
+                extra = format_hand(player[:1]) if self.rng.random() < self.third_group_ratio else None
+                final_text = format_game(game_number, player, banker, True, marker, r_tag, extra)
+
+                self._message_ids[chat_id] += 1
+                message_id = self._message_ids[chat_id]
+                if self.rng.random() < self.pending_ratio:
+                    pending_text = format_game(game_number, player, banker, False, marker, r_tag)
+                    heapq.heappush(heap, (ts, sequence, 'new', chat_id, message_id, pending_text))
+                    edit_ts = ts + self.rng.uniform(*self.edit_delay)
+                    heapq.heappush(heap, (edit_ts, sequence + 1, 'edit', chat_id, message_id, final_text))
+                else:
+                    heapq.heappush(heap, (ts, sequence, 'new', chat_id, message_id, final_text))
+                sequence += 2
+                game_number = game_number % GAMES_PER_DAY + 1
+
+        while heap:
+            ts, _, kind, chat_id, message_id, text = heapq.heappop(heap)
+            yield ts, kind, chat_id, message_id, text
+
+    def updates(self, games: int) -> Iterator[Tuple[float, Dict[str, Any]]]:
+        """(ts, Bot API update) pairs, as received on the webhook"""
+        for ts, kind, chat_id, message_id, text in self.events(games):
+            yield ts, self.make_update(ts, kind, chat_id, message_id, text)
+
+    def make_update(self, ts: float, kind: str, chat_id: int, message_id: int, text: str) -> Dict[str, Any]:
+        self._update_id += 1
+        chat = {'id': chat_id, 'title': 'Baccarat Kouamé', 'type': 'channel'}
+        message = {
+            'message_id': message_id,
+            'sender_chat': chat,
+            'chat': chat,
+            'date': int(ts),
+            'text': text
+        }
+        if kind == 'edit':
+            message['edit_date'] = int(ts)
+            return {'update_id': self._update_id, 'edited_channel_post': message}
+        return {'update_id': self._update_id, 'channel_post': message}
+
+    def telethon_events(self, games: int) -> Iterator[Tuple[float, str, 'FakeTelethonEvent']]:
+        """(ts, kind, event) triples usable with config.py's handle_message / handle_edited_message"""
+        for ts, kind, chat_id, message_id, text in self.events(games):
+            yield ts, kind, FakeTelethonEvent(chat_id, message_id, text)
+
+
+class FakeTelethonChat:
+    def __init__(self, chat_id: int):
+        # Telethon exposes broadcast channels with their bare positive id
+        self.id = -chat_id - 1000000000000
+        self.broadcast = True
+
+
+class FakeTelethonMessage:
+    def __init__(self, message_id: int, text: str):
+        self.id = message_id
+        self.message = text
+
+
+class FakeTelethonEvent:
+    """Minimal stand-in for telethon NewMessage / MessageEdited events"""
+
+    def __init__(self, chat_id: int, message_id: int, text: str):
+        self.chat_id = chat_id
+        self.message = FakeTelethonMessage(message_id, text)
+        self._chat = FakeTelethonChat(chat_id)
+
+    async def get_chat(self) -> FakeTelethonChat:
+        return self._chat
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Générateur de trafic synthétique du canal source")
+    parser.add_argument('--games', type=int, default=1000, help="Nombre de jeux par canal")
+    parser.add_argument('--channels', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=1.0, help="Jeux par seconde et par canal")
+    parser.add_argument('--pending-ratio', type=float, default=0.7)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--realtime', action='store_true', help="Émettre au rythme des horodatages")
+    parser.add_argument('--capture', help="Écrire un dossier de capture (format capture.py) au lieu de JSON lines")
+    args = parser.parse_args(argv)
+
+    generator = TrafficGenerator(channels=args.channels, rate=args.rate,
+                                 pending_ratio=args.pending_ratio, seed=args.seed)
+    tap = None
+    if args.capture:
+        from capture import UpdateCapture
+        tap = UpdateCapture(args.capture)
+
+    started = time.time()
+    for ts, update in generator.updates(args.games):
+        if args.realtime:
+            delay = (ts - generator.start_ts) - (time.time() - started)
+            if delay > 0:
+                time.sleep(delay)
+        payload = json.dumps(update, ensure_ascii=False)
+        if tap:
+            while not tap.record(payload.encode('utf-8'), ts=ts):
+                time.sleep(0.01)
+        else:
+            sys.stdout.write(payload + '\n')
+
+    if tap:
+        tap.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Bounded key/value stores with per-entry TTL and a background sweeper
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, Any, Callable, Iterator, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+TEMP_MESSAGE_TTL = float(os.getenv('TEMP_MESSAGE_TTL', '600'))  # seconds
+TEMP_MESSAGE_MAX_ENTRIES = int(os.getenv('TEMP_MESSAGE_MAX_ENTRIES', '500'))
+TTL_SWEEP_INTERVAL = float(os.getenv('TTL_SWEEP_INTERVAL', '30'))  # seconds
+
+
+class TTLStore(MutableMapping):
+    """
+    Dict-like store whose entries expire `ttl` seconds after they were last set.
+
+    Expired entries are invisible to readers and reclaimed by sweep(); the
+    store never holds more than `max_entries` items (oldest evicted first).
+    """
+
+    def __init__(self, ttl: float = TEMP_MESSAGE_TTL, max_entries: int = TEMP_MESSAGE_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.expired_count = 0
+        self.evicted_count = 0
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            expires_at, value = self._data[key]
+            if expires_at <= self.clock():
+                del self._data[key]
+                self.expired_count += 1
+                raise KeyError(key)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (self.clock() + self.ttl, value)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evicted_count += 1
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self) -> Iterator[Hashable]:
+        now = self.clock()
+        with self._lock:
+            keys = [key for key, (expires_at, _) in self._data.items() if expires_at > now]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        """Live entries only: expired ones (all at the front) are reclaimed first"""
+        with self._lock:
+            self.sweep()
+            return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def sweep(self) -> int:
+        """Remove expired entries, returns how many were reclaimed"""
+        now = self.clock()
+        removed = 0
+        with self._lock:
+            # Entries are ordered by last write, so expired ones are at the front
+            while self._data:
+                key, (expires_at, _) = next(iter(self._data.items()))
+                if expires_at > now:
+                    break
+                del self._data[key]
+                removed += 1
+            self.expired_count += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return store counters"""
+        return {
+            'size': len(self),
+            'expired': self.expired_count,
+            'evicted': self.evicted_count
+        }
+
+
+class TTLSweeper:
+    """Background thread periodically sweeping registered TTL stores"""
+
+    def __init__(self, interval: float = TTL_SWEEP_INTERVAL):
+        self.interval = interval
+        self._stores: Dict[str, TTLStore] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.swept_count = 0
+
+    def register(self, name: str, store: TTLStore) -> None:
+        """Add a store to sweep, starting the thread on first use"""
+        with self._lock:
+            self._stores[name] = store
+        self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="ttl-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def sweep_all(self) -> int:
+        """Sweep every registered store once"""
+        with self._lock:
+            stores = list(self._stores.items())
+        removed = 0
+        for name, store in stores:
+            count = store.sweep()
+            if count:
+                logger.info(f"🧹 {count} entrée(s) expirée(s) supprimée(s) de {name}")
+            removed += count
+        self.swept_count += removed
+        return removed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep_all()
+            except Exception as e:
+                logger.error(f"❌ Erreur sweeper TTL: {e}")
+
+
+# Shared sweeper for the whole process
+ttl_sweeper = TTLSweeper()
@@ -0,0 +1,218 @@
+"""
+Bounded worker pool for Telegram updates - lets the webhook acknowledge immediately
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Dict, Any, Callable, Optional, List
+
+from metrics import update_duration
+from tracing import UpdateTrace, activate, deactivate
+
+logger = logging.getLogger(__name__)
+
+# Configuration constants (overridable through environment variables)
+UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', '4'))
+UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', '1000'))
+UPDATE_QUEUE_OVERFLOW = os.getenv('UPDATE_QUEUE_OVERFLOW', 'drop_oldest')
+
+OVERFLOW_POLICIES = ('drop_new', 'drop_oldest', 'block')
+
+UPDATE_TYPES = ['message', 'edited_message', 'channel_post', 'edited_channel_post']
+
+
+def get_update_chat_id(update: Dict[str, Any]) -> Optional[int]:
+    """Return the chat an update belongs to, used as the ordering key"""
+    for update_type in UPDATE_TYPES:
+        message = update.get(update_type)
+        if message:
+            sender_chat = message.get('sender_chat') or {}
+            return sender_chat.get('id', message.get('chat', {}).get('id'))
+    return None
+
+
+class UpdateQueue:
+    """
+    Dispatches updates to a fixed pool of worker threads.
+
+    Each chat is pinned to one worker (chat_id modulo worker count), so updates
+    from the same chat are processed in arrival order while different chats
+    are handled in parallel. Every worker owns a bounded queue; when it is full
+    the overflow policy decides what happens:
+    - drop_new: the incoming update is discarded
+    - drop_oldest: the oldest queued update of that worker is discarded
+    - block: the caller waits until there is room
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], None],
+                 workers: int = UPDATE_WORKERS,
+                 max_size: int = UPDATE_QUEUE_SIZE,
+                 overflow: str = UPDATE_QUEUE_OVERFLOW):
+        if overflow not in OVERFLOW_POLICIES:
+            logger.warning(f"⚠️ Politique de débordement invalide : {overflow}. Utilisation de drop_oldest.")
+            overflow = 'drop_oldest'
+
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.overflow = overflow
+
+        # Capacity is shared evenly between the per-worker queues
+        per_worker_size = max(1, self.max_size // self.workers)
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=per_worker_size) for _ in range(self.workers)]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.enqueued_count = 0
+        self.dropped_count = 0
+        self.processed_count = 0
+        self.failed_count = 0
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for index, worker_queue in enumerate(self._queues):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    args=(worker_queue,),
+                    name=f"update-worker-{index}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"🧵 File d'updates démarrée : {self.workers} workers, capacité {self.max_size}, débordement {self.overflow}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ask workers to finish the queued updates and exit (never blocks past `timeout`)"""
+        with self._lock:
+            threads = self._threads
+            self._threads = []
+        self._stopping.set()
+        for worker_queue in self._queues:
+            try:
+                worker_queue.put_nowait(None)
+            except queue.Full:
+                # No room for the sentinel: the worker exits once its queue is drained
+                pass
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def submit(self, update: Dict[str, Any], trace: Optional[UpdateTrace] = None) -> bool:
+        """
+        Queue an update for processing. Returns False if it was dropped.
+        `trace` (started on reception) is made active while the update is handled.
+        """
+        if not self._threads:
+            self.start()
+
+        chat_id = get_update_chat_id(update)
+        worker_queue = self._queues[hash(chat_id) % self.workers]
+        item = (update, trace)
+
+        if self.overflow == 'block':
+            worker_queue.put(item)
+            self._count('enqueued_count')
+            return True
+
+        try:
+            worker_queue.put_nowait(item)
+            self._count('enqueued_count')
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow == 'drop_new':
+            self._count('dropped_count')
+            logger.warning(f"⚠️ File pleine - update ignoré (chat {chat_id})")
+            return False
+
+        # drop_oldest: make room by discarding the oldest update of this worker
+        try:
+            oldest = worker_queue.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            worker_queue.task_done()
+            if oldest is None:
+                # Stop sentinel: the worker is shutting down, keep it and refuse the update
+                try:
+                    worker_queue.put_nowait(None)
+                except queue.Full:
+                    pass  # The stopping worker still exits once its queue is drained
+                self._count('dropped_count')
+                logger.warning(f"⚠️ File en arrêt - update ignoré (chat {chat_id})")
+                return False
+            self._count('dropped_count')
+            if oldest[1] is not None:
+                oldest[1].finish()
+            logger.warning(f"⚠️ File pleine - update le plus ancien supprimé (chat {chat_id})")
+        try:
+            worker_queue.put_nowait(item)
+            self._count('enqueued_count')
+            return True
+        except queue.Full:
+            self._count('dropped_count')
+            return False
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def depth(self) -> int:
+        """Number of updates currently waiting in the queues"""
+        return sum(worker_queue.qsize() for worker_queue in self._queues)
+
+    def join(self) -> None:
+        """Block until every queued update has been processed"""
+        for worker_queue in self._queues:
+            worker_queue.join()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue counters"""
+        return {
+            'workers': self.workers,
+            'max_size': self.max_size,
+            'overflow': self.overflow,
+            'depth': self.depth(),
+            'enqueued': self.enqueued_count,
+            'dropped': self.dropped_count,
+            'processed': self.processed_count,
+            'failed': self.failed_count
+        }
+
+    def _worker_loop(self, worker_queue: queue.Queue) -> None:
+        while True:
+            try:
+                # Once stopping, an empty queue means the work is done
+                item = worker_queue.get(timeout=0.1 if self._stopping.is_set() else None)
+            except queue.Empty:
+                return
+            token = None
+            trace = None
+            try:
+                if item is None:
+                    return
+                update, trace = item
+                if trace is not None:
+                    trace.mark('queue_wait')
+                    token = activate(trace)
+                start = time.perf_counter()
+                self.handler(update)
+                update_duration.observe(time.perf_counter() - start)
+                self._count('processed_count')
+            except Exception as e:
+                self._count('failed_count')
+                logger.error(f"❌ Erreur traitement update en arrière-plan: {e}")
+            finally:
+                if token is not None:
+                    deactivate(token)
+                if trace is not None:
+                    trace.finish()
+                worker_queue.task_done()
@@ -0,0 +1,105 @@
+"""
+N+k verification window of the Telethon bot (config.py)
+
+A prediction for game T is checked against the first group of the finalized
+games T, T+1, ..., T+depth, in that order: it is won at step k (✅k️⃣) when
+game T+k shows at least `min_cards` cards of the predicted suit (1: presence
+of the suit, the card_predictor rule), and lost (❌) after T+depth. A step is
+only taken once the previous ones were, so each pending prediction waits on
+exactly one game. Predictions are indexed by that game: a finalized game
+costs O(predictions waiting on it), whatever the number of pending ones.
+"""
+
+import os
+from typing import Dict, List, NamedTuple, Sequence
+
+from game_message import suit_index
+
+# Configuration constants (overridable through environment variables)
+VERIFICATION_DEPTH = int(os.getenv('VERIFICATION_DEPTH', '3'))  # last step checked: N+depth
+VERIFICATION_MIN_CARDS = int(os.getenv('VERIFICATION_MIN_CARDS', '3'))  # cards of the suit to win; 1 = presence
+
+WON, LOST, NEXT = 'won', 'lost', 'next'
+
+
+class Check(NamedTuple):
+    """One prediction checked against a finalized game"""
+    target_game: int
+    suit: str
+    step: int  # 0 for game T, k for game T+k
+    count: int  # cards of the predicted suit in the first group
+    outcome: str  # WON, LOST or NEXT (waits on the next game)
+
+    @property
+    def status(self) -> str:
+        if self.outcome == WON:
+            return f"✅{self.step}️⃣"
+        return '❌' if self.outcome == LOST else '⏳'
+
+
+class VerificationEngine:
+    """Pending predictions indexed by the game they wait on"""
+
+    def __init__(self, depth: int = VERIFICATION_DEPTH, min_cards: int = VERIFICATION_MIN_CARDS):
+        self.depth = min(max(0, depth), 9)  # keycap statuses ✅0️⃣–✅9️⃣
+        self.min_cards = max(1, min_cards)
+        self.waiting: Dict[int, Dict[int, str]] = {}  # awaited game -> {target game: suit}
+        self.steps: Dict[int, int] = {}  # target game -> current step
+
+    def track(self, target_game: int, suit: str) -> None:
+        """Start verifying a new prediction: it waits on its target game"""
+        self.forget(target_game)
+        self.steps[target_game] = 0
+        self.waiting.setdefault(target_game, {})[target_game] = suit
+
+    def forget(self, target_game: int) -> None:
+        """Stop verifying a prediction (e.g. removed by hand)"""
+        step = self.steps.pop(target_game, None)
+        if step is None:
+            return
+        awaited = target_game + step
+        entries = self.waiting.get(awaited)
+        if entries is not None:
+            entries.pop(target_game, None)
+            if not entries:
+                del self.waiting[awaited]
+
+    def clear(self) -> None:
+        self.waiting.clear()
+        self.steps.clear()
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def awaited_game(self, target_game: int) -> int:
+        """Game the prediction for `target_game` waits on"""
+        return target_game + self.steps[target_game]
+
+    def verify(self, game_number: int, group_counts: Sequence[int]) -> List[Check]:
+        """
+        Check every prediction waiting on finalized game `game_number`, given the
+        (♠, ♥, ♦, ♣) counts of its first group. Won and lost predictions are dropped,
+        the others move on to the next game.
+        """
+        entries = self.waiting.pop(game_number, None)
+        if not entries:
+            return []
+
+        checks = []
+        for target_game, suit in entries.items():
+            step = self.steps[target_game]
+            index = suit_index(suit)
+            count = group_counts[index] if index is not None else 0
+            if count >= self.min_cards:
+                outcome = WON
+            elif step >= self.depth:
+                outcome = LOST
+            else:
+                outcome = NEXT
+            if outcome == NEXT:
+                self.steps[target_game] = step + 1
+                self.waiting.setdefault(game_number + 1, {})[target_game] = suit
+            else:
+                del self.steps[target_game]
+            checks.append(Check(target_game, suit, step, count, outcome))
+        return checks